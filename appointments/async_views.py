@@ -0,0 +1,115 @@
+"""
+Server-sent appointment events (see appointments/events.py).
+
+Served by the ASGI app, kunapet_backend/asgi.py: each open stream is a
+coroutine waiting on its queue, not a thread. EventSource cannot send
+headers, so the access token may also be passed as ?token=. A stream ends
+when its token expires; the client reconnects with a fresh one.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import status
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+
+from users.authentication import ClaimsJWTAuthentication, JWTAuthentication
+from users.models import ProviderProfile
+from .events import client_channel, format_event, get_broker, provider_channel
+
+
+def raw_token(request):
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[len('Bearer '):].strip()
+    return request.GET.get('token')
+
+
+def get_provider_id(user_id):
+    return ProviderProfile.objects.filter(user_id=user_id).values_list('id', flat=True).first()
+
+
+def get_role(user):
+    return user.role
+
+
+class EventStream:
+    """
+    Async body of an event stream. close() is registered with the response,
+    so the subscription is dropped however the stream ends (client gone,
+    token expired, server shutdown).
+    """
+    def __init__(self, channels, expires_at):
+        self.channels = channels
+        self.expires_at = expires_at
+        self.subscription = None
+
+    def __aiter__(self):
+        return self.events()
+
+    async def events(self):
+        # Subscribed only once the server starts reading the stream
+        self.subscription = get_broker().subscribe(self.channels)
+        try:
+            yield f'retry: {settings.APPOINTMENT_EVENTS_RETRY_MS}\n\n'
+            while True:
+                remaining = self.expires_at - time.time()
+                if remaining <= 0:
+                    return
+                event = await self.subscription.get(min(settings.APPOINTMENT_EVENTS_HEARTBEAT_SECONDS, remaining))
+                # Comment lines keep proxies from timing the connection out
+                yield format_event(event) if event is not None else ': ping\n\n'
+        finally:
+            self.close()
+
+    def close(self):
+        if self.subscription is not None:
+            self.subscription.close()
+            self.subscription = None
+
+
+@require_GET
+async def appointment_events(request):
+    """
+    GET /api/appointments/events/  (Accept: text/event-stream)
+    Providers receive the events of their services' appointments, clients
+    those of their own bookings.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'error': 'Event streams are served by the ASGI app (kunapet_backend.asgi).'},
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
+
+    token = raw_token(request)
+    # Same trade-off as the API: the user row (is_active) is checked once,
+    # before the stream opens, unless JWT_CLAIMS_AUTH trusts the claims
+    authentication = ClaimsJWTAuthentication() if settings.JWT_CLAIMS_AUTH else JWTAuthentication()
+    try:
+        validated = authentication.get_validated_token(token) if token else None
+        user = await sync_to_async(authentication.get_user)(validated) if validated else None
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        user = None
+    if user is None:
+        return JsonResponse({'error': 'A valid access token is required.'}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        role = await sync_to_async(get_role)(user)
+    except AuthenticationFailed:
+        return JsonResponse({'error': 'A valid access token is required.'}, status=status.HTTP_401_UNAUTHORIZED)
+    if role == 'provider':
+        provider_id = await sync_to_async(get_provider_id)(user.id)
+        if provider_id is None:
+            return JsonResponse({'error': 'Provider profile not found.'}, status=status.HTTP_404_NOT_FOUND)
+        channels = [provider_channel(provider_id)]
+    else:
+        channels = [client_channel(user.id)]
+
+    response = StreamingHttpResponse(EventStream(channels, validated['exp']), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Tell nginx not to buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,156 @@
+"""
+Slot availability engine.
+
+Booked appointments of a provider are loaded for a whole date range in a
+single query, merged per day into an IntervalSet and the free windows
+between them are turned into bookable slots.
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Appointment
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def to_minutes(value):
+    """Convert a datetime.time to minutes since midnight."""
+    return value.hour * 60 + value.minute
+
+
+def to_time(minutes):
+    """Convert minutes since midnight back to a datetime.time."""
+    return time(minutes // 60, minutes % 60)
+
+
+def parse_clock(value):
+    """Parse an 'HH:MM' setting value into minutes since midnight."""
+    return to_minutes(datetime.strptime(value, '%H:%M').time())
+
+
+def business_hours():
+    """Return (open, close) in minutes since midnight from settings."""
+    hours = settings.BUSINESS_HOURS
+    return parse_clock(hours['start']), parse_clock(hours['end'])
+
+
+class IntervalSet:
+    """
+    Sorted, non-overlapping set of half-open [start, end) minute intervals.
+    Overlapping or touching intervals are merged on build.
+    """
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(intervals):
+            if end <= start:
+                continue
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def __iter__(self):
+        return iter(zip(self.starts, self.ends))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlaps(self, start, end):
+        """True if [start, end) intersects any interval in the set."""
+        index = bisect_right(self.starts, start) - 1
+        if index >= 0 and self.ends[index] > start:
+            return True
+        nxt = index + 1
+        return nxt < len(self.starts) and self.starts[nxt] < end
+
+    def gaps(self, lower, upper):
+        """Yield the free [start, end) windows inside [lower, upper)."""
+        cursor = lower
+        for start, end in self:
+            if end <= cursor:
+                continue
+            if start >= upper:
+                break
+            if start > cursor:
+                yield cursor, start
+            cursor = max(cursor, end)
+        if cursor < upper:
+            yield cursor, upper
+
+
+def booked_intervals(provider_id, start_date, end_date, exclude_id=None):
+    """
+    Load every non-cancelled booking of a provider between two dates
+    (inclusive) in ONE query and return {date: IntervalSet}.
+    """
+    queryset = Appointment.objects.filter(
+        service__provider_id=provider_id,
+        date__range=(start_date, end_date),
+    ).exclude(status='cancelled')
+    if exclude_id is not None:
+        queryset = queryset.exclude(pk=exclude_id)
+
+    raw = defaultdict(list)
+    for day, start, duration in queryset.values_list('date', 'time', 'service__duration'):
+        begin = to_minutes(start)
+        raw[day].append((begin, min(begin + duration, MINUTES_PER_DAY)))
+    return defaultdict(IntervalSet, {day: IntervalSet(items) for day, items in raw.items()})
+
+
+def date_range(start_date, end_date):
+    day = start_date
+    while day <= end_date:
+        yield day
+        day += timedelta(days=1)
+
+
+def _earliest_start(day, opening):
+    """Slots for today cannot start in the past."""
+    now = timezone.localtime()
+    if day < now.date():
+        return MINUTES_PER_DAY
+    if day == now.date():
+        return max(opening, now.hour * 60 + now.minute + 1)
+    return opening
+
+
+def free_windows(provider_id, start_date, end_date):
+    """
+    Return [(date, [(start_minute, end_minute), ...]), ...] with the open
+    windows of a provider for every day in the range.
+    """
+    opening, closing = business_hours()
+    booked = booked_intervals(provider_id, start_date, end_date)
+    days = []
+    for day in date_range(start_date, end_date):
+        lower = _earliest_start(day, opening)
+        days.append((day, list(booked[day].gaps(lower, closing))))
+    return days
+
+
+def service_slots(service, start_date, end_date):
+    """
+    Return [(date, [slot_start_minute, ...]), ...] with every start time at
+    which `service` fits entirely inside an open window. Slot starts are
+    aligned to AVAILABILITY_SLOT_MINUTES from opening time.
+    """
+    opening, _ = business_hours()
+    step = settings.AVAILABILITY_SLOT_MINUTES
+    days = []
+    for day, windows in free_windows(service.provider_id, start_date, end_date):
+        slots = []
+        for start, end in windows:
+            # First grid-aligned start inside this window
+            offset = (start - opening) % step
+            slot = start if offset == 0 else start + step - offset
+            while slot + service.duration <= end:
+                slots.append(slot)
+                slot += step
+        days.append((day, slots))
+    return days
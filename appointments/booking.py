@@ -0,0 +1,50 @@
+"""
+Overlap-safe booking.
+
+A booking transaction first takes a lock scoped to the provider, then checks
+the provider's existing intervals for that day and only then writes. Two
+writers for the same provider are serialized; writers for different
+providers are not.
+
+- PostgreSQL/MySQL: SELECT ... FOR UPDATE on the ProviderProfile row.
+- SQLite: has a single writer anyway; the connection is configured with
+  BEGIN IMMEDIATE (see settings) so the check and the insert happen under
+  the same write lock.
+
+The partial unique constraint on Appointment is the last line of defence for
+exact duplicates should a write bypass this module.
+"""
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from users.models import ProviderProfile
+from .availability import booked_intervals, to_minutes
+
+SLOT_TAKEN_MESSAGE = 'This time slot is no longer available.'
+
+
+def lock_provider(provider_id):
+    """Block until no other transaction is booking with this provider."""
+    list(ProviderProfile.objects.select_for_update().filter(pk=provider_id).values_list('pk', flat=True))
+
+
+def is_slot_free(service, day, start, exclude_id=None):
+    """True if [start, start + service.duration) overlaps no active booking."""
+    booked = booked_intervals(service.provider_id, day, day, exclude_id=exclude_id)[day]
+    begin = to_minutes(start)
+    return not booked.overlaps(begin, begin + service.duration)
+
+
+def book(service, day, start, save, exclude_id=None):
+    """
+    Run `save()` inside a provider-scoped critical section if the slot is
+    free. Raises serializers.ValidationError when it is taken.
+    """
+    try:
+        with transaction.atomic():
+            lock_provider(service.provider_id)
+            if not is_slot_free(service, day, start, exclude_id=exclude_id):
+                raise serializers.ValidationError({'time': SLOT_TAKEN_MESSAGE})
+            return save()
+    except IntegrityError:
+        raise serializers.ValidationError({'time': SLOT_TAKEN_MESSAGE})
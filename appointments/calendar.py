@@ -0,0 +1,141 @@
+"""
+iCalendar (.ics) feeds of a client's or a provider's appointments.
+
+Calendar apps poll a secret URL, /api/appointments/calendar/<token>.ics,
+since they cannot send a JWT. The token is signed with SECRET_KEY and names
+the feed ('client:<user id>' or 'provider:<profile id>'), so serving it
+needs no user lookup.
+
+  * The body is streamed: rows are read as tuples with
+    queryset.iterator(chunk_size=CALENDAR_FEED_CHUNK_SIZE) and written out
+    a few dozen KB at a time, so memory does not grow with the history.
+  * The ETag comes from one aggregate over the feed's rows: COUNT(*) and
+    MAX(updated_at) of the appointments and of their services and
+    providers (whose names and addresses the events show). It is read
+    from the database, so every worker agrees on it. A re-poll with a
+    matching If-None-Match is answered 304 after that one query.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from kunapet_backend.conditional import make_etag
+from .models import Appointment
+
+TOKEN_SALT = 'appointments.calendar'
+FEED_KINDS = ('client', 'provider')
+# Bytes buffered before a chunk is handed to the server
+FLUSH_BYTES = 32 * 1024
+
+EVENT_STATUS = {'pending': 'TENTATIVE', 'confirmed': 'CONFIRMED', 'completed': 'CONFIRMED', 'cancelled': 'CANCELLED'}
+FIELDS = (
+    'id', 'date', 'time', 'status', 'notes', 'created_at',
+    'service__name', 'service__duration', 'service__provider__business_name',
+    'service__provider__address', 'client__email',
+)
+
+
+def feed_token(kind, feed_id):
+    return signing.Signer(salt=TOKEN_SALT).sign(f'{kind}:{feed_id}')
+
+
+def read_token(token):
+    """(kind, id) named by a feed token, or None if it is not valid."""
+    try:
+        kind, feed_id = signing.Signer(salt=TOKEN_SALT).unsign(token).split(':')
+    except (signing.BadSignature, ValueError):
+        return None
+    if kind not in FEED_KINDS or not feed_id.isdigit():
+        return None
+    return kind, int(feed_id)
+
+
+def feed_appointments(kind, feed_id):
+    if kind == 'provider':
+        queryset = Appointment.objects.filter(service__provider_id=feed_id)
+    else:
+        queryset = Appointment.objects.filter(client_id=feed_id)
+    # No ORDER BY: calendar apps do not care, and it would sort the whole history
+    return queryset.order_by()
+
+
+def feed_etag(kind, feed_id):
+    # The count catches deletions, which no MAX() sees
+    totals = feed_appointments(kind, feed_id).aggregate(
+        count=Count('pk'), appointments=Max('updated_at'),
+        services=Max('service__updated_at'), providers=Max('service__provider__updated_at'),
+    )
+    return make_etag(kind, feed_id, *totals.values())
+
+
+def feed_queryset(kind, feed_id):
+    return feed_appointments(kind, feed_id).values_list(*FIELDS)
+
+
+def escape(text):
+    return (
+        text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+    )
+
+
+def fold(line):
+    """Split a content line into 75-octet pieces (RFC 5545 3.1)."""
+    data = line.encode()
+    if len(data) <= 75:
+        return data + b'\r\n'
+    pieces, limit = [], 75
+    while data:
+        cut = min(limit, len(data))
+        # Never split a UTF-8 sequence
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        pieces.append(data[:cut])
+        data, limit = data[cut:], 74  # continuation lines start with a space
+    return b'\r\n '.join(pieces) + b'\r\n'
+
+
+def utc_stamp(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def event(row, kind, tz):
+    pk, day, start, status, notes, created_at, service, duration, business, address, client = row
+    begin = timezone.make_aware(datetime.combine(day, start), tz)
+    summary = f'{service} - {client}' if kind == 'provider' else f'{service} - {business}'
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:appointment-{pk}@kunapet',
+        f'DTSTAMP:{utc_stamp(created_at)}',
+        f'DTSTART:{utc_stamp(begin)}',
+        f'DTEND:{utc_stamp(begin + timedelta(minutes=duration))}',
+        f'SUMMARY:{escape(summary)}',
+        f'LOCATION:{escape(address)}',
+        f'STATUS:{EVENT_STATUS[status]}',
+    ]
+    if notes:
+        lines.append(f'DESCRIPTION:{escape(notes)}')
+    lines.append('END:VEVENT')
+    return b''.join(fold(line) for line in lines)
+
+
+def render_feed(kind, feed_id):
+    """Yield the .ics body in chunks of about FLUSH_BYTES."""
+    tz = timezone.get_default_timezone()
+    yield b''.join(fold(line) for line in (
+        'BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//KunaPet//Appointments//ES',
+        'CALSCALE:GREGORIAN', 'METHOD:PUBLISH', 'X-WR-CALNAME:KunaPet',
+    ))
+    buffer, size = [], 0
+    for row in feed_queryset(kind, feed_id).iterator(chunk_size=settings.CALENDAR_FEED_CHUNK_SIZE):
+        data = event(row, kind, tz)
+        buffer.append(data)
+        size += len(data)
+        if size >= FLUSH_BYTES:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    buffer.append(fold('END:VCALENDAR'))
+    yield b''.join(buffer)
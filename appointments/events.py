@@ -0,0 +1,210 @@
+"""
+Real-time appointment events (GET /api/appointments/events/, SSE).
+
+Booking and status-change writes publish an event, after their
+transaction commits, to two channels: the provider's
+('provider:<profile id>') and the client's ('client:<user id>'). Every
+open event stream subscribed to one of them receives it, so dashboards
+no longer poll /api/appointments/.
+
+The broker is pluggable (settings.APPOINTMENT_EVENTS_BROKER):
+
+  * InMemoryBroker: per process. Enough for `runserver` and for a single
+    ASGI worker.
+  * PostgresBroker: publishes with NOTIFY. Each process LISTENs on one
+    connection in a background thread and hands what it hears to its own
+    in-memory subscribers, so an event reaches the streams of every
+    node and worker sharing the database.
+
+A subscriber's queue holds APPOINTMENT_EVENTS_QUEUE_SIZE events. A stream
+that falls further behind gets one 'resync' event instead, telling the
+client to reload the list. Events are not replayed, so clients also
+reload after reconnecting.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+CREATED = 'appointment.created'
+STATUS_CHANGED = 'appointment.status_changed'
+RESCHEDULED = 'appointment.rescheduled'
+RESYNC = 'resync'
+
+
+def provider_channel(provider_id):
+    return f'provider:{provider_id}'
+
+
+def client_channel(client_id):
+    return f'client:{client_id}'
+
+
+class Subscription:
+    """One stream's queue. put() may be called from any thread."""
+
+    def __init__(self, broker, channels, queue_size):
+        self.broker = broker
+        self.channels = channels
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(queue_size)
+
+    def put(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            pass  # loop closed: the stream is gone
+
+    def _put(self, event):
+        if self.queue.full():
+            # Too far behind: drop the backlog, the client reloads instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = {'type': RESYNC}
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        """The next event, or None after `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InMemoryBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, channels):
+        """Call from the stream's event loop."""
+        subscription = Subscription(self, channels, settings.APPOINTMENT_EVENTS_QUEUE_SIZE)
+        with self._lock:
+            for channel in channels:
+                self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscriptions.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[channel]
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({s for subscribers in self._subscriptions.values() for s in subscribers})
+
+    def publish(self, channels, event):
+        self.deliver(channels, event)
+
+    def deliver(self, channels, event):
+        """Hand an event to this process's subscribers of `channels`."""
+        with self._lock:
+            targets = set().union(*(self._subscriptions.get(channel, ()) for channel in channels))
+        for subscription in targets:
+            subscription.put(event)
+
+
+class PostgresBroker(InMemoryBroker):
+    """InMemoryBroker fan-out fed by PostgreSQL LISTEN/NOTIFY (psycopg2)."""
+    PG_CHANNEL = 'kunapet_appointment_events'
+    RECONNECT_SECONDS = 2
+
+    def __init__(self, using='default'):
+        super().__init__()
+        self.using = using
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def publish(self, channels, event):
+        payload = json.dumps({'channels': channels, 'event': event}, cls=DjangoJSONEncoder)
+        with connections[self.using].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.PG_CHANNEL, payload])
+
+    def subscribe(self, channels):
+        with self._listener_lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='appointment-events', daemon=True)
+                self._listener.start()
+        return super().subscribe(channels)
+
+    def _listen(self):
+        wrapper = connections[self.using]
+        while True:
+            try:
+                conn = wrapper.Database.connect(**wrapper.get_connection_params())
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.PG_CHANNEL}')
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        message = json.loads(conn.notifies.pop(0).payload)
+                        self.deliver(message['channels'], message['event'])
+            except Exception:
+                logger.exception('Appointment event listener failed; reconnecting')
+                time.sleep(self.RECONNECT_SECONDS)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.APPOINTMENT_EVENTS_BROKER)()
+    return _broker
+
+
+def appointment_payload(appointment):
+    service = appointment.service
+    return {
+        'id': appointment.pk,
+        'service': service.pk,
+        'service_name': service.name,
+        'client': appointment.client_id,
+        'date': appointment.date,
+        'time': appointment.time,
+        'status': appointment.status,
+    }
+
+
+def publish_appointment_event(event_type, appointment, **extra):
+    """Publish to the appointment's provider and client once the write commits."""
+    event = {'type': event_type, 'appointment': appointment_payload(appointment), **extra}
+    channels = [provider_channel(appointment.service.provider_id), client_channel(appointment.client_id)]
+
+    def publish():
+        # A failed push must never fail the booking
+        try:
+            get_broker().publish(channels, event)
+        except Exception:
+            logger.exception('Could not publish %s for appointment %s', event_type, appointment.pk)
+    transaction.on_commit(publish)
+
+
+def format_event(event):
+    """Server-sent events wire format."""
+    data = json.dumps(event, cls=DjangoJSONEncoder)
+    return f'event: {event["type"]}\ndata: {data}\n\n'
@@ -0,0 +1,35 @@
+"""
+What the appointment export contains (streamed by kunapet_backend/exports.py).
+"""
+from .models import Appointment
+
+COLUMNS = [
+    ('id', 'id'),
+    ('date', 'date'),
+    ('time', 'time'),
+    ('status', 'status'),
+    ('service_id', 'service_id'),
+    ('service', 'service__name'),
+    ('price', 'service__price'),
+    ('duration', 'service__duration'),
+    ('client_email', 'client__email'),
+    ('notes', 'notes'),
+    ('created_at', 'created_at'),
+]
+STATUSES = [value for value, _ in Appointment.STATUS_CHOICES]
+
+
+def export_queryset(provider_id=None, client_id=None, start=None, end=None, statuses=None):
+    """A provider's or a client's appointments (every one if neither), oldest first."""
+    queryset = Appointment.objects.all()
+    if provider_id is not None:
+        queryset = queryset.filter(service__provider_id=provider_id)
+    if client_id is not None:
+        queryset = queryset.filter(client_id=client_id)
+    if start:
+        queryset = queryset.filter(date__gte=start)
+    if end:
+        queryset = queryset.filter(date__lte=end)
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+    return queryset.order_by('date', 'time', 'id')
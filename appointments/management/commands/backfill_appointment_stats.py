@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments.stats import backfill
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the daily appointment rollups behind /api/appointments/stats/ from the appointments table '
+        '(first deploy, or after writes that bypassed the Appointment signals).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild (YYYY-MM-DD); default: the earliest')
+        parser.add_argument('--end', help='Last day to rebuild (YYYY-MM-DD); default: the latest')
+        parser.add_argument('--provider', type=int, help='Only this provider profile id')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else None
+            end = date.fromisoformat(options['end']) if options['end'] else None
+        except ValueError:
+            raise CommandError('Dates must use the YYYY-MM-DD format.')
+
+        written = backfill(start, end, provider_id=options['provider'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{written} daily rollup rows written'))
@@ -0,0 +1,53 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments import exports as appointment_exports
+from kunapet_backend.exports import FORMATS, parse_filters, write_export
+from services import exports as service_exports
+
+KINDS = ('appointments', 'services')
+
+
+class Command(BaseCommand):
+    help = 'Stream appointments or services to a CSV or JSONL file with constant memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=KINDS)
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', '-o', default='-', help='File to write (default: stdout)')
+        parser.add_argument('--provider', type=int, help='Only this provider profile id')
+        parser.add_argument('--client', type=int, help='Only this client user id (appointments)')
+        parser.add_argument('--start', help='First day (YYYY-MM-DD): appointment date / service creation date')
+        parser.add_argument('--end', help='Last day (YYYY-MM-DD)')
+        parser.add_argument('--status', help='Comma-separated statuses (services: active,inactive)')
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        module = appointment_exports if kind == 'appointments' else service_exports
+        params = {name: options[name] for name in ('start', 'end', 'status') if options[name]}
+        start, end, statuses, error = parse_filters(params, module.STATUSES)
+        if error:
+            raise CommandError(error)
+
+        filters = {'provider_id': options['provider'], 'start': start, 'end': end, 'statuses': statuses}
+        if kind == 'appointments':
+            filters['client_id'] = options['client']
+        elif options['client'] is not None:
+            raise CommandError('--client only applies to appointments.')
+        queryset = module.export_queryset(**filters)
+
+        started = time.perf_counter()
+        try:
+            if options['output'] == '-':
+                written = write_export(queryset, module.COLUMNS, options['format'], sys.stdout.buffer)
+                sys.stdout.buffer.flush()
+            else:
+                with open(options['output'], 'wb') as stream:
+                    written = write_export(queryset, module.COLUMNS, options['format'], stream)
+        except OSError as e:
+            raise CommandError(str(e))
+        self.stderr.write(self.style.SUCCESS(
+            f'{kind} exported: {written / 2 ** 20:.1f} MB in {time.perf_counter() - started:.2f}s'
+        ))
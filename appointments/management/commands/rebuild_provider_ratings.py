@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from appointments.models import Review
+from appointments.reviews import average
+from services.cache import invalidate_catalog
+from users.models import ProviderProfile
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute every provider\'s rating_sum/review_count/rating from the reviews table in bulk '
+        '(repairs drift after writes that bypassed the Review signals).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many providers drifted')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # 1. True totals with ONE grouped query
+            totals = {
+                row['provider_id']: (row['rating_sum'], row['review_count'])
+                for row in Review.objects.order_by().values('provider_id').annotate(
+                    rating_sum=Sum('rating'), review_count=Count('id'),
+                )
+            }
+
+            # 2. Compare with what is stored (one more query) and keep the drifted rows
+            drifted, now = [], timezone.now()
+            stored = ProviderProfile.objects.values_list('id', 'rating_sum', 'review_count', 'rating')
+            for provider_id, rating_sum, review_count, rating in stored.iterator(chunk_size=options['batch_size']):
+                true_sum, true_count = totals.get(provider_id, (0, 0))
+                true_rating = average(true_sum, true_count)
+                if (rating_sum, review_count, rating) != (true_sum, true_count, true_rating):
+                    drifted.append(ProviderProfile(
+                        id=provider_id, rating_sum=true_sum, review_count=true_count, rating=true_rating,
+                        updated_at=now,
+                    ))
+
+            # 3. Write them back in bulk
+            if drifted and not options['dry_run']:
+                ProviderProfile.objects.bulk_update(
+                    drifted, ['rating_sum', 'review_count', 'rating', 'updated_at'], batch_size=options['batch_size'],
+                )
+
+        if not options['dry_run']:
+            # Service pages show the rating, ?provider_id= slices included
+            for profile in drifted:
+                invalidate_catalog(profile.id)
+        verb = 'would be fixed' if options['dry_run'] else 'fixed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(totals)} providers with reviews, {len(drifted)} {verb}'
+        ))
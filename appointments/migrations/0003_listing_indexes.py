@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_unique_active_service_slot'),
+        ('services', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Create the composite indexes before dropping the FK ones they cover
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['client', '-date', '-time', 'id'], name='appt_client_date_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['service', '-date', '-time', 'id'], name='appt_service_date_time_idx'),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='client',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='appointments', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='service',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='appointments', to='services.service'),
+        ),
+    ]
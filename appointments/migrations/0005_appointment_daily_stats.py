@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0004_review'),
+        ('services', '0003_search_index'),
+        ('users', '0004_provider_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('cancelled', 'Cancelled'), ('completed', 'Completed')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('provider', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='users.providerprofile')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='services.service')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('provider', 'day', 'service', 'status'), name='unique_daily_stat')],
+            },
+        ),
+    ]
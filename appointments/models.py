@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from services.models import Service
+from users.models import ProviderProfile
 
 class Appointment(models.Model):
     STATUS_CHOICES = [
@@ -10,16 +11,95 @@ class Appointment(models.Model):
         ('completed', 'Completed'),
     ]
 
-    client = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='appointments')
-    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='appointments')
+    # FK indexes are covered by the composite indexes in Meta
+    client = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='appointments', db_index=False)
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='appointments', db_index=False)
     date = models.DateField()
     time = models.TimeField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     notes = models.TextField(blank=True, help_text="Special instructions from client")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Validator of conditional GETs; set by bulk/update() writes too
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-date', '-time']
+        indexes = [
+            # Client listing: client_id = ? ORDER BY date DESC, time DESC, id
+            models.Index(fields=['client', '-date', '-time', 'id'], name='appt_client_date_time_idx'),
+            # Provider listing (via service) and availability lookups by day
+            models.Index(fields=['service', '-date', '-time', 'id'], name='appt_service_date_time_idx'),
+        ]
+        constraints = [
+            # Backstop for the provider lock in booking.py: never two active
+            # bookings of the same service at the same start time.
+            models.UniqueConstraint(
+                fields=['service', 'date', 'time'],
+                condition=~models.Q(status='cancelled'),
+                name='unique_active_service_slot',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The rollup signals read the stored row (pre_save) and count the
+        # new one (post_save); both must happen in the write's transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.client.email} - {self.service.name} ({self.date})"
+
+
+class Review(models.Model):
+    """
+    A client's rating of a completed appointment. Each write adjusts the
+    provider's running rating_sum/review_count (appointments/reviews.py).
+    """
+    appointment = models.OneToOneField(Appointment, on_delete=models.CASCADE, related_name='review')
+    # Denormalized from appointment.service.provider for the aggregates and listings
+    provider = models.ForeignKey(ProviderProfile, on_delete=models.CASCADE, related_name='reviews', db_index=False)
+    rating = models.PositiveSmallIntegerField()
+    comment = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Provider reviews listing: provider_id = ? ORDER BY created_at DESC, id DESC
+            models.Index(fields=['provider', '-created_at', '-id'], name='review_provider_created_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(rating__gte=1, rating__lte=5), name='review_rating_1_to_5'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The rating signals read the stored row (pre_save) and apply the
+        # delta (post_save); both must happen in the write's transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.rating}/5 for appointment {self.appointment_id}"
+
+
+class AppointmentDailyStat(models.Model):
+    """
+    Bookings of a service per day and status, and the revenue of the
+    completed ones. Kept up to date by the Appointment signals
+    (appointments/stats.py); the provider dashboard reads only this table.
+    """
+    # FK index covered by the unique constraint
+    provider = models.ForeignKey(ProviderProfile, on_delete=models.CASCADE, related_name='daily_stats', db_index=False)
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            # Dashboard: provider_id = ? AND day BETWEEN ? AND ?
+            models.UniqueConstraint(fields=['provider', 'day', 'service', 'status'], name='unique_daily_stat'),
+        ]
+
+    def __str__(self):
+        return f"{self.service_id} {self.day} {self.status}: {self.count}"
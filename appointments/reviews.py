@@ -0,0 +1,58 @@
+"""
+Provider rating aggregates.
+
+ProviderProfile keeps rating_sum and review_count as running totals, and
+rating = rating_sum / review_count next to them. Every Review write
+applies its delta to those three columns under a row lock. Nothing ever
+runs AVG() over the reviews table, so reading or sorting by rating costs
+the same as any other column.
+
+The deltas come from the Review signals in appointments.signals, so
+cascading deletes are counted too. They are taken against the stored
+review, read under a lock in the same transaction as the write. QuerySet.update()/bulk_create() on
+Review bypass them; run `manage.py rebuild_provider_ratings` afterwards.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from users.models import ProviderProfile
+from .models import Review
+
+TWO_PLACES = Decimal('0.01')
+
+
+def average(rating_sum, review_count):
+    if not review_count:
+        return Decimal('0.00')
+    return (Decimal(rating_sum) / review_count).quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
+
+
+def stored_rating(pk):
+    """
+    (provider_id, rating) of review `pk` as stored, or None if there is no
+    such row. The row stays locked until the transaction ends, so
+    concurrent edits each apply their delta to what the previous one wrote.
+    """
+    if pk is None:
+        return None
+    return Review.objects.select_for_update().filter(pk=pk).values_list('provider_id', 'rating').first()
+
+
+def apply_rating_delta(provider_id, sum_delta, count_delta):
+    """Add a review delta to a provider's running totals."""
+    if not sum_delta and not count_delta:
+        return
+    with transaction.atomic():
+        totals = (
+            ProviderProfile.objects.select_for_update()
+            .filter(pk=provider_id).values_list('rating_sum', 'review_count').first()
+        )
+        if totals is None:
+            return  # provider being deleted along with its reviews
+        rating_sum, review_count = totals[0] + sum_delta, totals[1] + count_delta
+        ProviderProfile.objects.filter(pk=provider_id).update(
+            rating_sum=rating_sum, review_count=review_count, rating=average(rating_sum, review_count),
+            updated_at=timezone.now(),
+        )
@@ -1,9 +1,13 @@
 from rest_framework import serializers
-from .models import Appointment
+from kunapet_backend.fields import SparseFieldsMixin
+from .models import Appointment, Review
+from .booking import book
+from .events import CREATED, RESCHEDULED, STATUS_CHANGED, publish_appointment_event
 from services.serializers import ServiceSerializer
+from users.authentication import user_instance
 from users.serializers import UserSerializer
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # Read-only nested fields for display
     service_details = ServiceSerializer(source='service', read_only=True)
     client_details = UserSerializer(source='client', read_only=True)
@@ -15,8 +19,31 @@ class AppointmentSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         # Automatically assign the authenticated user as the client
-        validated_data['client'] = self.context['request'].user
-        return super().create(validated_data)
+        validated_data['client'] = user_instance(self.context['request'].user)
+        appointment = book(
+            validated_data['service'], validated_data['date'], validated_data['time'],
+            lambda: super(AppointmentSerializer, self).create(validated_data),
+        )
+        publish_appointment_event(CREATED, appointment)
+        return appointment
+
+    def update(self, instance, validated_data):
+        service = validated_data.get('service', instance.service)
+        day = validated_data.get('date', instance.date)
+        start = validated_data.get('time', instance.time)
+        moved = (service.pk, day, start) != (instance.service_id, instance.date, instance.time)
+        if not moved:
+            return super().update(instance, validated_data)
+        if instance.status == 'cancelled':
+            appointment = super().update(instance, validated_data)
+        else:
+            appointment = book(
+                service, day, start,
+                lambda: super(AppointmentSerializer, self).update(instance, validated_data),
+                exclude_id=instance.pk,
+            )
+        publish_appointment_event(RESCHEDULED, appointment)
+        return appointment
 
 class AppointmentStatusSerializer(serializers.ModelSerializer):
     """
@@ -25,3 +52,27 @@ class AppointmentStatusSerializer(serializers.ModelSerializer):
     class Meta:
         model = Appointment
         fields = ['status']
+
+    def update(self, instance, validated_data):
+        previous_status = instance.status
+        # Re-activating a cancelled booking must not collide with newer ones
+        if instance.status == 'cancelled' and validated_data.get('status', 'cancelled') != 'cancelled':
+            appointment = book(
+                instance.service, instance.date, instance.time,
+                lambda: super(AppointmentStatusSerializer, self).update(instance, validated_data),
+                exclude_id=instance.pk,
+            )
+        else:
+            appointment = super().update(instance, validated_data)
+        if appointment.status != previous_status:
+            publish_appointment_event(STATUS_CHANGED, appointment, previous_status=previous_status)
+        return appointment
+
+
+class ReviewSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    rating = serializers.IntegerField(min_value=1, max_value=5)
+
+    class Meta:
+        model = Review
+        fields = ['id', 'appointment', 'provider', 'rating', 'comment', 'created_at']
+        read_only_fields = ['id', 'appointment', 'provider', 'created_at']
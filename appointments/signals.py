@@ -0,0 +1,75 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from services import cache as catalog_cache
+from services.models import Service
+from .models import Appointment, Review
+from .reviews import apply_rating_delta, stored_rating
+from .stats import count_appointment, reprice_service, stat_key, stored_stat_key
+
+
+@receiver(pre_save, sender=Review)
+@receiver(pre_delete, sender=Review)
+def read_review_rating(sender, instance, **kwargs):
+    # Deltas are taken against the stored row, not the loaded copy
+    instance._counted = stored_rating(instance.pk)
+
+
+@receiver(post_save, sender=Review)
+def count_review(sender, instance, **kwargs):
+    counted = instance._counted
+    current = (instance.provider_id, instance.rating)
+    if counted == current:
+        return
+    if counted is None:
+        apply_rating_delta(instance.provider_id, instance.rating, 1)
+    elif counted[0] == instance.provider_id:
+        apply_rating_delta(instance.provider_id, instance.rating - counted[1], 0)
+    else:
+        apply_rating_delta(counted[0], -counted[1], -1)
+        apply_rating_delta(instance.provider_id, instance.rating, 1)
+    # Service listings show the provider's rating
+    catalog_cache.invalidate_catalog(instance.provider_id)
+
+
+@receiver(post_delete, sender=Review)
+def uncount_review(sender, instance, **kwargs):
+    if instance._counted is None:
+        return
+    provider_id, rating = instance._counted
+    apply_rating_delta(provider_id, -rating, -1)
+    catalog_cache.invalidate_catalog(provider_id)
+
+
+@receiver(pre_save, sender=Appointment)
+@receiver(pre_delete, sender=Appointment)
+def read_appointment_stat(sender, instance, **kwargs):
+    # Whatever the instance was loaded with (only(), an explicit pk, an
+    # older copy), the rollup that counts it is the stored row's
+    instance._stat_key = stored_stat_key(instance.pk)
+
+
+@receiver(post_save, sender=Appointment)
+def count_appointment_stat(sender, instance, **kwargs):
+    counted = instance._stat_key
+    current = stat_key(instance)
+    if counted == current:
+        return
+    if counted is not None:
+        count_appointment(instance, counted, -1)
+    count_appointment(instance, current, 1)
+
+
+@receiver(post_delete, sender=Appointment)
+def uncount_appointment_stat(sender, instance, **kwargs):
+    if instance._stat_key is not None:
+        count_appointment(instance, instance._stat_key, -1)
+
+
+@receiver(post_save, sender=Service)
+def reprice_appointment_stats(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded_price', None)
+    if created or loaded is None or loaded == instance.price:
+        return
+    reprice_service(instance.pk, instance.price)
+    instance._loaded_price = instance.price
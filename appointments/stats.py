@@ -0,0 +1,143 @@
+"""
+Provider analytics: daily appointment rollups.
+
+AppointmentDailyStat holds one row per (provider, service, day, status)
+with the number of appointments in it and, for 'completed', their revenue
+(count * Service.price). Rows are adjusted incrementally:
+
+  * creating an appointment adds 1 to its row,
+  * changing its status, date or service moves 1 from the old row to the
+    new one, deleting it removes 1 (Appointment signals; the old row is
+    the one stored, read under a lock in the same transaction),
+  * changing a service's price recomputes the revenue of its completed
+    rows (Service signal), so revenue always equals the live
+    SUM(price) over completed appointments.
+
+The dashboard then reads at most (days x statuses) rows per service
+instead of aggregating the appointments table. QuerySet.update() and
+bulk_create() on Appointment bypass the signals; run
+`manage.py backfill_appointment_stats` afterwards.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum, Value
+
+from services.models import Service
+from .models import Appointment, AppointmentDailyStat
+
+COMPLETED = 'completed'
+TWO_PLACES = Decimal('0.01')
+
+
+def stat_key(appointment):
+    """(service_id, day, status) of the rollup row counting `appointment`."""
+    day = Appointment._meta.get_field('date').to_python(appointment.date)
+    return appointment.service_id, day, appointment.status
+
+
+def stored_stat_key(pk):
+    """
+    stat_key() of appointment `pk` as stored, or None if there is no such
+    row. The row stays locked until the transaction ends, so concurrent
+    writers move it from one rollup to the next in turn.
+    """
+    if pk is None:
+        return None
+    return Appointment.objects.select_for_update().filter(pk=pk).values_list('service_id', 'date', 'status').first()
+
+
+def apply_stat_delta(provider_id, service_id, day, status, count_delta, revenue_delta):
+    """Add a delta to one rollup row, creating it on first use."""
+    key = {'provider_id': provider_id, 'service_id': service_id, 'day': day, 'status': status}
+    delta = {'count': F('count') + count_delta, 'revenue': F('revenue') + revenue_delta}
+    if AppointmentDailyStat.objects.filter(**key).update(**delta) or count_delta < 0:
+        # A missing row on removal means it is being cascade-deleted too
+        return
+    try:
+        with transaction.atomic():
+            AppointmentDailyStat.objects.create(**key, count=count_delta, revenue=revenue_delta)
+    except IntegrityError:
+        # Created concurrently
+        AppointmentDailyStat.objects.filter(**key).update(**delta)
+
+
+def count_appointment(appointment, key, sign):
+    """Add (sign=1) or remove (sign=-1) one appointment counted under `key`."""
+    service_id, day, status = key
+    if appointment.service_id == service_id and Appointment.service.is_cached(appointment):
+        provider_id, price = appointment.service.provider_id, appointment.service.price
+    else:
+        row = Service.objects.filter(pk=service_id).values_list('provider_id', 'price').first()
+        if row is None:
+            return  # service deleted along with its rollups
+        provider_id, price = row
+    revenue = Decimal(price) if status == COMPLETED else Decimal('0')
+    apply_stat_delta(provider_id, service_id, day, status, sign, sign * revenue)
+
+
+def reprice_service(service_id, price):
+    """Recompute the revenue of a service's completed rows after a price change."""
+    AppointmentDailyStat.objects.filter(service_id=service_id, status=COMPLETED).update(
+        revenue=F('count') * Value(Decimal(price)),
+    )
+
+
+def backfill(start=None, end=None, provider_id=None, batch_size=1000):
+    """
+    Rebuild the rollup rows for [start, end] (all days if None) of one or
+    every provider from the appointments table. Returns the rows written.
+    """
+    appointments = Appointment.objects.order_by()
+    stats = AppointmentDailyStat.objects.all()
+    if start:
+        appointments, stats = appointments.filter(date__gte=start), stats.filter(day__gte=start)
+    if end:
+        appointments, stats = appointments.filter(date__lte=end), stats.filter(day__lte=end)
+    if provider_id:
+        appointments, stats = appointments.filter(service__provider_id=provider_id), stats.filter(provider_id=provider_id)
+
+    # ONE grouped query over the appointments
+    rows = [
+        AppointmentDailyStat(
+            provider_id=row['service__provider_id'], service_id=row['service_id'], day=row['date'],
+            status=row['status'], count=row['total'],
+            revenue=row['revenue'] if row['status'] == COMPLETED else Decimal('0'),
+        )
+        for row in appointments.values('service__provider_id', 'service_id', 'date', 'status').annotate(
+            total=Count('id'), revenue=Sum('service__price'),
+        )
+    ]
+    with transaction.atomic():
+        stats.delete()
+        AppointmentDailyStat.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def daily_stats(provider_id, start, end, service_id=None):
+    """
+    Bookings per status for every day of [start, end] that has any, plus
+    totals and the revenue of completed appointments. Reads the rollups only.
+    """
+    stats = AppointmentDailyStat.objects.filter(provider_id=provider_id, day__range=(start, end), count__gt=0)
+    if service_id:
+        stats = stats.filter(service_id=service_id)
+
+    days = {}
+    bookings, revenue = defaultdict(int), Decimal('0')
+    for row in stats.values('day', 'status').annotate(total=Sum('count'), revenue=Sum('revenue')).order_by('day'):
+        day = days.setdefault(row['day'], {'date': row['day'].isoformat(), 'bookings': {}, 'revenue': Decimal('0')})
+        day['bookings'][row['status']] = row['total']
+        day['revenue'] += row['revenue'] or 0
+        bookings[row['status']] += row['total']
+        revenue += row['revenue'] or 0
+
+    for day in days.values():
+        day['revenue'] = str(day['revenue'].quantize(TWO_PLACES))
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'totals': {'bookings': dict(bookings), 'revenue': str(revenue.quantize(TWO_PLACES))},
+        'days': list(days.values()),
+    }
@@ -1,3 +1,1096 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gc
+import json
+import os
+import tempfile
+from datetime import date, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from kunapet_backend.test_utils import create_provider, explain_list_query
+from services.models import Service
+from users.models import ProviderProfile, User
+from users.serializers import PublicProviderSerializer
+from . import exports
+from .availability import IntervalSet, free_windows, service_slots
+from .events import InMemoryBroker, get_broker
+from .models import Appointment, AppointmentDailyStat, Review
+
+
+def create_client(email='client@kunapet.com'):
+    return User.objects.create_user(email=email, password='TestPassword123!', username=email, role=User.Role.CLIENT)
+
+
+class IntervalSetTests(TestCase):
+    def test_merges_overlapping_and_touching_intervals(self):
+        intervals = IntervalSet([(60, 90), (0, 30), (30, 45), (80, 120), (200, 210)])
+        self.assertEqual(list(intervals), [(0, 45), (60, 120), (200, 210)])
+
+    def test_overlaps(self):
+        intervals = IntervalSet([(60, 90), (120, 150)])
+        self.assertTrue(intervals.overlaps(80, 100))
+        self.assertTrue(intervals.overlaps(30, 61))
+        self.assertTrue(intervals.overlaps(100, 200))
+        self.assertFalse(intervals.overlaps(90, 120))
+        self.assertFalse(intervals.overlaps(0, 60))
+
+    def test_gaps(self):
+        intervals = IntervalSet([(60, 90), (120, 150)])
+        self.assertEqual(list(intervals.gaps(0, 180)), [(0, 60), (90, 120), (150, 180)])
+        self.assertEqual(list(intervals.gaps(70, 130)), [(90, 120)])
+
+
+class AvailabilityTests(TestCase):
+    def setUp(self):
+        self.provider = create_provider()
+        self.client_user = create_client()
+        self.service = Service.objects.create(
+            provider=self.provider, name='Consulta', description='General', price='50.00', duration=60,
+        )
+        self.other_service = Service.objects.create(
+            provider=self.provider, name='Baño', description='Grooming', price='30.00', duration=30,
+        )
+        self.day = timezone.localdate() + timedelta(days=1)
+
+    def book(self, service, day, start, status='pending'):
+        return Appointment.objects.create(client=self.client_user, service=service, date=day, time=start, status=status)
+
+    def test_slots_skip_bookings_of_every_provider_service(self):
+        self.book(self.service, self.day, time(10, 0))
+        self.book(self.other_service, self.day, time(13, 30))
+        self.book(self.service, self.day, time(15, 0), status='cancelled')
+
+        with self.settings(BUSINESS_HOURS={'start': '09:00', 'end': '17:00'}, AVAILABILITY_SLOT_MINUTES=30):
+            (day, slots), = service_slots(self.service, self.day, self.day)
+
+        self.assertEqual(day, self.day)
+        self.assertEqual(
+            [f'{s // 60:02d}:{s % 60:02d}' for s in slots],
+            ['09:00', '11:00', '11:30', '12:00', '12:30', '14:00', '14:30', '15:00', '15:30', '16:00'],
+        )
+
+    def test_free_windows(self):
+        self.book(self.service, self.day, time(10, 0))
+        with self.settings(BUSINESS_HOURS={'start': '09:00', 'end': '12:00'}):
+            (_, windows), = free_windows(self.provider.id, self.day, self.day)
+        self.assertEqual(windows, [(9 * 60, 10 * 60), (11 * 60, 12 * 60)])
+
+    def test_past_days_have_no_slots(self):
+        (_, slots), = service_slots(self.service, date(2000, 1, 1), date(2000, 1, 1))
+        self.assertEqual(slots, [])
+
+    def test_query_count_is_constant_in_range_length(self):
+        for offset in range(30):
+            self.book(self.service, self.day + timedelta(days=offset), time(9, 0))
+
+        with self.assertNumQueries(1):
+            service_slots(self.service, self.day, self.day)
+        with self.assertNumQueries(1):
+            service_slots(self.service, self.day, self.day + timedelta(days=29))
+
+
+class AvailabilityEndpointTests(APITestCase):
+    def setUp(self):
+        self.provider = create_provider()
+        self.service = Service.objects.create(
+            provider=self.provider, name='Consulta', description='General', price='50.00', duration=60,
+        )
+        self.day = timezone.localdate() + timedelta(days=1)
+
+    def test_service_availability(self):
+        response = self.client.get(
+            f'/api/services/{self.service.id}/availability/',
+            {'start': self.day.isoformat(), 'end': (self.day + timedelta(days=2)).isoformat()},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['days']), 3)
+        self.assertEqual(response.data['days'][0]['slots'][0], '09:00')
+
+    def test_provider_availability(self):
+        response = self.client.get(
+            f'/api/services/providers/{self.provider.id}/availability/', {'start': self.day.isoformat()},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['days'][0]['free'], [{'start': '09:00', 'end': '18:00'}])
+
+    def test_rejects_bad_ranges(self):
+        url = f'/api/services/{self.service.id}/availability/'
+        self.assertEqual(self.client.get(url, {'start': 'tomorrow'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '2030-01-02', 'end': '2030-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '2030-01-01', 'end': '2031-01-01'}).status_code, 400)
+
+
+class BookingConflictTests(APITestCase):
+    def setUp(self):
+        self.provider = create_provider()
+        self.client_user = create_client()
+        self.service = Service.objects.create(
+            provider=self.provider, name='Consulta', description='General', price='50.00', duration=60,
+        )
+        self.short_service = Service.objects.create(
+            provider=self.provider, name='Baño', description='Grooming', price='30.00', duration=30,
+        )
+        self.day = (timezone.localdate() + timedelta(days=1)).isoformat()
+        self.client.force_authenticate(self.client_user)
+
+    def book(self, service, start):
+        return self.client.post('/api/appointments/', {'service': service.id, 'date': self.day, 'time': start}, format='json')
+
+    def test_overlapping_bookings_are_rejected(self):
+        self.assertEqual(self.book(self.service, '10:00').status_code, 201)
+        self.assertEqual(self.book(self.service, '10:00').status_code, 400)
+        self.assertEqual(self.book(self.short_service, '10:30').status_code, 400)
+        self.assertEqual(self.book(self.short_service, '09:45').status_code, 400)
+        self.assertEqual(self.book(self.short_service, '11:00').status_code, 201)
+        self.assertEqual(Appointment.objects.count(), 2)
+
+    def test_other_providers_are_independent(self):
+        other = Service.objects.create(
+            provider=create_provider('other@kunapet.com', '20999999999'),
+            name='Consulta', description='General', price='50.00', duration=60,
+        )
+        self.assertEqual(self.book(self.service, '10:00').status_code, 201)
+        self.assertEqual(self.book(other, '10:00').status_code, 201)
+
+    def test_cancelled_bookings_free_the_slot(self):
+        self.assertEqual(self.book(self.service, '10:00').status_code, 201)
+        Appointment.objects.update(status='cancelled')
+        self.assertEqual(self.book(self.service, '10:00').status_code, 201)
+
+    def test_moving_into_a_taken_slot_is_rejected(self):
+        self.book(self.service, '10:00')
+        second = self.book(self.service, '12:00').data['id']
+        response = self.client.patch(f'/api/appointments/{second}/', {'time': '10:30'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(f'/api/appointments/{second}/', {'time': '12:30'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_reactivating_a_cancelled_booking_checks_conflicts(self):
+        first = self.book(self.service, '10:00').data['id']
+        Appointment.objects.filter(pk=first).update(status='cancelled')
+        self.book(self.service, '10:00')
+
+        self.client.force_authenticate(self.provider.user)
+        response = self.client.patch(f'/api/appointments/{first}/', {'status': 'confirmed'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Appointment.objects.get(pk=first).status, 'cancelled')
+
+
+class AppointmentQueryCountTests(APITestCase):
+    """
+    Pins the number of SQL queries of the appointment endpoints. Listing
+    must cost the same whatever the number of rows (no N+1 on the nested
+    service/client details).
+    """
+    def setUp(self):
+        self.provider = create_provider()
+        self.client_user = create_client()
+        self.service = Service.objects.create(
+            provider=self.provider, name='Consulta', description='General', price='50.00', duration=30,
+        )
+        self.day = timezone.localdate() + timedelta(days=1)
+
+    def authenticate(self, user):
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def seed(self, count):
+        start = Appointment.objects.count()
+        Appointment.objects.bulk_create(
+            Appointment(client=self.client_user, service=self.service, date=self.day + timedelta(days=start + i), time=time(9, 0))
+            for i in range(count)
+        )
+
+    def test_client_list(self):
+        # user lookup, ETag aggregate, page
+        self.authenticate(self.client_user)
+        self.seed(2)
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get('/api/appointments/').status_code, 200)
+        self.seed(25)
+        with self.assertNumQueries(3):
+            self.client.get('/api/appointments/')
+
+    def test_provider_list(self):
+        self.authenticate(self.provider.user)
+        self.seed(2)
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get('/api/appointments/').status_code, 200)
+        self.seed(25)
+        with self.assertNumQueries(3):
+            self.client.get('/api/appointments/')
+
+    def test_detail(self):
+        self.seed(1)
+        appointment = Appointment.objects.get()
+        for user in (self.client_user, self.provider.user):
+            self.authenticate(user)
+            with self.assertNumQueries(2):
+                self.assertEqual(self.client.get(f'/api/appointments/{appointment.id}/').status_code, 200)
+
+    def test_detail_of_a_stranger_is_forbidden(self):
+        self.seed(1)
+        appointment = Appointment.objects.get()
+        self.authenticate(create_client('stranger@kunapet.com'))
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(f'/api/appointments/{appointment.id}/').status_code, 403)
+
+
+class AppointmentPaginationTests(APITestCase):
+    def setUp(self):
+        self.provider = create_provider()
+        self.client_user = create_client()
+        self.service = Service.objects.create(
+            provider=self.provider, name='Consulta', description='General', price='50.00', duration=30,
+        )
+        self.client.force_authenticate(self.client_user)
+        self.day = date(2030, 1, 1)
+        # Several rows share (date, time) so the id tie-breaker matters
+        Appointment.objects.bulk_create(
+            Appointment(client=self.client_user, service=self.service, date=self.day + timedelta(days=i % 3), time=time(9 + i % 2, 0), status='cancelled')
+            for i in range(12)
+        )
+
+    def expected_ids(self):
+        return list(Appointment.objects.order_by('-date', '-time', 'id').values_list('id', flat=True))
+
+    def walk(self, url):
+        ids, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            ids += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        return ids, pages
+
+    def test_pages_follow_the_keyset_ordering(self):
+        ids, pages = self.walk('/api/appointments/?page_size=5')
+        self.assertEqual(ids, self.expected_ids())
+        self.assertEqual([len(page['results']) for page in pages], [5, 5, 2])
+        self.assertIsNone(pages[0]['previous'])
+
+    def test_previous_link_returns_the_same_page(self):
+        first = self.client.get('/api/appointments/?page_size=5').data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual([r['id'] for r in back['results']], [r['id'] for r in first['results']])
+        self.assertIsNone(back['previous'])
+
+    def test_cursor_is_stable_under_concurrent_inserts(self):
+        first = self.client.get('/api/appointments/?page_size=5').data
+        # A newer booking lands on "page one" after the client fetched it
+        Appointment.objects.create(client=self.client_user, service=self.service, date=date(2031, 1, 1), time=time(9, 0))
+        seen = [r['id'] for r in first['results']]
+        rest, _ = self.walk(first['next'])
+        self.assertEqual(seen + rest, self.expected_ids()[1:])
+
+    def test_deep_pages_do_not_use_offset(self):
+        first = self.client.get('/api/appointments/?page_size=2').data
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first['next'])
+        self.assertFalse(any('OFFSET' in q['sql'] for q in queries.captured_queries))
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/appointments/?cursor=garbage').status_code, 404)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class AppointmentQueryPlanTests(APITestCase):
+    """
+    Both listing paths must reach appointments through a composite index.
+    The client path is also pre-sorted by it; the provider path merges
+    several services and sorts the (already filtered) rows.
+    """
+    def setUp(self):
+        self.provider = create_provider()
+        self.client_user = create_client()
+
+    def test_client_list_uses_client_index(self):
+        self.client.force_authenticate(self.client_user)
+        plan = explain_list_query(self, '/api/appointments/', 'appointments_appointment')
+        self.assertIn('SEARCH appointments_appointment USING INDEX appt_client_date_time_idx (client_id=?)', plan)
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_provider_list_uses_service_index(self):
+        self.client.force_authenticate(self.provider.user)
+        plan = explain_list_query(self, '/api/appointments/', 'appointments_appointment')
+        self.assertIn('SEARCH appointments_appointment USING INDEX appt_service_date_time_idx (service_id=?)', plan)
+        self.assertFalse([step for step in plan if step.startswith('SCAN')], plan)
+
+
+class AppointmentSparseFieldsTests(APITestCase):
+    """?fields= trims both the response and the SQL; no parameter, no change."""
+    def setUp(self):
+        self.provider = create_provider()
+        self.client_user = create_client()
+        self.service = Service.objects.create(
+            provider=self.provider, name='Consulta', description='General', price='50.00', duration=30,
+        )
+        self.day = date(2030, 1, 1)
+        Appointment.objects.bulk_create(
+            Appointment(client=self.client_user, service=self.service, date=self.day + timedelta(days=i), time=time(9, 0))
+            for i in range(5)
+        )
+        self.client.force_authenticate(self.client_user)
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        sql = next(q['sql'] for q in queries.captured_queries if 'FROM "appointments_appointment"' in q['sql'] and 'COUNT(' not in q['sql'])
+        return response, sql, len(queries.captured_queries)
+
+    def test_default_output_is_unchanged(self):
+        response, _, _ = self.get('/api/appointments/')
+        row = response.data['results'][0]
+        self.assertEqual(
+            list(row), ['id', 'client', 'service', 'date', 'time', 'status', 'notes', 'created_at', 'service_details', 'client_details'],
+        )
+        self.assertEqual(list(row['service_details']), ['id', 'name', 'description', 'price', 'duration', 'is_active', 'created_at', 'provider_rating'])
+
+    def test_sparse_fields_are_neither_serialized_nor_queried(self):
+        response, sql, count = self.get('/api/appointments/', fields='id,status,service_details.name')
+        # ETag aggregate + page
+        self.assertEqual(count, 2)
+        self.assertEqual(response.data['results'][0], {'id': response.data['results'][0]['id'], 'status': 'pending', 'service_details': {'name': 'Consulta'}})
+        self.assertIn('"services_service"."name"', sql)
+        self.assertNotIn('"services_service"."description"', sql)
+        self.assertNotIn('"appointments_appointment"."notes"', sql)
+        self.assertNotIn('users_user', sql)
+
+    def test_bare_nested_name_keeps_the_whole_object(self):
+        response, sql, _ = self.get('/api/appointments/', fields='id,client_details')
+        row = response.data['results'][0]
+        self.assertEqual(list(row), ['id', 'client_details'])
+        self.assertEqual(row['client_details'], {'id': self.client_user.id, 'email': self.client_user.email, 'role': 'client'})
+        self.assertNotIn('services_service', sql)
+
+    def test_pages_walk_without_deferred_loads(self):
+        url, ids = '/api/appointments/', []
+        params = {'fields': 'id', 'page_size': 2}
+        while url:
+            with self.assertNumQueries(2):
+                response = self.client.get(url, params)
+            ids += [row['id'] for row in response.data['results']]
+            url, params = response.data['next'], None
+        self.assertEqual(ids, list(Appointment.objects.order_by('-date', '-time', 'id').values_list('id', flat=True)))
+
+    def test_detail_keeps_what_the_permission_reads(self):
+        appointment = Appointment.objects.first()
+        for user in (self.client_user, self.provider.user):
+            self.client.force_authenticate(user)
+            response, sql, count = self.get(f'/api/appointments/{appointment.id}/', fields='id')
+            self.assertEqual((response.data, count), ({'id': appointment.id}, 1))
+        self.client.force_authenticate(create_client('stranger@kunapet.com'))
+        self.assertEqual(self.client.get(f'/api/appointments/{appointment.id}/', {'fields': 'id'}).status_code, 403)
+
+    def test_opt_in_expansion(self):
+        response, _, count = self.get('/api/appointments/', fields='id,service_details.name', expand='service_details.provider')
+        self.assertEqual(count, 2)
+        self.assertEqual(
+            response.data['results'][0]['service_details'],
+            {'name': 'Consulta', 'provider': PublicProviderSerializer(self.provider).data},
+        )
+
+    def test_unknown_fields_are_ignored(self):
+        response, _, _ = self.get('/api/appointments/', fields='id,nope,service_details.nope')
+        self.assertEqual(response.data['results'][0], {'id': response.data['results'][0]['id'], 'service_details': {}})
+
+    def test_writes_ignore_the_parameters(self):
+        response = self.client.post('/api/appointments/?fields=id', {
+            'service': self.service.id, 'date': '2030-02-01', 'time': '10:00', 'notes': 'Vacuna',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['notes'], 'Vacuna')
+        self.assertIn('service_details', response.data)
+
+
+class AppointmentListParityTests(APITestCase):
+    """The values() fast path answers byte for byte like AppointmentSerializer."""
+    def setUp(self):
+        self.provider = create_provider()
+        self.provider.latitude, self.provider.longitude = 1e-05, -77.042793
+        self.provider.save()
+        self.client_user = create_client()
+        self.service = Service.objects.create(
+            provider=self.provider, name='Baño y corte \u2028 🐶', description='"Especial"\n', price='1234.50', duration=45,
+        )
+        Appointment.objects.bulk_create(
+            Appointment(
+                client=self.client_user, service=self.service, date=date(2030, 1, 1) + timedelta(days=i // 3),
+                time=time(9 + i % 3, 30), status=['pending', 'confirmed', 'cancelled'][i % 3], notes=f'Nota {i} ñ',
+            )
+            for i in range(9)
+        )
+
+    def assert_parity(self, **params):
+        url, pages = '/api/appointments/', 0
+        while url:
+            with override_settings(FAST_LIST_PATH=False):
+                expected = self.client.get(url, params)
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, expected.content)
+            url, params, pages = response.data['next'], None, pages + 1
+        return pages
+
+    def test_client_and_provider_lists(self):
+        for user in (self.client_user, self.provider.user):
+            self.client.force_authenticate(user)
+            self.assertEqual(self.assert_parity(page_size=4), 3)
+
+    def test_sparse_and_expanded(self):
+        self.client.force_authenticate(self.client_user)
+        self.assert_parity(fields='id,status,service_details.name,client_details')
+        # latitude 1e-05 is printed by the regular renderer
+        self.assert_parity(expand='service_details.provider')
+
+    def test_fast_path_queries_values(self):
+        self.client.force_authenticate(self.client_user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/appointments/', {'fields': 'id,service_details.name'})
+        self.assertEqual(len(queries.captured_queries), 2)
+        sql = queries.captured_queries[-1]['sql']
+        self.assertIn('"services_service"."name" AS "service__name"', sql)
+        self.assertNotIn('"services_service"."description"', sql)
+
+
+class AppointmentConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.provider = create_provider()
+        self.client_user = create_client()
+        self.service = Service.objects.create(
+            provider=self.provider, name='Consulta', description='General', price='50.00', duration=30,
+        )
+        self.appointment = Appointment.objects.create(
+            client=self.client_user, service=self.service, date=date(2030, 1, 1), time=time(9, 0),
+        )
+        self.url = f'/api/appointments/{self.appointment.id}/'
+
+    def test_detail_revalidation(self):
+        self.client.force_authenticate(self.client_user)
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.force_authenticate(self.provider.user)
+        self.client.patch(self.url, {'status': 'confirmed'}, format='json')
+        self.client.force_authenticate(self.client_user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.data['status']), (200, 'confirmed'))
+
+    def test_strangers_get_403_not_304(self):
+        self.client.force_authenticate(self.client_user)
+        etag = self.client.get(self.url)['ETag']
+        self.client.force_authenticate(create_client('stranger@kunapet.com'))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 403)
+
+    def test_list_follows_embedded_service(self):
+        self.client.force_authenticate(self.client_user)
+        etag = self.client.get('/api/appointments/')['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/appointments/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # service_details changes with the service
+        self.service.name = 'Consulta general'
+        self.service.save()
+        response = self.client.get('/api/appointments/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        # ...and with the provider's rating (update(), no save())
+        etag = response['ETag']
+        Review.objects.create(appointment=self.appointment, provider=self.provider, rating=5)
+        self.assertEqual(self.client.get('/api/appointments/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ReviewTests(APITestCase):
+    def setUp(self):
+        self.provider = create_provider()
+        self.service = Service.objects.create(
+            provider=self.provider, name='Consulta', description='General', price='50.00', duration=30,
+        )
+        self.clients = [create_client(f'client{i}@kunapet.com') for i in range(3)]
+        self.appointments = [
+            Appointment.objects.create(
+                client=client, service=self.service, date=date(2024, 1, 1), time=time(9 + i), status='completed',
+            )
+            for i, client in enumerate(self.clients)
+        ]
+
+    def review(self, index, rating, method='post'):
+        self.client.force_authenticate(self.clients[index])
+        url = f'/api/appointments/{self.appointments[index].id}/review/'
+        return getattr(self.client, method)(url, {'rating': rating, 'comment': 'ok'}, format='json')
+
+    def totals(self):
+        self.provider.refresh_from_db()
+        return self.provider.rating_sum, self.provider.review_count, self.provider.rating
+
+    def test_running_totals_follow_every_write(self):
+        self.assertEqual(self.review(0, 5).status_code, 201)
+        self.assertEqual(self.review(1, 4).status_code, 201)
+        self.assertEqual(self.review(2, 4).status_code, 201)
+        self.assertEqual(self.totals(), (13, 3, Decimal('4.33')))
+
+        self.assertEqual(self.review(1, 1, method='patch').status_code, 200)
+        self.assertEqual(self.totals(), (10, 3, Decimal('3.33')))
+
+        self.client.force_authenticate(self.clients[0])
+        self.assertEqual(self.client.delete(f'/api/appointments/{self.appointments[0].id}/review/').status_code, 204)
+        self.assertEqual(self.totals(), (5, 2, Decimal('2.50')))
+
+        # Cascading deletes are counted too
+        self.appointments[2].delete()
+        self.assertEqual(self.totals(), (1, 1, Decimal('1.00')))
+
+    def test_stale_copies_apply_their_delta_to_the_stored_rating(self):
+        self.review(0, 5)
+        # Two PATCHes that loaded the review before either saved
+        first, second = Review.objects.get(), Review.objects.get()
+        first.rating = 2
+        first.save()
+        second.rating = 3
+        second.save()
+        self.assertEqual(self.totals(), (3, 1, Decimal('3.00')))
+        first.delete()
+        self.assertEqual(self.totals(), (0, 0, Decimal('0.00')))
+
+    def test_write_does_not_aggregate(self):
+        self.review(0, 5)
+        with CaptureQueriesContext(connection) as queries:
+            self.review(1, 3)
+        self.assertFalse([q for q in queries.captured_queries if 'AVG(' in q['sql'] or 'SUM(' in q['sql']])
+
+    def test_only_the_client_of_a_completed_appointment_can_review(self):
+        self.appointments[0].status = 'confirmed'
+        self.appointments[0].save()
+        self.assertEqual(self.review(0, 5).status_code, 400)
+
+        self.client.force_authenticate(self.clients[2])
+        response = self.client.post(f'/api/appointments/{self.appointments[1].id}/review/', {'rating': 5}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+        self.assertEqual(self.review(1, 6).status_code, 400)
+        self.assertEqual(self.review(1, 5).status_code, 201)
+        self.assertEqual(self.review(1, 5).status_code, 400)  # already reviewed
+        self.assertEqual(self.totals(), (5, 1, Decimal('5.00')))
+
+        # The provider can read it
+        self.client.force_authenticate(self.provider.user)
+        self.assertEqual(self.client.get(f'/api/appointments/{self.appointments[1].id}/review/').data['rating'], 5)
+        response = self.client.get(f'/api/appointments/providers/{self.provider.id}/reviews/')
+        self.assertEqual([row['rating'] for row in response.data['results']], [5])
+
+    def test_rating_sorted_listings(self):
+        other = create_provider('other@kunapet.com', '20999999999')
+        Service.objects.create(provider=other, name='Baño', description='Grooming', price='30.00', duration=30)
+        self.review(0, 3)
+        Review.objects.create(
+            appointment=Appointment.objects.create(
+                client=self.clients[1], service=other.services.get(), date=date(2024, 1, 2), time=time(9), status='completed',
+            ),
+            provider=other, rating=5,
+        )
+        self.client.force_authenticate(None)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/providers/')
+        self.assertEqual([row['id'] for row in response.data['results']], [other.id, self.provider.id])
+        self.assertEqual(response.data['results'][0]['review_count'], 1)
+
+        response = self.client.get('/api/services/', {'ordering': 'rating', 'page_size': 1})
+        self.assertEqual([row['name'] for row in response.data['results']], ['Baño'])
+        self.assertEqual(response.data['results'][0]['provider_rating'], '5.00')
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['name'] for row in response.data['results']], ['Consulta'])
+
+    def test_rebuild_command_repairs_drift(self):
+        self.review(0, 5)
+        self.review(1, 2)
+        # Writes that bypass the signals
+        Review.objects.filter(appointment=self.appointments[1]).update(rating=4)
+        ProviderProfile.objects.filter(pk=self.provider.pk).update(review_count=7)
+        slice_url = f'/api/services/?provider_id={self.provider.id}'
+        self.assertEqual(self.client.get(slice_url).data['results'][0]['provider_rating'], '3.50')
+        out = StringIO()
+        call_command('rebuild_provider_ratings', stdout=out)
+        self.assertIn('1 fixed', out.getvalue())
+        self.assertEqual(self.totals(), (9, 2, Decimal('4.50')))
+        # The provider's cached catalog slice is not served stale
+        self.assertEqual(self.client.get(slice_url).data['results'][0]['provider_rating'], '4.50')
+
+        out = StringIO()
+        call_command('rebuild_provider_ratings', stdout=out)
+        self.assertIn('0 fixed', out.getvalue())
+
+
+class AppointmentStatsTests(APITestCase):
+    def setUp(self):
+        self.provider = create_provider()
+        self.consulta = Service.objects.create(
+            provider=self.provider, name='Consulta', description='General', price='50.00', duration=30,
+        )
+        self.bano = Service.objects.create(
+            provider=self.provider, name='Baño', description='Grooming', price='30.00', duration=30,
+        )
+        self.client_user = create_client()
+        self.day = date(2024, 3, 1)
+
+    def book(self, service, day, hour, status='pending'):
+        return Appointment.objects.create(client=self.client_user, service=service, date=day, time=time(hour), status=status)
+
+    def rollups(self):
+        return list(
+            AppointmentDailyStat.objects.filter(count__gt=0).order_by('day', 'service_id', 'status')
+            .values_list('service_id', 'day', 'status', 'count', 'revenue')
+        )
+
+    def assert_matches_backfill(self):
+        incremental = self.rollups()
+        call_command('backfill_appointment_stats', stdout=StringIO())
+        self.assertEqual(incremental, self.rollups())
+
+    def test_rollups_follow_every_write(self):
+        first = self.book(self.consulta, self.day, 9, 'completed')
+        second = self.book(self.consulta, self.day, 10)
+        self.book(self.bano, self.day, 9, 'completed')
+        self.assertEqual(self.rollups(), [
+            (self.consulta.id, self.day, 'completed', 1, Decimal('50.00')),
+            (self.consulta.id, self.day, 'pending', 1, Decimal('0.00')),
+            (self.bano.id, self.day, 'completed', 1, Decimal('30.00')),
+        ])
+
+        # Status change on a freshly loaded row, and a move to another day
+        second = Appointment.objects.get(pk=second.pk)
+        second.status = 'completed'
+        second.save()
+        first.date = self.day + timedelta(days=1)
+        first.save()
+        self.assertEqual(self.rollups(), [
+            (self.consulta.id, self.day, 'completed', 1, Decimal('50.00')),
+            (self.bano.id, self.day, 'completed', 1, Decimal('30.00')),
+            (self.consulta.id, self.day + timedelta(days=1), 'completed', 1, Decimal('50.00')),
+        ])
+        self.assert_matches_backfill()
+
+        Appointment.objects.get(pk=first.pk).delete()
+        self.assertEqual(len(self.rollups()), 2)
+        self.assert_matches_backfill()
+
+    def test_partial_and_stale_instances_move_the_stored_row(self):
+        appointment = self.book(self.consulta, self.day, 9)
+        # Loaded without the key fields, and built with an explicit pk
+        partial = Appointment.objects.only('id', 'notes').get(pk=appointment.pk)
+        partial.notes = 'Ayuno'
+        partial.save()
+        rebuilt = Appointment(
+            pk=appointment.pk, client=self.client_user, service=self.consulta, date=self.day, time=time(9),
+            status='confirmed', created_at=appointment.created_at,
+        )
+        rebuilt.save()
+        self.assertEqual(self.rollups(), [(self.consulta.id, self.day, 'confirmed', 1, Decimal('0.00'))])
+
+        # Two copies loaded before either write, saved one after the other
+        first, second = Appointment.objects.get(pk=appointment.pk), Appointment.objects.get(pk=appointment.pk)
+        first.status = 'completed'
+        first.save()
+        second.status = 'cancelled'
+        second.save()
+        self.assertEqual(self.rollups(), [(self.consulta.id, self.day, 'cancelled', 1, Decimal('0.00'))])
+        first.delete()
+        self.assertEqual(self.rollups(), [])
+        self.assert_matches_backfill()
+
+    def test_price_change_reprices_revenue(self):
+        self.book(self.consulta, self.day, 9, 'completed')
+        self.book(self.consulta, self.day, 10, 'completed')
+        service = Service.objects.get(pk=self.consulta.pk)
+        service.price = Decimal('60.00')
+        service.save()
+        self.assertEqual(AppointmentDailyStat.objects.get(status='completed').revenue, Decimal('120.00'))
+        self.assert_matches_backfill()
+
+    def test_booking_through_the_api_is_counted(self):
+        self.client.force_authenticate(self.client_user)
+        day = timezone.localdate() + timedelta(days=1)
+        response = self.client.post('/api/appointments/', {
+            'service': self.consulta.id, 'date': day.isoformat(), 'time': '09:00',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        self.client.force_authenticate(self.provider.user)
+        response = self.client.patch(f'/api/appointments/{response.data["id"]}/', {'status': 'completed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.rollups(), [(self.consulta.id, day, 'completed', 1, Decimal('50.00'))])
+
+    def test_endpoint_reads_only_the_rollups(self):
+        self.book(self.consulta, self.day, 9, 'completed')
+        self.book(self.bano, self.day, 10, 'completed')
+        self.book(self.consulta, self.day, 11, 'cancelled')
+        self.book(self.consulta, self.day + timedelta(days=2), 9)
+        self.client.force_authenticate(self.provider.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/appointments/stats/', {'start': '2024-01-01', 'end': '2024-12-31'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries.captured_queries if 'appointments_appointment"' in q['sql']])
+        self.assertEqual(response.data['totals'], {
+            'bookings': {'completed': 2, 'cancelled': 1, 'pending': 1}, 'revenue': '80.00',
+        })
+        self.assertEqual(response.data['days'], [
+            {'date': '2024-03-01', 'bookings': {'cancelled': 1, 'completed': 2}, 'revenue': '80.00'},
+            {'date': '2024-03-03', 'bookings': {'pending': 1}, 'revenue': '0.00'},
+        ])
+
+        response = self.client.get('/api/appointments/stats/', {
+            'start': '2024-01-01', 'end': '2024-12-31', 'service': self.bano.id,
+        })
+        self.assertEqual(response.data['totals'], {'bookings': {'completed': 1}, 'revenue': '30.00'})
+
+        # Default range: the last year
+        response = self.client.get('/api/appointments/stats/')
+        self.assertEqual(response.data['end'], timezone.localdate().isoformat())
+
+    def test_endpoint_validation(self):
+        self.client.force_authenticate(self.client_user)
+        self.assertEqual(self.client.get('/api/appointments/stats/').status_code, 403)
+        self.client.force_authenticate(self.provider.user)
+        for params in ({'start': '2024-13-01'}, {'start': '2024-02-01', 'end': '2024-01-01'},
+                       {'start': '2020-01-01', 'end': '2024-01-01'}, {'service': 'x'}):
+            self.assertEqual(self.client.get('/api/appointments/stats/', params).status_code, 400)
+
+    def test_backfill_command_repairs_bypassed_writes(self):
+        Appointment.objects.bulk_create([
+            Appointment(client=self.client_user, service=self.consulta, date=self.day, time=time(9 + i), status='completed')
+            for i in range(3)
+        ])
+        self.assertEqual(self.rollups(), [])
+        out = StringIO()
+        call_command('backfill_appointment_stats', '--start', '2024-03-01', '--end', '2024-03-01', stdout=out)
+        self.assertIn('1 daily rollup rows written', out.getvalue())
+        self.assertEqual(self.rollups(), [(self.consulta.id, self.day, 'completed', 3, Decimal('150.00'))])
+
+
+class CalendarFeedTests(APITestCase):
+    def setUp(self):
+        self.provider = create_provider()
+        self.service = Service.objects.create(
+            provider=self.provider, name='Consulta', description='General', price='50.00', duration=45,
+        )
+        self.client_user = create_client()
+        self.appointment = Appointment.objects.create(
+            client=self.client_user, service=self.service, date=date(2024, 5, 2), time=time(9, 30),
+            status='confirmed', notes='Trae la cartilla; vacunas, por favor\nGracias',
+        )
+
+    def feed_url(self, user):
+        self.client.force_authenticate(user)
+        url = self.client.get('/api/appointments/calendar/').data['url']
+        self.client.force_authenticate(None)
+        return url
+
+    def fetch(self, url, **headers):
+        response = self.client.get(url, headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else b''
+        return response, body
+
+    def test_feed_streams_the_appointments(self):
+        url = self.feed_url(self.client_user)
+        with self.assertNumQueries(2):
+            response, body = self.fetch(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        text = body.decode()
+        self.assertTrue(text.startswith('BEGIN:VCALENDAR\r\n') and text.endswith('END:VCALENDAR\r\n'))
+        self.assertIn('UID:appointment-%d@kunapet\r\n' % self.appointment.id, text)
+        self.assertIn('DTSTART:20240502T093000Z\r\nDTEND:20240502T101500Z\r\n', text)
+        self.assertIn('SUMMARY:Consulta - KunaPet Vet\r\n', text)
+        self.assertIn('DESCRIPTION:Trae la cartilla\; vacunas\\, por favor\\nGracias\r\n', text)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in text.split('\r\n')))
+
+        other = create_client('other@kunapet.com')
+        _, body = self.fetch(self.feed_url(other))
+        self.assertNotIn(b'BEGIN:VEVENT', body)
+
+        _, body = self.fetch(self.feed_url(self.provider.user))
+        self.assertIn(b'SUMMARY:Consulta - client@kunapet.com\r\n', body)
+
+    def test_long_lines_are_folded(self):
+        self.appointment.notes = 'ñ' * 100
+        self.appointment.save()
+        _, body = self.fetch(self.feed_url(self.client_user))
+        lines = body.split(b'\r\n')
+        self.assertTrue(all(len(line) <= 75 for line in lines))
+        unfolded = body.replace(b'\r\n ', b'').decode()
+        self.assertIn('DESCRIPTION:' + 'ñ' * 100 + '\r\n', unfolded)
+
+    def test_etag_revalidation(self):
+        url = self.feed_url(self.provider.user)
+        response, _ = self.fetch(url)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response, _ = self.fetch(url, if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # A write changes the ETag, whichever worker serves the next poll
+        self.appointment.status = 'cancelled'
+        self.appointment.save()
+        response, body = self.fetch(url, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'STATUS:CANCELLED', body)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        self.service.name = 'Control'
+        self.service.save()
+        self.assertEqual(self.fetch(url, if_none_match=etag)[0].status_code, 200)
+
+        # ...and so does a deletion
+        etag = self.fetch(url)[0]['ETag']
+        Appointment.objects.create(
+            client=self.client_user, service=self.service, date=date(2024, 5, 3), time=time(9, 30),
+        ).delete()
+        self.assertEqual(self.fetch(url, if_none_match=etag)[0].status_code, 304)
+        self.appointment.delete()
+        self.assertEqual(self.fetch(url, if_none_match=etag)[0].status_code, 200)
+
+    def test_invalid_token(self):
+        url = self.feed_url(self.client_user)
+        self.assertEqual(self.client.get(url.replace('.ics', 'x.ics')).status_code, 404)
+        self.assertEqual(self.client.get('/api/appointments/calendar/client:1.ics').status_code, 404)
+
+
+class AppointmentExportTests(APITestCase):
+    def setUp(self):
+        self.provider = create_provider()
+        self.service = Service.objects.create(
+            provider=self.provider, name='Consulta', description='General', price='50.00', duration=30,
+        )
+        self.clients = [create_client(f'client{i}@kunapet.com') for i in range(2)]
+        for i, status in enumerate(['completed', 'cancelled', 'pending', 'completed']):
+            Appointment.objects.create(
+                client=self.clients[i % 2], service=self.service, date=date(2024, 1, 1 + i), time=time(9),
+                status=status, notes='Vacuna, "anual"' if i == 0 else '',
+            )
+
+    def export(self, fmt, user, **params):
+        self.client.force_authenticate(user)
+        response = self.client.get(f'/api/appointments/export.{fmt}', params, HTTP_ACCEPT='text/csv')
+        return response, b''.join(response.streaming_content).decode() if response.streaming else None
+
+    def test_provider_csv_export(self):
+        # profile lookup, rows
+        with self.assertNumQueries(2):
+            response, body = self.export('csv', self.provider.user)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="appointments.csv"')
+        rows = list(csv.reader(StringIO(body)))
+        self.assertEqual(rows[0], [name for name, _ in exports.COLUMNS])
+        self.assertEqual([row[1] for row in rows[1:]], ['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04'])
+        self.assertEqual(rows[1][5:10], ['Consulta', '50.00', '30', 'client0@kunapet.com', 'Vacuna, "anual"'])
+
+        _, body = self.export('csv', self.provider.user, status='completed,pending', start='2024-01-02')
+        self.assertEqual([row[1] for row in list(csv.reader(StringIO(body)))[1:]], ['2024-01-03', '2024-01-04'])
+
+    def test_client_jsonl_export(self):
+        response, body = self.export('jsonl', self.clients[1])
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([(row['date'], row['status']) for row in rows], [('2024-01-02', 'cancelled'), ('2024-01-04', 'completed')])
+        self.assertEqual(rows[0]['price'], '50.00')
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.export('csv', self.provider.user, status='done')[0].status_code, 400)
+        self.assertEqual(self.export('csv', self.provider.user, start='2024-02-01', end='2024-01-01')[0].status_code, 400)
+        self.assertEqual(self.export('xml', self.provider.user)[0].status_code, 404)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/appointments/export.csv').status_code, 401)
+
+    def test_export_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export.jsonl')
+            call_command(
+                'export_data', 'appointments', '--format', 'jsonl', '--output', path,
+                '--provider', str(self.provider.id), '--status', 'completed', stderr=StringIO(),
+            )
+            with open(path) as stream:
+                self.assertEqual([json.loads(line)['status'] for line in stream], ['completed', 'completed'])
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process (VmHWM on Linux)."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def reset_peak_rss():
+    # Linux >= 4.0; elsewhere the peak only ever grows, which can hide a
+    # regression but never fails a good export
+    try:
+        with open('/proc/self/clear_refs', 'w') as refs:
+            refs.write('5')
+    except OSError:
+        pass
+
+
+@skipUnless(os.environ.get('EXPORT_MEMORY_ROWS'), 'Set EXPORT_MEMORY_ROWS (e.g. 1000000) to run')
+class ExportMemoryTests(APITestCase):
+    """
+    Exports EXPORT_MEMORY_ROWS seeded appointments through the API and
+    checks that the peak RSS does not grow with them.
+        EXPORT_MEMORY_ROWS=1000000 python manage.py test appointments.tests.ExportMemoryTests
+    """
+    MAX_GROWTH_MB = 64
+
+    def test_export_memory_is_bounded(self):
+        rows = int(os.environ['EXPORT_MEMORY_ROWS'])
+        provider = create_provider()
+        service = Service.objects.create(provider=provider, name='Consulta', description='General', price='50.00', duration=1)
+        client = create_client()
+        for offset in range(0, rows, 10_000):
+            Appointment.objects.bulk_create([
+                Appointment(
+                    client=client, service=service, date=date(2020, 1, 1) + timedelta(days=i // 1440),
+                    time=time(i % 1440 // 60, i % 60), status='completed', notes='Consulta de control',
+                )
+                for i in range(offset, min(offset + 10_000, rows))
+            ])
+        gc.collect()
+
+        for fmt in ('csv', 'jsonl'):
+            self.client.force_authenticate(provider.user)
+            reset_peak_rss()
+            before = peak_rss_mb()
+            response = self.client.get(f'/api/appointments/export.{fmt}')
+            lines = size = 0
+            for chunk in response.streaming_content:
+                lines += chunk.count(b'\n')
+                size += len(chunk)
+            growth = peak_rss_mb() - before
+            self.assertEqual(lines, rows + (fmt == 'csv'))
+            self.assertLess(growth, self.MAX_GROWTH_MB, f'{fmt}: {size / 2 ** 20:.0f} MB exported, peak RSS +{growth:.0f} MB')
+
+
+@override_settings(APPOINTMENT_EVENTS_HEARTBEAT_SECONDS=0.05)
+class AppointmentEventTests(APITestCase):
+    def setUp(self):
+        self.provider = create_provider()
+        self.service = Service.objects.create(
+            provider=self.provider, name='Consulta', description='General', price='50.00', duration=30,
+        )
+        self.client_user = create_client()
+        self.other_client = create_client('other@kunapet.com')
+        self.day = (timezone.localdate() + timedelta(days=1)).isoformat()
+
+    async def open_stream(self, user):
+        token = str(RefreshToken.for_user(user).access_token)
+        response = await self.async_client.get('/api/appointments/events/', {'token': token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))  # subscribed from here on
+        return stream
+
+    async def next_event(self, stream):
+        """The next event, or None if only a heartbeat came."""
+        chunk = await anext(stream)
+        if chunk.startswith(b':'):
+            return None
+        kind, data = chunk.decode().strip().split('\n')
+        event = json.loads(data[len('data: '):])
+        self.assertEqual(kind, f'event: {event["type"]}')
+        return event
+
+    def write(self, user, method, url, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_authenticate(user)
+            return getattr(self.client, method)(url, data, format='json')
+
+    async def test_writes_reach_the_provider_and_client_streams(self):
+        provider_stream = await self.open_stream(self.provider.user)
+        client_stream = await self.open_stream(self.client_user)
+        other_stream = await self.open_stream(self.other_client)
+
+        response = await sync_to_async(self.write)(self.client_user, 'post', '/api/appointments/', {
+            'service': self.service.id, 'date': self.day, 'time': '09:00',
+        })
+        self.assertEqual(response.status_code, 201)
+        for stream in (provider_stream, client_stream):
+            event = await self.next_event(stream)
+            self.assertEqual(event['type'], 'appointment.created')
+            self.assertEqual(event['appointment']['id'], response.data['id'])
+            self.assertEqual(event['appointment']['time'], '09:00:00')
+        self.assertIsNone(await self.next_event(other_stream))
+
+        url = f'/api/appointments/{response.data["id"]}/'
+        await sync_to_async(self.write)(self.provider.user, 'patch', url, {'status': 'confirmed'})
+        for stream in (provider_stream, client_stream):
+            event = await self.next_event(stream)
+            self.assertEqual(
+                (event['type'], event['appointment']['status'], event['previous_status']),
+                ('appointment.status_changed', 'confirmed', 'pending'),
+            )
+
+        # No event when nothing changed
+        await sync_to_async(self.write)(self.provider.user, 'patch', url, {'status': 'confirmed'})
+        self.assertIsNone(await self.next_event(provider_stream))
+
+        # A client going away cancels the pending read; that unsubscribes
+        for stream in (provider_stream, client_stream, other_stream):
+            read = asyncio.ensure_future(anext(stream))
+            await asyncio.sleep(0)
+            read.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await read
+        self.assertEqual(get_broker().subscriber_count(), 0)
+
+    async def test_requires_a_token(self):
+        response = await self.async_client.get('/api/appointments/events/', {'token': 'nope'})
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get('/api/appointments/events/')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_inactive_users_get_no_stream(self):
+        token = str(RefreshToken.for_user(self.client_user).access_token)
+        self.client_user.is_active = False
+        await self.client_user.asave(update_fields=['is_active'])
+        response = await self.async_client.get('/api/appointments/events/', {'token': token})
+        self.assertEqual(response.status_code, 401)
+        # Opt-in claims auth skips the check, as it does for the API
+        with override_settings(JWT_CLAIMS_AUTH=True):
+            response = await self.async_client.get('/api/appointments/events/', {'token': token})
+        self.assertEqual(response.status_code, 200)
+        await response.streaming_content.aclose()
+
+    def test_not_served_over_wsgi(self):
+        self.client.force_authenticate(self.provider.user)
+        self.assertEqual(self.client.get('/api/appointments/events/').status_code, 501)
+
+    @override_settings(APPOINTMENT_EVENTS_QUEUE_SIZE=2)
+    async def test_slow_stream_gets_a_resync(self):
+        broker = InMemoryBroker()
+        subscription = broker.subscribe(['client:1'])
+        for index in range(3):
+            broker.publish(['client:1', 'client:2'], {'type': 'appointment.created', 'index': index})
+        self.assertEqual((await subscription.get(1))['type'], 'resync')
+        self.assertIsNone(await subscription.get(0.01))
+        subscription.close()
+        self.assertEqual(broker.subscriber_count(), 0)
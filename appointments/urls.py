@@ -1,7 +1,18 @@
 from django.urls import path
-from .views import AppointmentListCreateView, AppointmentDetailView
+from . import async_views
+from .views import (
+    AppointmentListCreateView, AppointmentDetailView, AppointmentReviewView, ProviderReviewListView,
+    AppointmentStatsView, CalendarFeedURLView, calendar_feed, AppointmentExportView,
+)
 
 urlpatterns = [
     path('', AppointmentListCreateView.as_view(), name='appointment-list-create'), # /api/appointments/
+    path('stats/', AppointmentStatsView.as_view(), name='appointment-stats'), # /api/appointments/stats/
+    path('calendar/', CalendarFeedURLView.as_view(), name='appointment-calendar'), # /api/appointments/calendar/
+    path('calendar/<str:token>.ics', calendar_feed, name='appointment-calendar-feed'),
+    path('export.<str:fmt>', AppointmentExportView.as_view(), name='appointment-export'), # /api/appointments/export.csv
+    path('events/', async_views.appointment_events, name='appointment-events'), # /api/appointments/events/ (SSE, ASGI)
     path('<int:pk>/', AppointmentDetailView.as_view(), name='appointment-detail'), # /api/appointments/1/
+    path('<int:pk>/review/', AppointmentReviewView.as_view(), name='appointment-review'), # /api/appointments/1/review/
+    path('providers/<int:provider_id>/reviews/', ProviderReviewListView.as_view(), name='provider-reviews'),
 ]
@@ -1,7 +1,28 @@
-from rest_framework import generics, permissions, filters
+from datetime import date, timedelta
+
+from rest_framework import generics, permissions, filters, status
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.db.models import Q
-from .models import Appointment
-from .serializers import AppointmentSerializer, AppointmentStatusSerializer
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.http import condition, require_GET
+from kunapet_backend.conditional import ConditionalGetMixin
+from kunapet_backend.exports import FORMATS, IgnoreClientContentNegotiation, export_response, parse_filters
+from kunapet_backend.fastpath import FastListMixin
+from kunapet_backend.fields import SparseQuerysetMixin
+from kunapet_backend.pagination import AppointmentPagination, NewestFirstPagination
+from users.models import ProviderProfile
+from . import exports
+from .calendar import feed_etag, feed_token, read_token, render_feed
+from .models import Appointment, Review
+from .serializers import AppointmentSerializer, AppointmentStatusSerializer, ReviewSerializer
+from .stats import daily_stats
 
 class IsOwnerOrProvider(permissions.BasePermission):
     """
@@ -9,15 +30,16 @@ class IsOwnerOrProvider(permissions.BasePermission):
     Providers see appointments for their services.
     """
     def has_object_permission(self, request, view, obj):
+        # Compare ids so that no extra user row is fetched
         # Check if user is the client who booked
-        if obj.client == request.user:
+        if obj.client_id == request.user.id:
             return True
         # Check if user is the provider of the service
-        if obj.service.provider.user == request.user:
+        if obj.service.provider.user_id == request.user.id:
             return True
         return False
 
-class AppointmentListCreateView(generics.ListCreateAPIView):
+class AppointmentListCreateView(ConditionalGetMixin, FastListMixin, SparseQuerysetMixin, generics.ListCreateAPIView):
     """
     GET: List appointments.
          - Clients see only their bookings.
@@ -26,17 +48,23 @@ class AppointmentListCreateView(generics.ListCreateAPIView):
     """
     serializer_class = AppointmentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = AppointmentPagination
+    # service_details embeds the service and its provider's rating
+    last_modified_fields = ('updated_at', 'service__updated_at', 'service__provider__updated_at')
 
     def get_queryset(self):
         user = self.request.user
+        # Nested service/client details are loaded in the same query
+        queryset = Appointment.objects.select_related('client', 'service__provider')
+        # Filter on ids: the request user may be a claims-only user
         if user.role == 'client':
-            return Appointment.objects.filter(client=user)
+            return queryset.filter(client_id=user.id)
         elif user.role == 'provider':
             # Filter appointments where the service belongs to this provider
-            return Appointment.objects.filter(service__provider__user=user)
+            return queryset.filter(service__provider__user_id=user.id)
         return Appointment.objects.none()
 
-class AppointmentDetailView(generics.RetrieveUpdateDestroyAPIView):
+class AppointmentDetailView(ConditionalGetMixin, SparseQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     GET: View details.
     PUT/PATCH: 
@@ -44,7 +72,10 @@ class AppointmentDetailView(generics.RetrieveUpdateDestroyAPIView):
         - Providers can change STATUS (confirm/cancel).
     DELETE: Cancel appointment.
     """
-    queryset = Appointment.objects.all()
+    # IsOwnerOrProvider reads these
+    sparse_keep = ('client', 'service__provider__user')
+    last_modified_fields = AppointmentListCreateView.last_modified_fields
+    queryset = Appointment.objects.select_related('client', 'service__provider')
     serializer_class = AppointmentSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrProvider]
 
@@ -53,3 +84,188 @@ class AppointmentDetailView(generics.RetrieveUpdateDestroyAPIView):
         if self.request.method == 'PATCH' and self.request.user.role == 'provider':
             return AppointmentStatusSerializer
         return AppointmentSerializer
+
+
+class AppointmentReviewView(generics.GenericAPIView):
+    """
+    /api/appointments/<id>/review/
+    GET: The review (client or provider of the appointment).
+    POST/PATCH/DELETE: The client of a completed appointment rates it 1-5.
+    Every write updates the provider's running rating (appointments/reviews.py).
+    """
+    serializer_class = ReviewSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_appointment(self, write=False):
+        appointment = get_object_or_404(Appointment.objects.select_related('service__provider'), pk=self.kwargs['pk'])
+        if appointment.client_id == self.request.user.id:
+            return appointment
+        if not write and appointment.service.provider.user_id == self.request.user.id:
+            return appointment
+        raise PermissionDenied()
+
+    def get_review(self, appointment):
+        return get_object_or_404(Review, appointment=appointment)
+
+    def get(self, request, pk):
+        review = self.get_review(self.get_appointment())
+        return Response(self.get_serializer(review).data)
+
+    def post(self, request, pk):
+        appointment = self.get_appointment(write=True)
+        if appointment.status != 'completed':
+            return Response({'error': 'Only completed appointments can be reviewed.'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            with transaction.atomic():
+                serializer.save(appointment=appointment, provider_id=appointment.service.provider_id)
+        except IntegrityError:
+            return Response({'error': 'This appointment has already been reviewed.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def patch(self, request, pk):
+        review = self.get_review(self.get_appointment(write=True))
+        serializer = self.get_serializer(review, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            serializer.save()
+        return Response(serializer.data)
+
+    def delete(self, request, pk):
+        review = self.get_review(self.get_appointment(write=True))
+        with transaction.atomic():
+            review.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ProviderReviewListView(SparseQuerysetMixin, generics.ListAPIView):
+    """
+    GET /api/appointments/providers/<provider_id>/reviews/
+    Public list of a provider's reviews, newest first.
+    """
+    serializer_class = ReviewSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = NewestFirstPagination
+
+    def get_queryset(self):
+        return Review.objects.filter(provider_id=self.kwargs['provider_id'])
+
+
+def parse_stats_range(query_params):
+    """
+    Read ?start=&end= (YYYY-MM-DD; default: the year up to today).
+    Returns (start, end, error_message).
+    """
+    try:
+        end = date.fromisoformat(query_params['end']) if query_params.get('end') else timezone.localdate()
+        start = date.fromisoformat(query_params['start']) if query_params.get('start') else end - timedelta(days=364)
+    except ValueError:
+        return None, None, 'Dates must use the YYYY-MM-DD format.'
+
+    if end < start:
+        return None, None, "'end' must not be before 'start'."
+    if (end - start).days + 1 > settings.APPOINTMENT_STATS_MAX_DAYS:
+        return None, None, f'Date range cannot exceed {settings.APPOINTMENT_STATS_MAX_DAYS} days.'
+    return start, end, None
+
+
+class AppointmentStatsView(APIView):
+    """
+    GET /api/appointments/stats/?start=YYYY-MM-DD&end=YYYY-MM-DD&service=<id>
+    The provider's bookings per status per day and the revenue of completed
+    appointments. Defaults to the last year. Served from the daily rollups
+    (appointments/stats.py), never from the appointments table.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        if request.user.role != 'provider':
+            return Response({'error': 'Only providers have appointment stats.'}, status=status.HTTP_403_FORBIDDEN)
+        provider_id = ProviderProfile.objects.filter(user_id=request.user.id).values_list('id', flat=True).first()
+        if provider_id is None:
+            return Response({'error': 'Provider profile not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        # 1. Date range
+        start, end, error = parse_stats_range(request.query_params)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        # 2. Optional ?service= filter
+        service_id = request.query_params.get('service')
+        if service_id is not None and not service_id.isdigit():
+            return Response({'error': 'service must be an id.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(daily_stats(provider_id, start, end, service_id=service_id and int(service_id)))
+
+
+class CalendarFeedURLView(APIView):
+    """
+    GET /api/appointments/calendar/
+    The caller's secret iCalendar feed URL, to subscribe to from a calendar app.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        if request.user.role == 'provider':
+            provider_id = ProviderProfile.objects.filter(user_id=request.user.id).values_list('id', flat=True).first()
+            if provider_id is None:
+                return Response({'error': 'Provider profile not found.'}, status=status.HTTP_404_NOT_FOUND)
+            token = feed_token('provider', provider_id)
+        else:
+            token = feed_token('client', request.user.id)
+        url = request.build_absolute_uri(reverse('appointment-calendar-feed', args=[token]))
+        return Response({'url': url})
+
+
+def calendar_etag(request, token):
+    feed = read_token(token)
+    return feed_etag(*feed) if feed else None
+
+
+@require_GET
+@condition(etag_func=calendar_etag)
+def calendar_feed(request, token):
+    """
+    GET /api/appointments/calendar/<token>.ics
+    Streamed iCalendar feed (appointments/calendar.py). Answers 304 to a
+    matching If-None-Match after one aggregate query.
+    """
+    feed = read_token(token)
+    if feed is None:
+        raise Http404
+    response = StreamingHttpResponse(render_feed(*feed), content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = 'inline; filename="kunapet.ics"'
+    # Revalidate on every poll; the ETag makes that cheap
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+class AppointmentExportView(APIView):
+    """
+    GET /api/appointments/export.csv  |  /api/appointments/export.jsonl
+        ?start=&end=YYYY-MM-DD&status=completed,cancelled
+    The caller's whole booking history (a client's bookings, or every
+    booking of a provider's services), streamed row by row.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    def get(self, request, fmt):
+        if fmt not in FORMATS:
+            raise Http404
+        start, end, statuses, error = parse_filters(request.query_params, exports.STATUSES)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        if user.role == 'provider':
+            provider_id = ProviderProfile.objects.filter(user_id=user.id).values_list('id', flat=True).first()
+            if provider_id is None:
+                return Response({'error': 'Provider profile not found.'}, status=status.HTTP_404_NOT_FOUND)
+            queryset = exports.export_queryset(provider_id=provider_id, start=start, end=end, statuses=statuses)
+        elif user.role == 'client':
+            queryset = exports.export_queryset(client_id=user.id, start=start, end=end, statuses=statuses)
+        else:
+            queryset = Appointment.objects.none()
+        return export_response(queryset, exports.COLUMNS, fmt, 'appointments')
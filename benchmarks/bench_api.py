@@ -0,0 +1,472 @@
+"""
+Whole-API load test.
+
+Seeds a reproducible dataset (--seed), then drives every route of
+kunapet_backend/urls.py in turn with --concurrency client threads
+(each with its own APIClient and database connection, authenticated with
+real JWTs) and reports, per endpoint: throughput, p50/p95/p99 latency,
+SQL queries per request and non-expected status codes. A route without a
+scenario below fails the run, so new endpoints get covered.
+
+Results are written as JSON (commit, environment, arguments, endpoints)
+so that runs can be compared across commits:
+
+    python -m benchmarks.bench_api [--requests 200 --concurrency 8]
+    python -m benchmarks.bench_api --output after.json --compare before.json
+
+Hashing routes (registration, login, import) run --hash-requests each;
+they are dominated by the password hasher. The admin site is not driven.
+/api/appointments/events/ is an ASGI stream; it is measured up to its
+first frame through the ASGI handler.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import threading
+import time as clock
+from collections import namedtuple
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from benchmarks.utils import BASE_DIR, print_table, setup_django, summarize, teardown_django
+
+RESULTS_DIR = BASE_DIR / 'benchmarks' / 'results'
+PASSWORD = 'BenchPassword123!'
+SLOTS_PER_DAY = 18  # 30 minute services, 09:00-18:00
+SKIPPED_NAMESPACES = ('admin',)
+
+# build(ctx, rng) -> dict(path=, data=, user=, format=); hashing routes are capped at --hash-requests
+Scenario = namedtuple('Scenario', 'route method expect build hashing', defaults=(False,))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--providers', type=int, default=20)
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--services-per-provider', type=int, default=5)
+    parser.add_argument('--pets-per-client', type=int, default=5)
+    parser.add_argument('--appointments-per-client', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=200, help='Timed requests per endpoint')
+    parser.add_argument('--hash-requests', type=int, default=16, help='Timed requests per hashing endpoint')
+    parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--only', help='Run the routes whose name contains this')
+    parser.add_argument('--output', help=f'JSON results file (default: {RESULTS_DIR}/api-<commit>.json)')
+    parser.add_argument('--compare', help='Earlier JSON results to compare against')
+    args = parser.parse_args()
+
+    setup_django()
+    try:
+        run(args)
+    finally:
+        teardown_django()
+
+
+def run(args):
+    from django.conf import settings
+
+    # Measures the endpoints, not the login/registration throttle (see bench_auth_throttle)
+    settings.AUTH_THROTTLE_RATES = {'ip': None, 'email': None}
+    scenarios = [scenario for scenario in SCENARIOS if not args.only or args.only in scenario.route]
+    check_coverage()
+    ctx = seed(args)
+
+    results = []
+    for scenario in scenarios:
+        count = args.hash_requests if scenario.hashing else args.requests
+        if scenario.route == 'appointment-review':
+            count = min(count, len(ctx['reviewable']) - args.warmup)
+        drive(ctx, scenario, args.warmup, args.concurrency, args.seed)
+        result = drive(ctx, scenario, count, args.concurrency, args.seed)
+        results.append(result)
+        print(f'{scenario.method} {result["path"]}: {result["throughput_rps"]} req/s', flush=True)
+
+    columns = ['route', 'method', 'requests', 'errors', 'throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'queries']
+    if args.compare:
+        columns += compare(results, json.loads(Path(args.compare).read_text()))
+    print()
+    print_table(results, columns)
+
+    report = {**environment(), 'args': vars(args), 'endpoints': results}
+    output = Path(args.output) if args.output else RESULTS_DIR / f'api-{report["commit"][:12] or "unknown"}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + '\n')
+    print(f'\nResults written to {output}')
+
+
+def check_coverage():
+    """Every named route must have at least one scenario."""
+    from django.urls import URLPattern, URLResolver, get_resolver
+
+    def names(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                if pattern.namespace not in SKIPPED_NAMESPACES:
+                    yield from names(pattern.url_patterns)
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                yield pattern.name
+
+    missing = set(names(get_resolver().url_patterns)) - {scenario.route for scenario in SCENARIOS}
+    if missing:
+        raise SystemExit(f'No load-test scenario for: {", ".join(sorted(missing))}')
+
+
+def seed(args):
+    """The same rows for the same --seed and sizes."""
+    from django.contrib.auth.hashers import make_password
+    from django.core.management import call_command
+    from django.utils import timezone
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    from appointments.models import Appointment, Review
+    from appointments.stats import backfill
+    from pets.models import Pet
+    from services.models import Service
+    from users.models import ClientProfile, ProviderProfile, User
+
+    rng = random.Random(args.seed)
+    password = make_password(PASSWORD)  # hashed once, shared by every seeded account
+
+    # 1. Providers around Lima, with services
+    providers = []
+    for i in range(args.providers):
+        user = User.objects.create(
+            email=f'provider{i}@bench.kunapet.com', username=f'provider{i}@bench.kunapet.com',
+            password=password, role=User.Role.PROVIDER,
+        )
+        providers.append(ProviderProfile.objects.create(
+            user=user, business_name=f'Vet {i}', ruc=f'20{i:09d}', address='Av. Principal 123', phone='999888777',
+            latitude=-12.05 + rng.gauss(0, 0.05), longitude=-77.04 + rng.gauss(0, 0.05),
+        ))
+    services = Service.objects.bulk_create(
+        Service(
+            provider=provider, name=f'Consulta {j}', description='Consulta general con control de peso',
+            price=f'{40 + 5 * j}.00', duration=30,
+        )
+        for provider in providers for j in range(args.services_per_provider)
+    )
+
+    # 2. Clients with pets
+    clients = User.objects.bulk_create(
+        User(
+            email=f'client{i}@bench.kunapet.com', username=f'client{i}@bench.kunapet.com',
+            password=password, role=User.Role.CLIENT,
+        )
+        for i in range(args.clients)
+    )
+    ClientProfile.objects.bulk_create(ClientProfile(user=client, phone='999111222') for client in clients)
+    pets = Pet.objects.bulk_create(
+        Pet(
+            owner=client, name=f'Firulais {j}', species=rng.choice(['dog', 'cat']), breed='Mestizo',
+            gender=rng.choice(['M', 'F']), weight=f'{rng.uniform(2, 30):.2f}',
+        )
+        for client in clients for j in range(args.pets_per_client)
+    )
+
+    # 3. Appointments, half of them in the past; one free slot each per provider
+    today = timezone.localdate()
+    slots = {provider.pk: itertools.count() for provider in providers}
+    appointments = []
+    for client in clients:
+        for j in range(args.appointments_per_client):
+            service = rng.choice(services)
+            day, start = slot(next(slots[service.provider_id]))
+            past = j % 2 == 0
+            appointments.append(Appointment(
+                client=client, service=service, date=today - timedelta(days=day + 1) if past else today + timedelta(days=day + 1),
+                time=start, status=rng.choice(['completed'] * 4 + ['cancelled']) if past else rng.choice(['pending', 'confirmed']),
+                notes='Traer carnet de vacunas',
+            ))
+    appointments = Appointment.objects.bulk_create(appointments, batch_size=1000)
+
+    # 4. Reviews for half of the completed ones; the rest are left to the review scenario
+    completed = [appointment for appointment in appointments if appointment.status == 'completed']
+    rng.shuffle(completed)
+    reviewed, reviewable = completed[::2], completed[1::2]
+    Review.objects.bulk_create(
+        Review(appointment=appointment, provider_id=appointment.service.provider_id, rating=rng.randint(1, 5), comment='Muy bien')
+        for appointment in reviewed
+    )
+    call_command('rebuild_provider_ratings', verbosity=0)
+    backfill()
+
+    admin = User.objects.create(
+        email='admin@bench.kunapet.com', username='admin@bench.kunapet.com', password=password,
+        role=User.Role.ADMIN, is_staff=True,
+    )
+    users = [admin, *(provider.user for provider in providers), *clients]
+    refresh = {user.pk: RefreshToken.for_user(user) for user in users}
+    return {
+        'admin': admin, 'providers': providers, 'clients': clients, 'services': services,
+        'pets': pets, 'appointments': appointments, 'reviewable': reviewable,
+        'access': {pk: str(token.access_token) for pk, token in refresh.items()},
+        'refresh': {pk: str(token) for pk, token in refresh.items()},
+        # Writes draw unique emails, RUCs, slots and appointments from these
+        'counter': itertools.count(), 'review_counter': itertools.count(),
+        'booking_slots': {provider.pk: itertools.count() for provider in providers},
+        'today': today,
+    }
+
+
+def slot(index):
+    """(days from today, start time) of a provider's index-th 30 minute slot."""
+    day, minute = divmod(index, SLOTS_PER_DAY)
+    return day, time(9 + minute // 2, 30 * (minute % 2))
+
+
+def drive(ctx, scenario, count, concurrency, seed):
+    """Run `count` requests of a scenario split over `concurrency` threads."""
+    from django.db import connection, connections
+    from rest_framework.test import APIClient
+
+    latencies, queries, errors, paths = [], [], [], []
+    lock = threading.Lock()
+
+    def worker(index, share):
+        rng = random.Random(f'{seed}:{scenario.route}:{scenario.method}:{index}')
+        api = APIClient()
+        executed = [0]
+
+        def count_queries(execute, sql, params, many, context):
+            executed[0] += 1
+            return execute(sql, params, many, context)
+
+        try:
+            with connection.execute_wrapper(count_queries):
+                for _ in range(share):
+                    request = scenario.build(ctx, rng)
+                    before = executed[0]
+                    start = clock.perf_counter()
+                    code = send(api, ctx, scenario.method, request)
+                    elapsed = clock.perf_counter() - start
+                    with lock:
+                        latencies.append(elapsed)
+                        queries.append(executed[0] - before)
+                        paths.append(request['path'])
+                        if code != scenario.expect:
+                            errors.append(code)
+        finally:
+            connections.close_all()
+
+    shares = [count // concurrency + (i < count % concurrency) for i in range(concurrency)]
+    threads = [threading.Thread(target=worker, args=(i, share)) for i, share in enumerate(shares) if share]
+    start = clock.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = clock.perf_counter() - start
+
+    stats = summarize(latencies)
+    return {
+        'route': scenario.route, 'method': scenario.method, 'path': paths[0] if paths else '',
+        'requests': stats.pop('count'), 'errors': len(errors), 'error_codes': sorted(set(errors)),
+        'throughput_rps': round(len(latencies) / wall, 1) if wall else 0.0, **stats,
+        'queries': round(sum(queries) / len(queries), 1) if queries else 0.0, 'queries_max': max(queries, default=0),
+    }
+
+
+def send(api, ctx, method, request):
+    """Perform one request; returns the status code (bodies are read in full)."""
+    user = request.get('user')
+    headers = {'HTTP_AUTHORIZATION': f'Bearer {ctx["access"][user.pk]}'} if user else {}
+    if request.get('asgi'):
+        return send_asgi(request['path'], request.get('data'))
+    response = getattr(api, method.lower())(request['path'], request.get('data'), format=request.get('format', 'json'), **headers)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    else:
+        response.content
+    response.close()
+    return response.status_code
+
+
+def send_asgi(path, data):
+    """Open an event stream, read its first frame and hang up."""
+    from asgiref.sync import async_to_sync
+    from django.test import AsyncClient
+
+    async def fetch():
+        response = await AsyncClient().get(path, data)
+        if response.status_code == 200:
+            await anext(response.streaming_content)
+        response.close()
+        return response.status_code
+
+    # async_to_sync runs the view's sync_to_async() parts on this thread, so its queries are counted
+    return async_to_sync(fetch)()
+
+
+def environment():
+    import django
+
+    from django.db import connection
+
+    def git(*command):
+        try:
+            return subprocess.run(['git', *command], cwd=BASE_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ''
+
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'created_at': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(results, baseline):
+    """Add p50/p95/throughput changes vs an earlier run; returns the new columns."""
+    before = {(row['route'], row['method']): row for row in baseline['endpoints']}
+    print(f'Compared with {baseline.get("commit", "")[:12]} ({baseline.get("created_at", "")})')
+    for row in results:
+        old = before.get((row['route'], row['method']))
+        for key in ('p50_ms', 'p95_ms', 'throughput_rps'):
+            row[f'{key} Δ'] = f'{(row[key] - old[key]) / old[key]:+.0%}' if old and old[key] else '-'
+    return ['p50_ms Δ', 'p95_ms Δ', 'throughput_rps Δ']
+
+
+# Request builders. Reads pick seeded rows at random; writes use fresh emails, slots, ...
+
+def any_client(ctx, rng):
+    return rng.choice(ctx['clients'])
+
+
+def any_provider(ctx, rng):
+    return rng.choice(ctx['providers'])
+
+
+def future_range(ctx, days):
+    start = ctx['today'] + timedelta(days=1)
+    return {'start': start.isoformat(), 'end': (start + timedelta(days=days - 1)).isoformat()}
+
+
+def register_provider(ctx, rng):
+    n = next(ctx['counter'])
+    return {'data': {
+        'email': f'new-provider{n}@bench.kunapet.com', 'password': PASSWORD, 'business_name': f'Nueva Vet {n}',
+        'ruc': f'10{n:09d}', 'address': 'Av. Arequipa 456', 'phone': '988777666',
+    }}
+
+
+def register_client(ctx, rng):
+    n = next(ctx['counter'])
+    return {'data': {'email': f'new-client{n}@bench.kunapet.com', 'password': PASSWORD, 'phone': '977666555'}}
+
+
+def login(ctx, rng):
+    return {'data': {'email': any_client(ctx, rng).email, 'password': PASSWORD}}
+
+
+def import_accounts(ctx, rng):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    rows = ''.join(f'imported{next(ctx["counter"])}@bench.kunapet.com,{PASSWORD}\n' for _ in range(5))
+    upload = SimpleUploadedFile('clients.csv', ('email,password\n' + rows).encode(), content_type='text/csv')
+    return {'path': '/api/auth/import/', 'data': {'file': upload, 'role': 'client'}, 'format': 'multipart', 'user': ctx['admin']}
+
+
+def book(ctx, rng):
+    provider = any_provider(ctx, rng)
+    # Far beyond the seeded bookings, and never the same slot twice
+    day, start = slot(next(ctx['booking_slots'][provider.pk]))
+    service = next(service for service in ctx['services'] if service.provider_id == provider.pk)
+    return {'path': '/api/appointments/', 'user': any_client(ctx, rng), 'data': {
+        'service': service.pk, 'date': (ctx['today'] + timedelta(days=400 + day)).isoformat(),
+        'time': start.isoformat('minutes'), 'notes': 'Primera consulta',
+    }}
+
+
+def review(ctx, rng):
+    appointment = ctx['reviewable'][next(ctx['review_counter'])]
+    return {
+        'path': f'/api/appointments/{appointment.pk}/review/', 'user': appointment.client,
+        'data': {'rating': rng.randint(1, 5), 'comment': 'Excelente atención'},
+    }
+
+
+def own_pet(ctx, rng):
+    pet = rng.choice(ctx['pets'])
+    return {'path': f'/api/pets/{pet.pk}/', 'user': pet.owner}
+
+
+def own_appointment(ctx, rng):
+    appointment = rng.choice(ctx['appointments'])
+    return {'path': f'/api/appointments/{appointment.pk}/', 'user': appointment.client}
+
+
+def calendar_feed(ctx, rng):
+    from appointments.calendar import feed_token
+
+    return {'path': f'/api/appointments/calendar/{feed_token("provider", any_provider(ctx, rng).pk)}.ics'}
+
+
+SCENARIOS = [
+    # users
+    Scenario('register_provider', 'POST', 201, lambda ctx, rng: {'path': '/api/auth/register/provider/', **register_provider(ctx, rng)}, True),
+    Scenario('register_client', 'POST', 201, lambda ctx, rng: {'path': '/api/auth/register/client/', **register_client(ctx, rng)}, True),
+    Scenario('token_obtain_pair', 'POST', 200, lambda ctx, rng: {'path': '/api/auth/login/', **login(ctx, rng)}, True),
+    Scenario('token_refresh', 'POST', 200, lambda ctx, rng: {
+        'path': '/api/auth/refresh/', 'data': {'refresh': ctx['refresh'][any_client(ctx, rng).pk]},
+    }),
+    Scenario('async_register_provider', 'POST', 201, lambda ctx, rng: {'path': '/api/auth/async/register/provider/', **register_provider(ctx, rng)}, True),
+    Scenario('async_register_client', 'POST', 201, lambda ctx, rng: {'path': '/api/auth/async/register/client/', **register_client(ctx, rng)}, True),
+    Scenario('async_token_obtain_pair', 'POST', 200, lambda ctx, rng: {'path': '/api/auth/async/login/', **login(ctx, rng)}, True),
+    Scenario('account_import', 'POST', 200, import_accounts, True),
+    Scenario('user_me', 'GET', 200, lambda ctx, rng: {'path': '/api/auth/me/', 'user': any_client(ctx, rng)}),
+    Scenario('provider_list', 'GET', 200, lambda ctx, rng: {'path': '/api/providers/'}),
+    Scenario('providers_nearby', 'GET', 200, lambda ctx, rng: {
+        'path': '/api/providers/nearby/', 'data': {'lat': -12.05, 'lng': -77.04, 'radius_km': 10, 'with_services': 1},
+    }),
+    # pets
+    Scenario('pet-list-create', 'GET', 200, lambda ctx, rng: {'path': '/api/pets/', 'user': any_client(ctx, rng)}),
+    Scenario('pet-list-create', 'POST', 201, lambda ctx, rng: {'path': '/api/pets/', 'user': any_client(ctx, rng), 'data': {
+        'name': 'Misha', 'species': 'cat', 'breed': 'Siamés', 'gender': 'F', 'weight': '4.20',
+    }}),
+    Scenario('pet-batch', 'POST', 201, lambda ctx, rng: {'path': '/api/pets/batch/', 'user': any_client(ctx, rng), 'data': [
+        {'name': f'Cachorro {i}', 'species': 'dog', 'gender': 'M', 'weight': '3.10'} for i in range(10)
+    ]}),
+    Scenario('pet-detail', 'GET', 200, own_pet),
+    # services
+    Scenario('service-list-create', 'GET', 200, lambda ctx, rng: {'path': '/api/services/'}),
+    Scenario('service-list-create', 'POST', 201, lambda ctx, rng: {'path': '/api/services/', 'user': any_provider(ctx, rng).user, 'data': {
+        'name': 'Baño y corte', 'description': 'Baño medicado y corte de uñas', 'price': '35.00', 'duration': 30,
+    }}),
+    Scenario('service-export', 'GET', 200, lambda ctx, rng: {'path': '/api/services/export.csv', 'user': any_provider(ctx, rng).user}),
+    Scenario('service-detail', 'GET', 200, lambda ctx, rng: {'path': f'/api/services/{rng.choice(ctx["services"]).pk}/'}),
+    Scenario('service-availability', 'GET', 200, lambda ctx, rng: {
+        'path': f'/api/services/{rng.choice(ctx["services"]).pk}/availability/', 'data': future_range(ctx, 7),
+    }),
+    Scenario('provider-availability', 'GET', 200, lambda ctx, rng: {
+        'path': f'/api/services/providers/{any_provider(ctx, rng).pk}/availability/', 'data': future_range(ctx, 7),
+    }),
+    # appointments
+    Scenario('appointment-list-create', 'GET', 200, lambda ctx, rng: {'path': '/api/appointments/', 'user': any_client(ctx, rng)}),
+    Scenario('appointment-list-create', 'POST', 201, book),
+    Scenario('appointment-stats', 'GET', 200, lambda ctx, rng: {'path': '/api/appointments/stats/', 'user': any_provider(ctx, rng).user}),
+    Scenario('appointment-calendar', 'GET', 200, lambda ctx, rng: {'path': '/api/appointments/calendar/', 'user': any_client(ctx, rng)}),
+    Scenario('appointment-calendar-feed', 'GET', 200, calendar_feed),
+    Scenario('appointment-export', 'GET', 200, lambda ctx, rng: {'path': '/api/appointments/export.csv', 'user': any_provider(ctx, rng).user}),
+    Scenario('appointment-events', 'GET', 200, lambda ctx, rng: {
+        'path': '/api/appointments/events/', 'asgi': True, 'data': {'token': ctx['access'][any_client(ctx, rng).pk]},
+    }),
+    Scenario('appointment-detail', 'GET', 200, own_appointment),
+    Scenario('appointment-review', 'POST', 201, review),
+    Scenario('provider-reviews', 'GET', 200, lambda ctx, rng: {'path': f'/api/appointments/providers/{any_provider(ctx, rng).pk}/reviews/'}),
+    # operations
+    Scenario('metrics', 'GET', 200, lambda ctx, rng: {'path': '/metrics'}),
+]
+
+
+if __name__ == '__main__':
+    main()
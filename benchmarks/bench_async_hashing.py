@@ -0,0 +1,72 @@
+"""
+Registration burst vs. unrelated request latency.
+
+Drives the ASGI application in-process. While a burst of client sign-ups
+is in flight, a probe keeps requesting GET /api/services/ and records its
+latency. The sync endpoints hash inside the request thread, which Django
+shares between all sync views under ASGI; the async endpoints hash in the
+bounded pool, so the probe's p99 should stay close to the idle baseline.
+
+    python -m benchmarks.bench_async_hashing [--burst 8]
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.utils import print_table, setup_django, summarize, teardown_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--burst', type=int, default=8, help='Concurrent registrations per scenario')
+    parser.add_argument('--idle-seconds', type=float, default=2.0)
+    args = parser.parse_args()
+
+    setup_django()
+    try:
+        asyncio.run(run(args))
+    finally:
+        teardown_django()
+
+
+async def probe(client, stop, samples):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get('/api/services/')
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(0.005)
+
+
+async def scenario(client, args, name, url=None):
+    samples, stop = [], asyncio.Event()
+    task = asyncio.create_task(probe(client, stop, samples))
+    start = time.perf_counter()
+    if url:
+        responses = await asyncio.gather(*(
+            client.post(url, {'email': f'{name}{i}@bench.kunapet.com', 'password': 'TestPassword123!'}, content_type='application/json')
+            for i in range(args.burst)
+        ))
+        assert all(r.status_code == 201 for r in responses), [r.status_code for r in responses]
+    else:
+        await asyncio.sleep(args.idle_seconds)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await task
+    return {'scenario': name, 'burst_s': round(elapsed, 2), **summarize(samples)}
+
+
+async def run(args):
+    from django.test import AsyncClient
+
+    client = AsyncClient()
+    rows = [
+        await scenario(client, args, 'idle'),
+        await scenario(client, args, 'sync', '/api/auth/register/client/'),
+        await scenario(client, args, 'async', '/api/auth/async/register/client/'),
+    ]
+    print(f'probe: GET /api/services/ during {args.burst} concurrent registrations')
+    print_table(rows, ['scenario', 'burst_s', 'count', 'p50_ms', 'p95_ms', 'p99_ms'])
+
+
+if __name__ == '__main__':
+    main()
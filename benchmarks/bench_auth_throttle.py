@@ -0,0 +1,122 @@
+"""
+Login latency of legitimate users during a credential-stuffing flood.
+
+--attackers threads POST /api/auth/login/ from --attacker-ips addresses,
+with random emails and wrong passwords, at up to --flood-rate requests
+per second in total (the attackers run in this process, so an unpaced
+loop of cheap 429s would just compete for the GIL). After
+--warmup seconds (long enough to drain the default bursts), one thread
+logs real users in (each from its own IP) every --interval seconds for
+--duration seconds. Runs with no flood, with the flood and throttling
+off, and with the flood and settings.AUTH_THROTTLE_RATES, and reports the
+legitimate logins' latency and how many flood requests got as far as
+hashing.
+
+    python -m benchmarks.bench_auth_throttle [--duration 10 --warmup 10 --attackers 4]
+"""
+import argparse
+import random
+import threading
+import time
+
+from benchmarks.utils import print_table, setup_django, summarize, teardown_django
+
+PASSWORD = 'BenchPassword123!'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=10)
+    parser.add_argument('--attackers', type=int, default=4)
+    parser.add_argument('--attacker-ips', type=int, default=1)
+    parser.add_argument('--flood-rate', type=float, default=100)
+    parser.add_argument('--interval', type=float, default=0.25)
+    parser.add_argument('--users', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    try:
+        run(args)
+    finally:
+        teardown_django()
+
+
+def run(args):
+    import logging
+
+    from django.conf import settings
+    from django.contrib.auth.hashers import make_password
+    from django.core.cache import caches
+    from django.db import connections
+    from django.test.utils import override_settings
+    from rest_framework.test import APIClient
+
+    from users.models import User
+
+    # Every flood request is a slow request
+    logging.getLogger('kunapet_backend.timing').setLevel(logging.ERROR)
+    password = make_password(PASSWORD)
+    users = User.objects.bulk_create(
+        User(email=f'client{i}@bench.kunapet.com', username=f'client{i}@bench.kunapet.com', password=password, role=User.Role.CLIENT)
+        for i in range(args.users)
+    )
+
+    def legitimate(stop, latencies, codes):
+        api = APIClient()
+        for n in range(len(users) * 1000):
+            if stop.is_set():
+                break
+            user = users[n % len(users)]
+            start = time.perf_counter()
+            response = api.post('/api/auth/login/', {'email': user.email, 'password': PASSWORD}, format='json', REMOTE_ADDR=f'10.1.{n // 250 % 250}.{n % 250}')
+            latencies.append(time.perf_counter() - start)
+            codes.append(response.status_code)
+            time.sleep(args.interval)
+        connections.close_all()
+
+    def attacker(index, stop, codes):
+        api, rng = APIClient(), random.Random(index)
+        ip = f'203.0.113.{index % args.attacker_ips + 1}'
+        pace, due = args.attackers / args.flood_rate, time.perf_counter()
+        while not stop.is_set():
+            email = f'victim{rng.randrange(10 ** 6)}@example.com'
+            codes.append(api.post('/api/auth/login/', {'email': email, 'password': 'hunter2'}, format='json', REMOTE_ADDR=ip).status_code)
+            # Next request on schedule, or right away when behind
+            due += pace
+            time.sleep(max(0.0, due - time.perf_counter()))
+        connections.close_all()
+
+    results = []
+    unlimited = {'ip': None, 'email': None}
+    for name, attackers, rates in (
+        ('no flood', 0, unlimited),
+        ('flood, no throttle', args.attackers, unlimited),
+        ('flood, throttled', args.attackers, settings.AUTH_THROTTLE_RATES),
+    ):
+        caches[settings.AUTH_THROTTLE_CACHE_ALIAS].clear()
+        stop, latencies, codes, flood = threading.Event(), [], [], []
+        with override_settings(AUTH_THROTTLE_RATES=rates):
+            threads = [threading.Thread(target=attacker, args=(i, stop, flood)) for i in range(attackers)]
+            for thread in threads:
+                thread.start()
+            if attackers:
+                time.sleep(args.warmup)
+            threads.append(threading.Thread(target=legitimate, args=(stop, latencies, codes)))
+            threads[-1].start()
+            time.sleep(args.duration)
+            stop.set()
+            for thread in threads:
+                thread.join()
+        stats = summarize(latencies)
+        results.append({
+            'scenario': name, 'logins': stats['count'], 'ok': codes.count(200),
+            'p50_ms': stats['p50_ms'], 'p95_ms': stats['p95_ms'],
+            'flood_requests': len(flood), 'flood_rejected': flood.count(429),
+            'flood_hashed': len(flood) - flood.count(429),
+        })
+    print_table(results, ['scenario', 'logins', 'ok', 'p50_ms', 'p95_ms', 'flood_requests', 'flood_rejected', 'flood_hashed'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Availability engine benchmark.
+
+Seeds a provider with a dense booking history and measures latency and SQL
+query count of the availability computation for growing date ranges. The
+query count must stay constant whatever the number of days requested.
+
+    python -m benchmarks.bench_availability [--bookings-per-day 12]
+"""
+import argparse
+from datetime import time, timedelta
+
+from benchmarks.utils import make_client, make_provider, print_table, setup_django, teardown_django, timer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bookings-per-day', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    try:
+        run(args)
+    finally:
+        teardown_django()
+
+
+def run(args):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django.utils import timezone
+
+    from appointments.availability import free_windows, service_slots
+    from appointments.models import Appointment
+
+    provider = make_provider(0, duration=30)
+    service = provider.services.get()
+    client = make_client(0)
+
+    today = timezone.localdate() + timedelta(days=1)
+    horizon = 62
+    Appointment.objects.bulk_create(
+        Appointment(
+            client=client, service=service, date=today + timedelta(days=day),
+            time=time(9 + slot // 2, 30 * (slot % 2)), status='confirmed',
+        )
+        for day in range(horizon)
+        for slot in range(0, args.bookings_per_day * 2, 2)
+        if 9 + slot // 2 < 18
+    )
+
+    rows = []
+    for days in (1, 7, 31, 62):
+        end = today + timedelta(days=days - 1)
+        with CaptureQueriesContext(connection) as queries:
+            service_slots(service, today, end)
+        with timer() as elapsed:
+            for _ in range(args.repeat):
+                service_slots(service, today, end)
+                free_windows(provider.id, today, end)
+        rows.append({
+            'days': days,
+            'queries': len(queries),
+            'ms_per_call': round(elapsed['elapsed'] / (args.repeat * 2) * 1000, 3),
+        })
+    print_table(rows, ['days', 'queries', 'ms_per_call'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+iCalendar feed benchmark.
+
+Seeds a provider with --appointments appointments and streams its .ics
+feed at a few history sizes, reporting the time, the body size and the
+peak Python memory (tracemalloc) of each full download, then the cost of an
+unchanged re-poll (If-None-Match -> 304).
+
+The peak should stay flat as the history grows.
+
+    python -m benchmarks.bench_calendar [--appointments 100000]
+"""
+import argparse
+import tracemalloc
+from datetime import date, time, timedelta
+
+from benchmarks.utils import make_client, make_provider, print_table, setup_django, summarize, teardown_django, timer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--appointments', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    try:
+        run(args)
+    finally:
+        teardown_django()
+
+
+def run(args):
+    from django.test import Client
+
+    from appointments.calendar import feed_token
+    from appointments.models import Appointment
+
+    provider = make_provider(0, duration=30)
+    service = provider.services.get()
+    client = make_client(0)
+    url = f'/api/appointments/calendar/{feed_token("provider", provider.id)}.ics'
+    http = Client()
+
+    rows, seeded = [], 0
+    for size in sorted({args.appointments // 10, args.appointments // 2, args.appointments}):
+        batch = []
+        for i in range(seeded, size):
+            batch.append(Appointment(
+                client=client, service=service, date=date(2020, 1, 1) + timedelta(days=i // 16),
+                time=time(8 + i % 16 // 2, 30 * (i % 2)), status='confirmed', notes='Consulta de control',
+            ))
+        Appointment.objects.bulk_create(batch, batch_size=5000)
+        seeded = size
+
+        tracemalloc.start()
+        with timer() as elapsed:
+            response = http.get(url)
+            length = sum(len(chunk) for chunk in response.streaming_content)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rows.append({
+            'appointments': size, 'body_mb': round(length / 2 ** 20, 1),
+            'seconds': round(elapsed['elapsed'], 2), 'peak_mb': round(peak / 2 ** 20, 2),
+        })
+    print_table(rows, ['appointments', 'body_mb', 'seconds', 'peak_mb'])
+
+    etag = http.get(url)['ETag']
+    samples = []
+    for _ in range(args.repeat):
+        with timer() as elapsed:
+            assert http.get(url, headers={'if-none-match': etag}).status_code == 304
+        samples.append(elapsed['elapsed'])
+    stats = summarize(samples)
+    print(f'304 re-poll: p50 {stats["p50_ms"]} ms, p95 {stats["p95_ms"]} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Appointment event fan-out benchmark.
+
+Opens --streams subscriptions (spread over --providers provider channels)
+on one event loop, as one ASGI worker would, then publishes --events
+events from another thread, as sync request threads do after a booking
+commits. Reports the publish cost and the publish-to-delivery latency.
+
+    python -m benchmarks.bench_events [--streams 2000 --providers 200 --events 2000]
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+
+from benchmarks.utils import print_table, setup_django, summarize, teardown_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--streams', type=int, default=2000)
+    parser.add_argument('--providers', type=int, default=200)
+    parser.add_argument('--events', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+    try:
+        asyncio.run(run(args))
+    finally:
+        teardown_django()
+
+
+async def run(args):
+    from appointments.events import InMemoryBroker, provider_channel
+
+    broker = InMemoryBroker()
+    subscriptions = [
+        broker.subscribe([provider_channel(index % args.providers)]) for index in range(args.streams)
+    ]
+    latencies, publish_costs = [], []
+    expected = args.events * (args.streams // args.providers)
+
+    async def consume(subscription):
+        while True:
+            event = await subscription.get(5)
+            if event is None:
+                return
+            latencies.append(time.perf_counter() - event['sent'])
+            if len(latencies) == expected:
+                return
+
+    def publisher():
+        rng = random.Random(42)
+        for index in range(args.events):
+            started = time.perf_counter()
+            broker.publish([provider_channel(rng.randrange(args.providers))], {'type': 'appointment.created', 'sent': started})
+            publish_costs.append(time.perf_counter() - started)
+            # Roughly the pace of a busy worker's bookings
+            time.sleep(0.0005)
+
+    consumers = [asyncio.ensure_future(consume(subscription)) for subscription in subscriptions]
+    thread = threading.Thread(target=publisher)
+    thread.start()
+    await asyncio.get_running_loop().run_in_executor(None, thread.join)
+    await asyncio.wait(consumers, timeout=10)
+    for consumer in consumers:
+        consumer.cancel()
+    for subscription in subscriptions:
+        subscription.close()
+
+    rows = []
+    for name, samples in (('publish', publish_costs), ('delivery', latencies)):
+        stats = summarize(samples)
+        rows.append({'step': name, 'samples': stats['count'], 'p50_ms': stats['p50_ms'], 'p95_ms': stats['p95_ms'], 'p99_ms': stats['p99_ms']})
+    print_table(rows, ['step', 'samples', 'p50_ms', 'p95_ms', 'p99_ms'])
+
+
+if __name__ == '__main__':
+    main()
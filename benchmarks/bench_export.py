@@ -0,0 +1,86 @@
+"""
+Export benchmark.
+
+Seeds --appointments appointments for one provider and exports them as
+CSV and JSONL through GET /api/appointments/export.<fmt>, at a few sizes,
+reporting rows/s, the body size and the peak Python memory (tracemalloc)
+of each export. For comparison, `list` serializes the same rows with
+AppointmentSerializer into one list, as a paginator-free
+/api/appointments/ would.
+
+    python -m benchmarks.bench_export [--appointments 200000]
+"""
+import argparse
+import tracemalloc
+from datetime import date, time, timedelta
+
+from benchmarks.utils import make_client, make_provider, print_table, setup_django, teardown_django, timer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--appointments', type=int, default=200_000)
+    args = parser.parse_args()
+
+    setup_django()
+    try:
+        run(args)
+    finally:
+        teardown_django()
+
+
+def measure(fn):
+    tracemalloc.start()
+    with timer() as elapsed:
+        size = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed['elapsed'], size, peak
+
+
+def run(args):
+    from rest_framework.test import APIClient
+
+    from appointments.models import Appointment
+    from appointments.serializers import AppointmentSerializer
+
+    provider = make_provider(0, duration=1)
+    service = provider.services.get()
+    client = make_client(0)
+    api = APIClient()
+    api.force_authenticate(provider.user)
+
+    def export(fmt):
+        response = api.get(f'/api/appointments/export.{fmt}')
+        return sum(len(chunk) for chunk in response.streaming_content)
+
+    def serialize_all():
+        queryset = Appointment.objects.filter(service__provider=provider).select_related('client', 'service__provider')
+        return len(str(AppointmentSerializer(queryset, many=True).data))
+
+    rows, seeded = [], 0
+    for size in sorted({args.appointments // 10, args.appointments}):
+        for offset in range(seeded, size, 10_000):
+            Appointment.objects.bulk_create([
+                Appointment(
+                    client=client, service=service, date=date(2020, 1, 1) + timedelta(days=i // 1440),
+                    time=time(i % 1440 // 60, i % 60), status='completed', notes='Consulta de control',
+                )
+                for i in range(offset, min(offset + 10_000, size))
+            ])
+        seeded = size
+
+        paths = [('csv', lambda: export('csv')), ('jsonl', lambda: export('jsonl'))]
+        if size <= 50_000:
+            paths.append(('list', serialize_all))
+        for name, fn in paths:
+            seconds, length, peak = measure(fn)
+            rows.append({
+                'appointments': size, 'path': name, 'rows_per_sec': round(size / seconds),
+                'body_mb': round(length / 2 ** 20, 1), 'peak_mb': round(peak / 2 ** 20, 1),
+            })
+    print_table(rows, ['appointments', 'path', 'rows_per_sec', 'body_mb', 'peak_mb'])
+
+
+if __name__ == '__main__':
+    main()
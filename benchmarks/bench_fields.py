@@ -0,0 +1,87 @@
+"""
+Sparse fieldsets benchmark.
+
+Seeds --appointments appointments for one client (the service carries a
+realistic description) and reads 200-row pages of /api/appointments/
+with each fieldset below, reporting the body size, the whole request and
+the serialization alone (AppointmentSerializer over the same page).
+
+    python -m benchmarks.bench_fields [--appointments 5000 --requests 30]
+"""
+import argparse
+from datetime import date, time, timedelta
+
+from benchmarks.utils import make_client, make_provider, print_table, setup_django, summarize, teardown_django, timer
+
+FIELDSETS = [
+    ('full', {}),
+    ('list screen', {'fields': 'id,date,time,status,service_details.name'}),
+    ('ids', {'fields': 'id'}),
+    ('list + provider', {'fields': 'id,date,time,status,service_details.name', 'expand': 'service_details.provider'}),
+]
+PAGE_SIZE = 200
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--appointments', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=30)
+    args = parser.parse_args()
+
+    setup_django()
+    try:
+        run(args)
+    finally:
+        teardown_django()
+
+
+def run(args):
+    from rest_framework.request import Request
+    from rest_framework.test import APIClient, APIRequestFactory
+
+    from appointments.models import Appointment
+    from appointments.serializers import AppointmentSerializer
+
+    description = 'Consulta general con examen fisico completo, control de peso y vacunas. ' * 8
+    provider = make_provider(0, description=description)
+    service = provider.services.get()
+    client = make_client(0)
+    Appointment.objects.bulk_create(
+        Appointment(
+            client=client, service=service, date=date(2030, 1, 1) + timedelta(days=i // 20),
+            time=time(8 + i % 20 // 2, 30 * (i % 2)), notes='Traer carnet de vacunas',
+        )
+        for i in range(args.appointments)
+    )
+    api = APIClient()
+    api.force_authenticate(client)
+    factory = APIRequestFactory()
+    page = list(
+        Appointment.objects.filter(client_id=client.id).select_related('client', 'service__provider')
+        .order_by('-date', '-time', 'id')[:PAGE_SIZE]
+    )
+
+    rows = []
+    for name, params in FIELDSETS:
+        params = {**params, 'page_size': PAGE_SIZE}
+        request_times, serialize_times = [], []
+        for _ in range(args.requests):
+            with timer() as elapsed:
+                response = api.get('/api/appointments/', params)
+                body = response.content
+            request_times.append(elapsed['elapsed'])
+
+            context = {'request': Request(factory.get('/api/appointments/', params))}
+            with timer() as elapsed:
+                AppointmentSerializer(page, many=True, context=context).data
+            serialize_times.append(elapsed['elapsed'])
+        rows.append({
+            'fieldset': name, 'body_kb': round(len(body) / 1024, 1),
+            'request_p50_ms': summarize(request_times)['p50_ms'],
+            'serialize_p50_ms': summarize(serialize_times)['p50_ms'],
+        })
+    print_table(rows, ['fieldset', 'body_kb', 'request_p50_ms', 'serialize_p50_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Bulk onboarding throughput: per-row registration vs. the importer.
+
+Generates N provider rows and imports them twice into a fresh database:
+once row by row through POST /api/auth/register/provider/ (what onboarding
+did before) and once through users.importer.import_accounts. Reports
+rows/sec and query counts for both.
+
+Real PBKDF2 dominates both paths, so --fast-hasher swaps in MD5 to measure
+the database side alone:
+
+    python -m benchmarks.bench_import --rows 2000 --workers 4
+    python -m benchmarks.bench_import --rows 20000 --fast-hasher
+"""
+import argparse
+import io
+
+from benchmarks.utils import print_table, setup_django, teardown_django, timer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=None, help='Importer hashing processes (default: one per CPU)')
+    parser.add_argument('--fast-hasher', action='store_true', help='Use MD5 instead of PBKDF2')
+    args = parser.parse_args()
+
+    setup_django()
+    try:
+        run(args)
+    finally:
+        teardown_django()
+
+
+def rows(prefix, ruc_prefix, count):
+    for i in range(count):
+        yield {
+            'email': f'{prefix}{i}@bench.kunapet.com', 'password': 'TestPassword123!',
+            'business_name': f'Clinic {i}', 'ruc': f'{ruc_prefix}{i:010d}',
+            'address': f'Av. {i}', 'phone': '999',
+        }
+
+
+def run(args):
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIClient
+
+    from users.importer import import_accounts
+    from users.models import User
+
+    if args.fast_hasher:
+        settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+    results = []
+
+    api = APIClient()
+    with CaptureQueriesContext(connection) as queries, timer() as elapsed:
+        for row in rows('api', 1, args.rows):
+            response = api.post('/api/auth/register/provider/', row, format='json')
+            assert response.status_code == 201, response.data
+    results.append({
+        'path': 'POST register/provider', 'rows': args.rows, 'seconds': round(elapsed['elapsed'], 2),
+        'rows_per_sec': round(args.rows / elapsed['elapsed'], 1), 'queries': len(queries),
+    })
+
+    header = 'email,password,business_name,ruc,address,phone\n'
+    body = ''.join(','.join(row.values()) + '\n' for row in rows('bulk', 2, args.rows))
+    with CaptureQueriesContext(connection) as queries:
+        report = import_accounts(
+            io.StringIO(header + body), User.Role.PROVIDER,
+            chunk_size=args.chunk_size, workers=args.workers,
+        )
+    assert report.created == args.rows, report.errors[:5]
+    results.append({
+        'path': 'import_accounts', 'rows': report.rows, 'seconds': round(report.elapsed, 2),
+        'rows_per_sec': round(report.rows_per_sec, 1), 'queries': len(queries),
+    })
+
+    print(f'hasher: {settings.PASSWORD_HASHERS[0].rsplit(".", 1)[-1]}')
+    print_table(results, ['path', 'rows', 'seconds', 'rows_per_sec', 'queries'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+List endpoint throughput benchmark.
+
+Seeds --rows pets, services and appointments, then walks every 200-row
+page of /api/pets/, /api/services/ and /api/appointments/ (response
+rendered to bytes) with the serializers and with the values() fast path
+(settings.FAST_LIST_PATH), reporting rows/s for each.
+
+    python -m benchmarks.bench_list [--rows 5000 --rounds 3]
+"""
+import argparse
+from datetime import date, time, timedelta
+
+from benchmarks.utils import make_client, make_provider, print_table, setup_django, teardown_django, timer
+
+PAGE_SIZE = 200
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    try:
+        run(args)
+    finally:
+        teardown_django()
+
+
+def run(args):
+    from django.core.cache import cache
+    from django.test.utils import override_settings
+    from rest_framework.test import APIClient
+
+    from appointments.models import Appointment
+    from pets.models import Pet
+    from services.models import Service
+
+    provider = make_provider(0)
+    client = make_client(0)
+    Service.objects.bulk_create(
+        Service(provider=provider, name=f'Consulta {i}', description='Consulta general con control de peso', price='50.00', duration=30)
+        for i in range(args.rows)
+    )
+    service = Service.objects.first()
+    Pet.objects.bulk_create(
+        Pet(owner=client, name=f'Firulais {i}', species='dog', breed='Mestizo', gender='M', weight='12.50')
+        for i in range(args.rows)
+    )
+    Appointment.objects.bulk_create(
+        Appointment(
+            client=client, service=service, date=date(2030, 1, 1) + timedelta(days=i // 20),
+            time=time(8 + i % 20 // 2, 30 * (i % 2)), notes='Traer carnet de vacunas',
+        )
+        for i in range(args.rows)
+    )
+    api = APIClient()
+    api.force_authenticate(client)
+
+    def walk(url):
+        rows, params = 0, {'page_size': PAGE_SIZE}
+        while url:
+            # The catalog cache would serve every round after the first
+            cache.clear()
+            response = api.get(url, params)
+            response.content
+            rows += len(response.data['results'])
+            url, params = response.data['next'], None
+        return rows
+
+    results = []
+    for url in ('/api/pets/', '/api/services/', '/api/appointments/'):
+        for name, fast in (('serializer', False), ('fast path', True)):
+            best = None
+            with override_settings(FAST_LIST_PATH=fast):
+                for _ in range(args.rounds):
+                    with timer() as elapsed:
+                        rows = walk(url)
+                    best = min(best or elapsed['elapsed'], elapsed['elapsed'])
+            results.append({'endpoint': url, 'path': name, 'rows': rows, 'rows_per_sec': round(rows / best)})
+    print_table(results, ['endpoint', 'path', 'rows', 'rows_per_sec'])
+
+
+if __name__ == '__main__':
+    main()
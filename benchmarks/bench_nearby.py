@@ -0,0 +1,106 @@
+"""
+Nearby-provider search: geohash index vs. scanning every provider.
+
+Providers are added in steps (1k, 10k, 100k by default) around a few
+Peruvian cities. After each step the same 5 km searches run through
+users.geo.nearby() and through a naive scan that computes the distance to
+every located provider. The indexed path should stay roughly flat (it
+only reads the 9 cells around the point); the scan grows with N.
+
+    python -m benchmarks.bench_nearby [--sizes 1000 10000 100000]
+"""
+import argparse
+import random
+
+from benchmarks.utils import print_table, setup_django, summarize, teardown_django, timer
+
+CITIES = [(-12.0464, -77.0428), (-16.4090, -71.5375), (-8.1116, -79.0288), (-13.5320, -71.9675)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--radius-km', type=float, default=5)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    try:
+        run(args)
+    finally:
+        teardown_django()
+
+
+def seed(start, stop, rng):
+    from users.models import ProviderProfile, User
+
+    for offset in range(start, stop, 5000):
+        indexes = range(offset, min(offset + 5000, stop))
+        users = User.objects.bulk_create(
+            User(email=f'geo{i}@bench.kunapet.com', username=f'geo{i}@bench.kunapet.com', role=User.Role.PROVIDER)
+            for i in indexes
+        )
+        profiles = []
+        for i, user in zip(indexes, users):
+            lat, lng = rng.choice(CITIES)
+            profile = ProviderProfile(
+                user=user, business_name=f'Vet {i}', ruc=f'3{i:010d}', address='Av.', phone='1',
+                latitude=lat + rng.gauss(0, 0.15), longitude=lng + rng.gauss(0, 0.15),
+            )
+            profile.update_geohash()
+            profiles.append(profile)
+        ProviderProfile.objects.bulk_create(profiles)
+
+
+def run(args):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    from users import geo
+    from users.models import ProviderProfile
+
+    rng = random.Random(1)
+    points = [(lat + rng.gauss(0, 0.05), lng + rng.gauss(0, 0.05)) for lat, lng in CITIES for _ in range(3)]
+    located = ProviderProfile.objects.filter(latitude__isnull=False)
+
+    def indexed(point):
+        return geo.nearby(ProviderProfile.objects.all(), *point, args.radius_km, args.limit)
+
+    def scan(point):
+        rows = located.values_list('id', 'latitude', 'longitude')
+        return sorted(
+            (d, pk) for pk, lat, lng in rows
+            if (d := geo.distance_km(*point, lat, lng)) <= args.radius_km
+        )[:args.limit]
+
+    rows, seeded = [], 0
+    for size in args.sizes:
+        seed(seeded, size, rng)
+        seeded = size
+        for name, fn in (('geohash', indexed), ('full scan', scan)):
+            samples, found = [], 0
+            for i in range(args.repeat):
+                point = points[i % len(points)]
+                with timer() as elapsed:
+                    found += len(fn(point))
+                samples.append(elapsed['elapsed'])
+            stats = summarize(samples)
+            rows.append({
+                'providers': size, 'path': name, 'avg_returned': round(found / args.repeat, 1),
+                'p50_ms': stats['p50_ms'], 'p95_ms': stats['p95_ms'],
+            })
+        # Rows actually read by the indexed query, for one point
+        with CaptureQueriesContext(connection) as queries:
+            indexed(points[0])
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM ({queries.captured_queries[0]['sql']})")
+            rows[-2]['candidates'] = cursor.fetchone()[0]
+        rows[-1]['candidates'] = located.count()
+
+    print(f'radius: {args.radius_km} km')
+    print_table(rows, ['providers', 'path', 'candidates', 'avg_returned', 'p50_ms', 'p95_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+N single POST /api/pets/ vs. one POST /api/pets/batch/.
+
+Both paths authenticate with a real JWT, so the per-request user lookup
+and transaction are part of what is measured.
+
+    python -m benchmarks.bench_pet_batch --pets 50 --repeat 5
+"""
+import argparse
+
+from benchmarks.utils import make_client, print_table, setup_django, summarize, teardown_django, timer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pets', type=int, default=50, help='Pets per round')
+    parser.add_argument('--repeat', type=int, default=5, help='Rounds per path')
+    args = parser.parse_args()
+
+    setup_django()
+    try:
+        run(args)
+    finally:
+        teardown_django()
+
+
+def run(args):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    owner = make_client(0)
+    api = APIClient()
+    api.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(owner).access_token}')
+    items = [
+        {'name': f'Firulais {i}', 'species': 'dog', 'gender': 'M', 'breed': 'Mestizo', 'weight': '12.50'}
+        for i in range(args.pets)
+    ]
+
+    def single():
+        for item in items:
+            assert api.post('/api/pets/', item, format='json').status_code == 201
+
+    def batch():
+        assert api.post('/api/pets/batch/', items, format='json').status_code == 201
+
+    rows = []
+    for name, fn in (('single POSTs', single), ('batch POST', batch)):
+        samples = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(args.repeat):
+                with timer() as elapsed:
+                    fn()
+                samples.append(elapsed['elapsed'])
+        stats = summarize(samples)
+        rows.append({
+            'path': name, 'pets': args.pets, 'round_ms': stats['p50_ms'],
+            'pets_per_sec': round(args.pets / (stats['p50_ms'] / 1000), 1),
+            'queries_per_round': len(queries) // args.repeat,
+        })
+
+    print_table(rows, ['path', 'pets', 'round_ms', 'pets_per_sec', 'queries_per_round'])
+
+
+if __name__ == '__main__':
+    main()
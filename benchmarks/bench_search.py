@@ -0,0 +1,117 @@
+"""
+Catalog search benchmark.
+
+Seeds --services services (100k by default) from a small veterinary
+vocabulary and compares, for a few queries, the first page of:
+
+  fts             the indexed, ranked ?q= search (services/search.py)
+  icontains       an unranked icontains filter (stops after 50 hits, but
+                  scans the whole table for rare words)
+  icontains_rank  icontains ordered by "name matches first", which has to
+                  scan every row like any ranking without an index
+  api             GET /api/services/?q= end to end, catalog cache cleared
+
+    python -m benchmarks.bench_search [--services 100000]
+"""
+import argparse
+import random
+
+from benchmarks.utils import make_provider, print_table, setup_django, summarize, teardown_django, timer
+
+NOUNS = [
+    'consulta', 'vacuna', 'baño', 'corte', 'desparasitación', 'cirugía', 'radiografía', 'ecografía',
+    'limpieza', 'dental', 'esterilización', 'análisis', 'hospedaje', 'paseo', 'adiestramiento', 'microchip',
+]
+QUALIFIERS = [
+    'general', 'urgente', 'a domicilio', 'para perros', 'para gatos', 'premium', 'básico', 'completo',
+    'nocturno', 'express', 'preventivo', 'especializado',
+]
+QUERIES = ['vacuna', 'vacuna gatos', 'desparasit', 'ecografía urgente', 'microchip domicilio', 'zzz']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--services', type=int, default=100_000)
+    parser.add_argument('--providers', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    try:
+        run(args)
+    finally:
+        teardown_django()
+
+
+def seed(args):
+    from services.models import Service
+
+    rng = random.Random(42)
+    providers = [make_provider(index) for index in range(args.providers)]
+    batch = []
+    for i in range(args.services):
+        noun, qualifier = rng.choice(NOUNS), rng.choice(QUALIFIERS)
+        batch.append(Service(
+            provider=providers[i % len(providers)], name=f'{noun.capitalize()} {qualifier}',
+            description=f'{rng.choice(NOUNS)} {rng.choice(QUALIFIERS)} y {rng.choice(NOUNS)} incluido',
+            price='50.00', duration=30,
+        ))
+        if len(batch) == 5000:
+            Service.objects.bulk_create(batch)
+            batch = []
+    Service.objects.bulk_create(batch)
+
+
+def run(args):
+    from django.core.cache import cache
+    from django.db.models import Case, FloatField, Q, Value, When
+    from rest_framework.test import APIClient
+
+    from services.models import Service
+    from services.search import parse_terms, search
+
+    with timer() as elapsed:
+        seed(args)
+    print(f'seeded {args.services} services in {elapsed["elapsed"]:.1f}s (search index maintained by triggers)')
+
+    active = Service.objects.filter(is_active=True)
+    api = APIClient()
+
+    def indexed(q):
+        return list(search(active, q).order_by('-search_rank', 'id')[:50])
+
+    def scan(q):
+        queryset = active
+        for term in parse_terms(q):
+            queryset = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+        return queryset
+
+    def unranked(q):
+        return list(scan(q).order_by('created_at', 'id')[:50])
+
+    def ranked(q):
+        terms = parse_terms(q)
+        rank = Case(When(name__icontains=terms[0], then=Value(1.0)), default=Value(0.0), output_field=FloatField())
+        return list(scan(q).annotate(rank=rank).order_by('-rank', 'id')[:50])
+
+    def endpoint(q):
+        cache.clear()
+        assert api.get('/api/services/', {'q': q}).status_code == 200
+
+    rows = []
+    for q in QUERIES:
+        matches = search(active, q).count()
+        for name, fn in (('fts', indexed), ('icontains', unranked), ('icontains_rank', ranked), ('api', endpoint)):
+            samples = []
+            for _ in range(args.repeat):
+                with timer() as elapsed:
+                    fn(q)
+                samples.append(elapsed['elapsed'])
+            stats = summarize(samples)
+            rows.append({'query': q, 'matches': matches, 'path': name, 'p50_ms': stats['p50_ms'], 'p95_ms': stats['p95_ms']})
+
+    print_table(rows, ['query', 'matches', 'path', 'p50_ms', 'p95_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Provider analytics benchmark.
+
+Seeds --appointments appointments (200k by default) for one busy provider
+over the last year, builds the daily rollups with the backfill, and compares
+a year of per-day/per-status bookings and revenue computed:
+
+  live     GROUP BY date, status over the appointments table (joined to
+           services for the provider and the price)
+  rollups  the same answer from AppointmentDailyStat (appointments/stats.py)
+  api      GET /api/appointments/stats/ end to end
+
+It also times the per-write cost the rollups add to a booking and a
+status change.
+
+    python -m benchmarks.bench_stats [--appointments 200000]
+"""
+import argparse
+import random
+from datetime import time, timedelta
+
+from benchmarks.utils import make_client, make_provider, print_table, setup_django, summarize, teardown_django, timer
+
+STATUSES = ['pending', 'confirmed', 'cancelled', 'completed']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--appointments', type=int, default=200_000)
+    parser.add_argument('--services', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    try:
+        run(args)
+    finally:
+        teardown_django()
+
+
+def seed(args, provider, client):
+    from django.utils import timezone
+
+    from appointments.models import Appointment
+    from services.models import Service
+
+    services = [
+        Service.objects.create(
+            provider=provider, name=f'Servicio {i}', description='Bench', price=f'{20 + 5 * i}.00', duration=15,
+        )
+        for i in range(args.services)
+    ]
+    rng = random.Random(42)
+    today = timezone.localdate()
+    # Every (service, day, minute) slot at most once: bulk_create skips booking.py
+    minutes = 24 * 60
+    batch = []
+    for slot in rng.sample(range(len(services) * 365 * minutes), args.appointments):
+        service, day, minute = services[slot // (365 * minutes)], slot // minutes % 365, slot % minutes
+        batch.append(Appointment(
+            client=client, service=service, date=today - timedelta(days=day),
+            time=time(minute // 60, minute % 60), status=rng.choice(STATUSES),
+        ))
+        if len(batch) == 5000:
+            Appointment.objects.bulk_create(batch)
+            batch = []
+    Appointment.objects.bulk_create(batch)
+    return services
+
+
+def run(args):
+    from django.db.models import Count, Q, Sum
+    from django.utils import timezone
+    from rest_framework.test import APIClient
+
+    from appointments.models import Appointment
+    from appointments.stats import backfill, daily_stats
+
+    provider, client = make_provider(0), make_client(0)
+    with timer() as elapsed:
+        services = seed(args, provider, client)
+    print(f'seeded {args.appointments} appointments in {elapsed["elapsed"]:.1f}s')
+    with timer() as elapsed:
+        written = backfill()
+    print(f'backfill: {written} rollup rows in {elapsed["elapsed"] * 1000:.0f} ms')
+
+    end = timezone.localdate()
+    start = end - timedelta(days=364)
+    api = APIClient()
+    api.force_authenticate(provider.user)
+
+    def live():
+        return list(
+            Appointment.objects.order_by()
+            .filter(service__provider_id=provider.id, date__range=(start, end))
+            .values('date', 'status')
+            .annotate(total=Count('id'), revenue=Sum('service__price', filter=Q(status='completed')))
+        )
+
+    def rollups():
+        return daily_stats(provider.id, start, end)
+
+    def endpoint():
+        assert api.get('/api/appointments/stats/').status_code == 200
+
+    rows = []
+    for name, fn in (('live', live), ('rollups', rollups), ('api', endpoint)):
+        samples = []
+        for _ in range(args.repeat):
+            with timer() as elapsed:
+                fn()
+            samples.append(elapsed['elapsed'])
+        stats = summarize(samples)
+        rows.append({'path': name, 'p50_ms': stats['p50_ms'], 'p95_ms': stats['p95_ms']})
+    print_table(rows, ['path', 'p50_ms', 'p95_ms'])
+
+    # Write overhead of the incremental update
+    samples = {'create': [], 'status change': []}
+    for i in range(args.repeat):
+        with timer() as elapsed:
+            appointment = Appointment.objects.create(
+                client=client, service=services[0], date=end + timedelta(days=1 + i), time=time(9),
+            )
+        samples['create'].append(elapsed['elapsed'])
+        appointment.status = 'completed'
+        with timer() as elapsed:
+            appointment.save()
+        samples['status change'].append(elapsed['elapsed'])
+    print_table(
+        [{'write': name, 'p50_ms': summarize(values)['p50_ms'], 'p95_ms': summarize(values)['p95_ms']}
+         for name, values in samples.items()],
+        ['write', 'p50_ms', 'p95_ms'],
+    )
+
+
+if __name__ == '__main__':
+    main()
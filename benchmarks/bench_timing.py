@@ -0,0 +1,66 @@
+"""
+Request timing overhead benchmark.
+
+Fetches a list and a detail endpoint --repeat times with
+settings.SERVER_TIMING off and on (Server-Timing header, per-query
+wrapper, slow-request check) and reports p50/p95 per request and the
+difference.
+
+    python -m benchmarks.bench_timing [--rows 200 --repeat 500]
+"""
+import argparse
+
+from benchmarks.utils import make_client, make_provider, print_table, setup_django, summarize, teardown_django, timer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+    try:
+        run(args)
+    finally:
+        teardown_django()
+
+
+def run(args):
+    from django.test.utils import override_settings
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    from pets.models import Pet
+
+    make_provider(0)
+    client = make_client(0)
+    Pet.objects.bulk_create(
+        Pet(owner=client, name=f'Firulais {i}', species='dog', breed='Mestizo', gender='M', weight='12.50')
+        for i in range(args.rows)
+    )
+    api = APIClient()
+    api.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(client).access_token}')
+    pet = Pet.objects.first()
+
+    results = []
+    for url in ('/api/pets/', f'/api/pets/{pet.id}/'):
+        p50 = {}
+        # Interleaved rounds so that drift affects both settings alike
+        samples = {False: [], True: []}
+        for _ in range(args.repeat):
+            for enabled in (False, True):
+                with override_settings(SERVER_TIMING=enabled), timer() as elapsed:
+                    response = api.get(url)
+                samples[enabled].append(elapsed['elapsed'])
+                assert response.status_code == 200 and ('Server-Timing' in response) == enabled
+        for enabled in (False, True):
+            stats = summarize(samples[enabled])
+            p50[enabled] = stats['p50_ms']
+            results.append({'endpoint': url, 'server_timing': 'on' if enabled else 'off', **stats})
+        results[-1]['overhead'] = f'{(p50[True] - p50[False]) / p50[False]:+.1%}'
+    print_table(results, ['endpoint', 'server_timing', 'count', 'p50_ms', 'p95_ms', 'overhead'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Each benchmark runs in-process against a throw-away test database created
+from DATABASES['default'] (a temporary SQLite file unless DATABASE_URL
+points somewhere else), so a real database is never touched.
+
+Run a benchmark from the project root, e.g.:
+    python -m benchmarks.bench_availability
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    """Configure Django and create an isolated test database."""
+    if str(BASE_DIR) not in sys.path:
+        sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'kunapet_backend.settings')
+    os.environ.setdefault('DEBUG', 'False')
+
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    db = settings.DATABASES['default']
+    if connection.vendor == 'sqlite':
+        # File based so that worker threads share the same database
+        handle, path = tempfile.mkstemp(prefix='kunapet-bench-', suffix='.sqlite3')
+        os.close(handle)
+        db.setdefault('TEST', {})['NAME'] = path
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+
+def teardown_django():
+    from django.conf import settings
+    from django.db import connection
+
+    name = settings.DATABASES['default']['NAME']
+    connection.creation.destroy_test_db(name, verbosity=0)
+    if connection.vendor == 'sqlite' and os.path.exists(name):
+        os.remove(name)
+
+
+@contextmanager
+def timer():
+    """Yield a dict whose 'elapsed' key holds the block's wall time in seconds."""
+    result = {}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result['elapsed'] = time.perf_counter() - start
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """p50/p95/p99/mean (in ms) of a list of durations in seconds."""
+    ms = [s * 1000 for s in samples]
+    return {
+        'count': len(ms),
+        'mean_ms': round(statistics.fmean(ms), 3) if ms else 0.0,
+        'p50_ms': round(percentile(ms, 50), 3),
+        'p95_ms': round(percentile(ms, 95), 3),
+        'p99_ms': round(percentile(ms, 99), 3),
+    }
+
+
+def print_table(rows, columns):
+    """Print a list of dicts as a fixed-width table."""
+    widths = {col: max(len(col), *(len(str(row.get(col, ''))) for row in rows)) for col in columns}
+    print('  '.join(col.ljust(widths[col]) for col in columns))
+    print('  '.join('-' * widths[col] for col in columns))
+    for row in rows:
+        print('  '.join(str(row.get(col, '')).ljust(widths[col]) for col in columns))
+
+
+def make_provider(index=0, **service_fields):
+    """Create a provider user + profile (+ one service if fields given)."""
+    from users.models import ProviderProfile, User
+
+    user = User.objects.create(
+        email=f'provider{index}@bench.kunapet.com', username=f'provider{index}@bench.kunapet.com',
+        role=User.Role.PROVIDER,
+    )
+    profile = ProviderProfile.objects.create(
+        user=user, business_name=f'Vet {index}', ruc=f'20{index:09d}',
+        address='Av. Principal 123', phone='999888777',
+    )
+    if service_fields:
+        from services.models import Service
+        service_fields.setdefault('name', 'Consulta')
+        service_fields.setdefault('description', 'Consulta general')
+        service_fields.setdefault('price', '50.00')
+        service_fields.setdefault('duration', 30)
+        Service.objects.create(provider=profile, **service_fields)
+    return profile
+
+
+def make_client(index=0):
+    from users.models import User
+
+    return User.objects.create(
+        email=f'client{index}@bench.kunapet.com', username=f'client{index}@bench.kunapet.com',
+        role=User.Role.CLIENT,
+    )
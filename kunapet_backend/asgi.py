@@ -3,6 +3,10 @@ ASGI config for kunapet_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it to get the async endpoints (users/async_views.py) and the
+appointment event streams (appointments/async_views.py), e.g.
+    gunicorn kunapet_backend.asgi:application -k uvicorn.workers.UvicornWorker
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
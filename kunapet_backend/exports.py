@@ -0,0 +1,122 @@
+"""
+Streaming CSV/JSONL exports.
+
+Rows come from a values_list() iterator (no model instances, no
+serializers) and are encoded into ~64 KB chunks as they are read, so an
+export holds one chunk of rows and one chunk of output at a time whatever
+its size. The same generator feeds StreamingHttpResponse (API) and files
+(`manage.py export_data`).
+
+The apps define what is exported (appointments/exports.py,
+services/exports.py): a queryset and [(column, field), ...].
+"""
+import csv
+import io
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework.negotiation import BaseContentNegotiation
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+FORMATS = tuple(CONTENT_TYPES)
+FLUSH_BYTES = 64 * 1024
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """
+    The export views answer in the format named by the URL; errors are
+    rendered with the first renderer (JSON) whatever Accept says.
+    """
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def parse_filters(query_params, statuses):
+    """
+    Read ?start=&end=YYYY-MM-DD and ?status=a,b (all optional).
+    Returns (start, end, status_list, error_message).
+    """
+    try:
+        start = date.fromisoformat(query_params['start']) if query_params.get('start') else None
+        end = date.fromisoformat(query_params['end']) if query_params.get('end') else None
+    except ValueError:
+        return None, None, None, 'Dates must use the YYYY-MM-DD format.'
+    if start and end and end < start:
+        return None, None, None, "'end' must not be before 'start'."
+
+    wanted = [value for value in query_params.get('status', '').split(',') if value]
+    unknown = sorted(set(wanted) - set(statuses))
+    if unknown:
+        return None, None, None, f"Unknown status {', '.join(unknown)}; expected one of {', '.join(statuses)}."
+    return start, end, wanted or None, None
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _csv_chunks(rows, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_cell(value) for value in row])
+        if buffer.tell() >= FLUSH_BYTES:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def _jsonl_chunks(rows, columns):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    buffer, size = [], 0
+    for row in rows:
+        line = encoder.encode(dict(zip(columns, row))) + '\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            yield ''.join(buffer).encode()
+            buffer, size = [], 0
+    yield ''.join(buffer).encode()
+
+
+def export_chunks(queryset, columns, fmt):
+    """
+    Yield the export of `queryset` as bytes. `columns` is
+    [(column name, values_list field), ...].
+    """
+    names = [name for name, _ in columns]
+    rows = queryset.values_list(*[field for _, field in columns]).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    if fmt == 'csv':
+        return _csv_chunks(rows, names)
+    if fmt == 'jsonl':
+        return _jsonl_chunks(rows, names)
+    raise ValueError(f'Unknown format {fmt!r}; expected one of {FORMATS}.')
+
+
+def export_response(queryset, columns, fmt, filename):
+    response = StreamingHttpResponse(export_chunks(queryset, columns, fmt), content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+
+def write_export(queryset, columns, fmt, stream):
+    """Write the export to a binary stream; returns the bytes written."""
+    written = 0
+    for chunk in export_chunks(queryset, columns, fmt):
+        stream.write(chunk)
+        written += len(chunk)
+    return written
@@ -0,0 +1,178 @@
+"""
+Read-only fast path for list endpoints.
+
+A page of N rows through ModelSerializer builds N model instances and
+walks every field's get_attribute()/to_representation() per row. For GET
+lists, FastListMixin instead fetches the page as values() rows and maps
+each row with per-field converters compiled once per request from the
+same serializer (so ?fields=/?expand= apply), rendered by
+FastJSONRenderer. The output is byte-for-byte what the serializer gives
+(see the *ParityTests).
+
+Fields map as follows:
+  * model columns, possibly through forward relations (`provider.rating`),
+    with the field's own to_representation() unless it is the identity
+    for what the database returns (str, int, bool, primary keys);
+  * file fields through a FieldFile, as DRF's FileField expects;
+  * nested serializers recursively, on the joined columns;
+  * SerializerMethodField `x` through `fast_x(*values)` on the serializer,
+    fed the columns listed in Meta.sparse_sources['x'].
+A serializer with any other field keeps the regular path.
+"""
+from django.conf import settings
+from rest_framework import ISO_8601, fields as drf_fields, relations, serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .fields import _resolve
+from .renderers import FastJSONRenderer
+from .timing import timed
+
+# json and orjson print floats differently outside this range (1e-05 vs 0.00001)
+FLOAT_SAFE_RANGE = (1e-4, 1e16)
+
+# to_representation() methods that return what values() already holds
+IDENTITY_REPRESENTATIONS = {
+    drf_fields.CharField.to_representation, drf_fields.IntegerField.to_representation,
+    drf_fields.BooleanField.to_representation, drf_fields.ChoiceField.to_representation,
+    drf_fields.ReadOnlyField.to_representation,
+}
+
+
+class Unsupported(Exception):
+    """Raised for a field the fast path cannot map; the serializer is used instead."""
+
+
+class RowMapper:
+    """Callable turning a values() row into the serializer's representation."""
+
+    def __init__(self, serializer):
+        self.json_safe = True
+        self.paths = []
+        self.build = self.compile(serializer, '')
+
+    def __call__(self, row):
+        return self.build(row)
+
+    def compile(self, serializer, prefix):
+        model = serializer.Meta.model
+        sources = getattr(serializer.Meta, 'sparse_sources', {})
+        steps = []
+        for field in serializer._readable_fields:
+            name = field.field_name
+            hook = getattr(serializer, f'fast_{name}', None)
+            if isinstance(field, serializers.SerializerMethodField):
+                if hook is None or name not in sources:
+                    raise Unsupported(name)
+                keys = [self.add_path(model, prefix, path.split('__')) for path in sources[name]]
+                steps.append((name, None, lambda row, hook=hook, keys=keys: hook(*[row[key] for key in keys]), True))
+                continue
+            if field.source == '*' or isinstance(field, serializers.ListSerializer):
+                raise Unsupported(name)
+
+            key = self.add_path(model, prefix, field.source_attrs)
+            if isinstance(field, serializers.BaseSerializer):
+                steps.append((name, key, self.compile(field, key), True))
+            else:
+                steps.append((name, key, self.converter(field, model, field.source_attrs), False))
+
+        def build(row):
+            data = {}
+            # `whole_row` steps (nested serializers, methods) read several columns
+            for name, key, step, whole_row in steps:
+                value = row[key] if key is not None else row
+                data[name] = None if value is None else step(row if whole_row else value)
+            return data
+        return build
+
+    def add_path(self, model, prefix, attrs):
+        resolved = _resolve(model, attrs)
+        if resolved is None:
+            raise Unsupported('__'.join(attrs))
+        key = f'{prefix}__{resolved[0]}' if prefix else resolved[0]
+        if key not in self.paths:
+            self.paths.append(key)
+        return key
+
+    def converter(self, field, model, attrs):
+        for attr in attrs[:-1]:
+            model = model._meta.get_field(attr).related_model
+        model_field = model._meta.get_field(attrs[-1])
+        if isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None:
+            return lambda value: value  # values() already holds the key
+        if isinstance(field, drf_fields.FileField):
+            return lambda value: field.to_representation(model_field.attr_class(None, model_field, value))
+        if isinstance(field, drf_fields.FloatField):
+            return self.float_converter(field)
+        if type(field) is drf_fields.DateTimeField:
+            return datetime_converter(field)
+        if type(field).to_representation in IDENTITY_REPRESENTATIONS or (
+            isinstance(field, drf_fields.JSONField) and not field.binary
+        ):
+            return lambda value: value
+        return field.to_representation
+
+    def float_converter(self, field):
+        low, high = FLOAT_SAFE_RANGE
+
+        def convert(value):
+            value = field.to_representation(value)
+            if value and not low <= abs(value) < high:
+                self.json_safe = False
+            return value
+        return convert
+
+
+def datetime_converter(field):
+    """
+    DateTimeField.to_representation() with the output timezone looked up
+    once instead of per value (ISO 8601 and aware values only).
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if value.tzinfo is None:
+            return field.to_representation(value)
+        try:
+            text = value.astimezone(field_timezone).isoformat()
+        except OverflowError:
+            return field.to_representation(value)
+        return text[:-6] + 'Z' if text.endswith('+00:00') else text
+    return convert
+
+
+def compile_mapper(serializer):
+    """A RowMapper for `serializer`, or None if it has fields the fast path can't map."""
+    try:
+        return RowMapper(serializer)
+    except Unsupported:
+        return None
+
+
+class FastListMixin:
+    """
+    ListAPIView mixin: GET lists go through RowMapper (settings.FAST_LIST_PATH).
+    Keyset paginators read their ordering columns from the rows.
+    """
+    renderer_classes = [FastJSONRenderer] + [
+        renderer for renderer in api_settings.DEFAULT_RENDERER_CLASSES if not issubclass(renderer, JSONRenderer)
+    ]
+
+    def list(self, request, *args, **kwargs):
+        mapper = compile_mapper(self.get_serializer()) if settings.FAST_LIST_PATH else None
+        if mapper is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = [name.lstrip('-') for name in getattr(self.paginator, 'ordering', ())]
+        rows = queryset.values(*mapper.paths, *[name for name in ordering if name not in mapper.paths])
+        page = self.paginate_queryset(rows)
+        with timed('serialize'):
+            data = [mapper(row) for row in (page if page is not None else rows)]
+        response = self.get_paginated_response(data) if page is not None else Response(data)
+        response.fast_json = mapper.json_safe
+        return response
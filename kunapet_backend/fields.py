@@ -0,0 +1,180 @@
+"""
+Sparse fieldsets (?fields=) and opt-in expansion (?expand=) for GET
+responses.
+
+    ?fields=id,date,status,service_details.name
+        only these fields; a dotted name selects inside a nested object,
+        a bare nested name keeps the whole object.
+    ?expand=provider
+        adds an opt-in nested object (Meta.expandable_fields) that is not
+        part of the default output. Dotted names expand inside nested ones.
+
+Without either parameter a response is exactly what it was before.
+
+Serializers opt in with SparseFieldsMixin. Views with SparseQuerysetMixin
+also trim the query to the requested columns: only() with the columns the
+remaining fields read and select_related() with just the relations they
+follow. Method fields declare what they read in Meta.sparse_sources;
+a field whose columns cannot be worked out disables the trimming
+(never the response) for that request.
+"""
+from rest_framework import permissions, serializers
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_fieldset(value):
+    """'a,b.c,b.d' -> {'a': {}, 'b': {'c': {}, 'd': {}}}"""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for part in path.strip().split('.'):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def requested_fieldsets(request):
+    """(fields tree or None, expand tree) of a safe request."""
+    if request is None or request.method not in permissions.SAFE_METHODS:
+        return None, {}
+    params = request.query_params
+    fields = parse_fieldset(params[FIELDS_PARAM]) if FIELDS_PARAM in params else None
+    return fields, parse_fieldset(params.get(EXPAND_PARAM, ''))
+
+
+class SparseFieldsMixin:
+    """
+    ModelSerializer mixin. Meta.expandable_fields maps a name to a
+    zero-argument callable building the opt-in field. Nested serializers
+    with this mixin receive their part of the fieldsets from the parent.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset, expand = self.sparse_fieldsets()
+        for name, build in getattr(self.Meta, 'expandable_fields', {}).items():
+            if name in expand or (fieldset and name in fieldset):
+                fields[name] = build()
+        if fieldset is not None:
+            # Expanding a field also asks for it
+            fields = {name: field for name, field in fields.items() if name in fieldset or name in expand}
+
+        for name, field in fields.items():
+            nested = getattr(field, 'child', field)
+            if isinstance(nested, SparseFieldsMixin):
+                subset = fieldset.get(name) if fieldset is not None else None
+                # A bare nested name keeps all of its fields
+                nested._sparse_fieldsets = (subset or None, expand.get(name, {}))
+        return fields
+
+    def sparse_fieldsets(self):
+        if hasattr(self, '_sparse_fieldsets'):
+            return self._sparse_fieldsets
+        # The top-level serializer reads the request
+        return requested_fieldsets(self.context.get('request'))
+
+
+def _resolve(model, attrs):
+    """
+    (column path, relation paths) for a dotted source on `model`, or None
+    if it is not a chain of forward relations ending in a concrete field.
+    """
+    relations = []
+    for index, attr in enumerate(attrs):
+        try:
+            field = model._meta.get_field(attr)
+        except Exception:
+            return None
+        if not field.concrete:
+            return None
+        if index < len(attrs) - 1:
+            if not (field.many_to_one or field.one_to_one):
+                return None
+            relations.append('__'.join(attrs[:index + 1]))
+            model = field.related_model
+    return '__'.join(attrs), relations
+
+
+def query_plan(serializer, prefix=''):
+    """
+    (columns, relations) that the serializer's current fields read, as
+    only()/select_related() paths, or None if they cannot be worked out.
+    """
+    def join(path):
+        return f'{prefix}__{path}' if prefix else path
+
+    model = serializer.Meta.model
+    columns, relations = set(), set()
+    sources = getattr(serializer.Meta, 'sparse_sources', {})
+    for name, field in serializer.fields.items():
+        if name in sources:
+            paths = [path.split('__') for path in sources[name]]
+        elif field.source == '*':
+            return None
+        else:
+            paths = [field.source_attrs]
+
+        for attrs in paths:
+            resolved = _resolve(model, attrs)
+            if resolved is None:
+                return None
+            path, chain = resolved
+            columns.add(join(path))
+            columns.update(join(relation) for relation in chain)
+            relations.update(join(relation) for relation in chain)
+
+        nested = getattr(field, 'child', field)
+        if isinstance(nested, serializers.BaseSerializer) and name not in sources:
+            if nested is not field or not hasattr(nested, 'Meta'):
+                return None  # to-many relations are not joins
+            inner = query_plan(nested, join(path))
+            if inner is None:
+                return None
+            relations.add(join(path))
+            columns.update(inner[0])
+            relations.update(inner[1])
+    return columns, relations
+
+
+class SparseQuerysetMixin:
+    """
+    GenericAPIView mixin: when ?fields= is given on a GET, load only the
+    columns and relations the remaining fields need; ?expand= alone only
+    adds the joins of the expansions. `sparse_keep` lists
+    extra paths the view itself reads (permissions, ...); the paginator's
+    ordering columns and `last_modified_fields` are kept too.
+    """
+    sparse_keep = ()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fieldset, expand = requested_fieldsets(self.request)
+        if fieldset is None and not expand:
+            return queryset
+        plan = query_plan(self.get_serializer())
+        if plan is None:
+            return queryset
+        columns, relations = plan
+        if fieldset is None:
+            # All columns; only join what the expansions follow
+            return queryset.select_related(*relations) if relations else queryset
+        model = queryset.model
+        # ConditionalGetMixin reads the validators off the object
+        keep = [path.split('__') for path in (*self.sparse_keep, *getattr(self, 'last_modified_fields', ()))]
+        paginator = self.paginator
+        keep += [[name.lstrip('-')] for name in getattr(paginator, 'ordering', ())]
+        for attrs in keep:
+            resolved = _resolve(model, attrs)
+            if resolved is None:
+                continue  # annotations (search_rank, ...) need no column
+            path, chain = resolved
+            columns.add(path)
+            columns.update(chain)
+            relations.update(chain)
+        # select_related() without arguments would follow every relation
+        queryset = queryset.select_related(None)
+        if relations:
+            queryset = queryset.select_related(*sorted(relations))
+        return queryset.only(model._meta.pk.name, *sorted(columns))
@@ -0,0 +1,253 @@
+"""
+Prometheus metrics: GET /metrics in the text exposition format.
+
+- kunapet_http_requests_total / kunapet_http_request_duration_seconds:
+  every request, by view class (or function) name, method and status
+  (MetricsMiddleware);
+- kunapet_db_queries_total / kunapet_db_query_duration_seconds_total:
+  every SQL statement, by database alias (the execute wrapper of
+  kunapet_backend/timing.py);
+- kunapet_password_hash_duration_seconds: every PBKDF2 hash, by the view
+  that asked for it (users/hashers.py).
+
+Each process counts in memory. With METRICS_DIR set (required with
+several gunicorn workers), every process also writes a snapshot of its
+counts to METRICS_DIR/<pid>.json at most every METRICS_FLUSH_SECONDS, and
+/metrics sums the snapshots of all processes, so it answers the same
+whichever worker serves it. Snapshots of exited workers are kept, so
+counters never go backwards; empty the directory when deploying.
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from rest_framework import status
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+HASH_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_request = ContextVar('metrics_request', default=None)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = []
+        self.last_flush = 0.0
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def snapshot(self):
+        with self.lock:
+            return {metric.name: metric.dump() for metric in self.metrics}
+
+    def flush(self, directory):
+        """Atomically replace this process's snapshot file."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        handle, path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        with os.fdopen(handle, 'w') as snapshot:
+            json.dump(self.snapshot(), snapshot)
+        os.replace(path, directory / f'{os.getpid()}.json')
+        self.last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        if settings.METRICS_DIR and time.monotonic() - self.last_flush >= settings.METRICS_FLUSH_SECONDS:
+            self.flush(settings.METRICS_DIR)
+
+    def collect(self):
+        """Snapshots of every process (or just this one), summed per metric."""
+        if not settings.METRICS_DIR:
+            snapshots = [self.snapshot()]
+        else:
+            self.flush(settings.METRICS_DIR)
+            snapshots = []
+            for path in Path(settings.METRICS_DIR).glob('*.json'):
+                try:
+                    snapshots.append(json.loads(path.read_text()))
+                except (OSError, ValueError):
+                    continue  # replaced or removed while being read
+        return {metric.name: metric.merge(snapshot.get(metric.name, {}) for snapshot in snapshots) for metric in self.metrics}
+
+    def render(self):
+        totals = self.collect()
+        return ''.join(metric.render(totals[metric.name]) for metric in self.metrics)
+
+
+registry = Registry()
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}
+        registry.register(self)
+
+    def inc(self, labels, amount=1):
+        with registry.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dump(self):
+        # JSON keys must be strings
+        return {json.dumps(labels): value for labels, value in self.values.items()}
+
+    def merge(self, dumps):
+        total = {}
+        for dump in dumps:
+            for key, value in dump.items():
+                total[key] = total.get(key, 0) + value
+        return total
+
+    def render(self, values):
+        lines = [f'# HELP {self.name} {self.documentation}\n', f'# TYPE {self.name} {self.kind}\n']
+        for key, value in sorted(values.items()):
+            lines.append(f'{self.name}{format_labels(self.labelnames, json.loads(key))} {format_value(value)}\n')
+        return ''.join(lines)
+
+
+class Histogram(Counter):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames, buckets):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def observe(self, labels, seconds):
+        with registry.lock:
+            series = self.values.get(labels)
+            if series is None:
+                # [count per bucket (not cumulative), +Inf, sum]
+                series = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+            series[index] += 1
+            series[-1] += seconds
+
+    def dump(self):
+        return {json.dumps(labels): list(series) for labels, series in self.values.items()}
+
+    def merge(self, dumps):
+        total = {}
+        for dump in dumps:
+            for key, series in dump.items():
+                if key in total:
+                    total[key] = [a + b for a, b in zip(total[key], series)]
+                else:
+                    total[key] = list(series)
+        return total
+
+    def render(self, values):
+        lines = [f'# HELP {self.name} {self.documentation}\n', f'# TYPE {self.name} {self.kind}\n']
+        for key, series in sorted(values.items()):
+            labels = json.loads(key)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), series):
+                cumulative += count
+                le = format_labels((*self.labelnames, 'le'), (*labels, bound if bound == '+Inf' else format_value(bound)))
+                lines.append(f'{self.name}_bucket{le} {cumulative}\n')
+            lines.append(f'{self.name}_sum{format_labels(self.labelnames, labels)} {format_value(series[-1])}\n')
+            lines.append(f'{self.name}_count{format_labels(self.labelnames, labels)} {cumulative}\n')
+        return ''.join(lines)
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REQUESTS = Counter(
+    'kunapet_http_requests_total', 'HTTP requests served, by view, method and status.', ('view', 'method', 'status'),
+)
+REQUEST_DURATION = Histogram(
+    'kunapet_http_request_duration_seconds', 'Time to build the response, by view, method and status.',
+    ('view', 'method', 'status'), LATENCY_BUCKETS,
+)
+DB_QUERIES = Counter('kunapet_db_queries_total', 'SQL statements executed, by database alias.', ('database',))
+DB_QUERY_DURATION = Counter(
+    'kunapet_db_query_duration_seconds_total', 'Time spent executing SQL statements, by database alias.', ('database',),
+)
+PASSWORD_HASH_DURATION = Histogram(
+    'kunapet_password_hash_duration_seconds', 'Time per password hash, by the view that needed it.',
+    ('view',), HASH_BUCKETS,
+)
+
+
+def view_name(request):
+    """'PetListCreateView' for class-based views, the function name otherwise."""
+    match = request.resolver_match if request is not None else None
+    if match is None:
+        return ''
+    func = match.func
+    view_class = getattr(func, 'view_class', None) or getattr(func, 'cls', None)
+    return view_class.__name__ if view_class is not None else getattr(func, '__name__', '')
+
+
+def begin(request):
+    """Make `request` the current one (for observe_password_hash())."""
+    return _request.set(request)
+
+
+def end(token):
+    _request.reset(token)
+
+
+def observe_request(request, response, seconds):
+    labels = (view_name(request), request.method, str(response.status_code))
+    REQUESTS.inc(labels)
+    REQUEST_DURATION.observe(labels, seconds)
+    registry.maybe_flush()
+
+
+def observe_query(alias, seconds):
+    with registry.lock:
+        DB_QUERIES.values[(alias,)] = DB_QUERIES.values.get((alias,), 0) + 1
+        DB_QUERY_DURATION.values[(alias,)] = DB_QUERY_DURATION.values.get((alias,), 0.0) + seconds
+
+
+def observe_password_hash(seconds):
+    PASSWORD_HASH_DURATION.observe((view_name(_request.get()),), seconds)
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        if settings.METRICS_DIR:
+            registry.flush(settings.METRICS_DIR)
+    except (ImproperlyConfigured, OSError):
+        pass
+
+
+@require_GET
+def metrics_view(request):
+    """
+    GET /metrics
+    With METRICS_TOKEN set, scrapers authenticate with
+    `Authorization: Bearer <METRICS_TOKEN>`.
+    """
+    if settings.METRICS_TOKEN:
+        expected = f'Bearer {settings.METRICS_TOKEN}'
+        if not constant_time_compare(request.headers.get('Authorization', ''), expected):
+            return JsonResponse({'error': 'A valid metrics token is required.'}, status=status.HTTP_401_UNAUTHORIZED)
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,109 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
+
+from . import metrics, timing
+
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    """
+    WhiteNoise's middleware is sync-only. Under ASGI a single sync-only
+    middleware makes Django run the whole chain, async views included, in
+    its one shared sync thread, so an awaiting view blocks every other
+    request. This variant is async-capable; static lookups stay in-memory.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class RequestTimingMiddleware:
+    """
+    Server-Timing header and sampled slow-request log for every request
+    (kunapet_backend/timing.py). Async-capable, like WhiteNoiseMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.SERVER_TIMING:
+            return self.get_response(request)
+        token = timing.begin()
+        try:
+            response = self.get_response(request)
+        finally:
+            timings = timing.end(token)
+        return timing.report(timings, request, response)
+
+    async def __acall__(self, request):
+        if not settings.SERVER_TIMING:
+            return await self.get_response(request)
+        token = timing.begin()
+        try:
+            response = await self.get_response(request)
+        finally:
+            timings = timing.end(token)
+        return timing.report(timings, request, response)
+
+
+class MetricsMiddleware:
+    """
+    Request counts and latencies per view for GET /metrics
+    (kunapet_backend/metrics.py). Async-capable, like WhiteNoiseMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timing.ensure_query_timing()
+        token, start = metrics.begin(request), time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end(token)
+        metrics.observe_request(request, response, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        timing.ensure_query_timing()
+        token, start = metrics.begin(request), time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end(token)
+        metrics.observe_request(request, response, time.perf_counter() - start)
+        return response
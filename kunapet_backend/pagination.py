@@ -0,0 +1,193 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are fetched with `WHERE (ordering columns) > (last row values)
+ORDER BY ... LIMIT n`, so page 1000 costs the same as page 1 and rows
+inserted between requests never shift a page. The ordering must end with
+a unique, non-null column (the primary key) to be a total order.
+"""
+import base64
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _to_json(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    ordering = ('created_at', 'id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        queryset, reverse, position = self.window(queryset, request)
+        rows = list(queryset)
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = rows
+        return rows
+
+    def window(self, queryset, request):
+        """
+        The requested page plus one row (is there a next page?), not yet
+        evaluated. Returns (queryset, reverse, position).
+        """
+        self.page_size = self.get_page_size(request)
+        fields = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+        reverse, position = self.decode_cursor(request, queryset.model, fields)
+        if reverse:
+            # Walking backwards: flip every direction, then restore the order
+            fields = [(name, not desc) for name, desc in fields]
+        queryset = queryset.order_by(*[f'-{name}' if desc else name for name, desc in fields])
+        if position is not None:
+            queryset = queryset.filter(self.keyset_filter(fields, position))
+        return queryset[:self.page_size + 1], reverse, position
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    @staticmethod
+    def keyset_filter(fields, position):
+        """
+        (a, b, c) "after" (x, y, z) ==
+            a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        with > replaced by < for descending columns.
+        """
+        condition = Q()
+        for index, (name, desc) in enumerate(fields):
+            clause = Q(**{f'{name}__lt' if desc else f'{name}__gt': position[index]})
+            for prev_index in range(index):
+                clause &= Q(**{fields[prev_index][0]: position[prev_index]})
+            condition |= clause
+        return condition
+
+    @staticmethod
+    def row_value(row, name):
+        # values() rows from the list fast path are dicts
+        return row[name] if isinstance(row, dict) else getattr(row, name)
+
+    def position_of(self, row):
+        return [_to_json(self.row_value(row, name.lstrip('-'))) for name in self.ordering]
+
+    def encode_cursor(self, reverse, position):
+        payload = json.dumps({'r': int(reverse), 'p': position}, separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model, fields):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return False, None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+            values = payload['p']
+            if len(values) != len(fields):
+                raise ValueError
+            position = [self.cursor_value(model, name, value) for (name, _), value in zip(fields, values)]
+            return bool(payload['r']), position
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def cursor_value(self, model, name, value):
+        """Parse one cursor value back into its column's Python type."""
+        return model._meta.get_field(name).to_python(value)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.position_of(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(True, self.position_of(self.page[0]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class CreatedAtPagination(KeysetPagination):
+    """Oldest first: (created_at, id). Used by pets and services."""
+    ordering = ('created_at', 'id')
+
+
+class NewestFirstPagination(KeysetPagination):
+    """Newest first: (-created_at, -id). Used by provider reviews."""
+    ordering = ('-created_at', '-id')
+
+
+class RatingPagination(KeysetPagination):
+    """Best rated providers first: (-rating, -review_count, id)."""
+    ordering = ('-rating', '-review_count', 'id')
+
+
+class ProviderRatingPagination(KeysetPagination):
+    """
+    Services of the best rated providers first. `provider_rating` is an
+    annotation of provider__rating (see ServiceListCreateView).
+    """
+    ordering = ('-provider_rating', 'id')
+
+    def cursor_value(self, model, name, value):
+        if name == 'provider_rating':
+            return model._meta.get_field('provider').related_model._meta.get_field('rating').to_python(value)
+        return super().cursor_value(model, name, value)
+
+
+class SearchRankPagination(KeysetPagination):
+    """Best match first: (-search_rank, id). See services/search.py."""
+    ordering = ('-search_rank', 'id')
+
+    def cursor_value(self, model, name, value):
+        if name == 'search_rank':
+            return float(value)
+        return super().cursor_value(model, name, value)
+
+
+class AppointmentPagination(KeysetPagination):
+    """Most recent appointment first: (-date, -time, id)."""
+    ordering = ('-date', '-time', 'id')
@@ -46,8 +46,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'kunapet_backend.middleware.MetricsMiddleware',  # First: times everything below
+    'kunapet_backend.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Whitenoise
+    'kunapet_backend.middleware.WhiteNoiseMiddleware',  # Whitenoise (async-capable)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS Middleware
     'django.middleware.common.CommonMiddleware',
@@ -88,6 +90,37 @@ DATABASES = {
     )
 }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Take the write lock at BEGIN so that booking transactions (check slot,
+    # then insert) cannot interleave. Other backends lock per provider row.
+    DATABASES['default'].setdefault('OPTIONS', {}).update({
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': 20,
+    })
+
+
+# Cache
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (e.g. django.core.cache.backends.redis.RedisCache) in production.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'kunapet'),
+    }
+}
+
+SERVICE_CATALOG_CACHE_ALIAS = 'default'
+SERVICE_CATALOG_CACHE_TIMEOUT = int(os.environ.get('SERVICE_CATALOG_CACHE_TIMEOUT', 300))
+
+
+# Same hashers as Django's default, with PBKDF2 timed for /metrics
+PASSWORD_HASHERS = [
+    'users.hashers.TimedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -107,6 +140,18 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Async login/registration hash passwords in a bounded thread pool
+# (users/hashing.py). Jobs beyond workers + queue are rejected with 503.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+PASSWORD_HASH_QUEUE_SIZE = int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE', 64))
+
+# Bulk account imports (users/importer.py): POST /api/auth/import/ hashes in
+# a process pool of this size, started once per web worker (unset means one
+# per CPU). Chunks of at most ACCOUNT_IMPORT_INLINE_ROWS rows are hashed by
+# the importing process itself (the command too).
+ACCOUNT_IMPORT_WORKERS = int(os.environ['ACCOUNT_IMPORT_WORKERS']) if os.environ.get('ACCOUNT_IMPORT_WORKERS') else None
+ACCOUNT_IMPORT_INLINE_ROWS = int(os.environ.get('ACCOUNT_IMPORT_INLINE_ROWS', 8))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
@@ -129,6 +174,9 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Threads that build pet photo renditions (pets/images.py); 0 = inline
+PET_PHOTO_WORKERS = int(os.environ.get('PET_PHOTO_WORKERS', 2))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -137,16 +185,37 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Custom User Model
 AUTH_USER_MODEL = 'users.User'
 
+# Login and registration (users/throttling.py): token buckets per client IP
+# and per email, e.g. '30/min' = bursts of 30, refilled at 30 a minute.
+# None disables a bucket. Kept in a cache shared by all workers.
+AUTH_THROTTLE_RATES = {
+    'ip': os.environ.get('AUTH_THROTTLE_IP_RATE', '30/min'),
+    'email': os.environ.get('AUTH_THROTTLE_EMAIL_RATE', '10/min'),
+}
+AUTH_THROTTLE_CACHE_ALIAS = 'default'
+
+# Opt-in: authenticate from the token claims (id, role) without loading the
+# user row on every request. See users/authentication.py for the trade-off.
+JWT_CLAIMS_AUTH = os.environ.get('JWT_CLAIMS_AUTH', 'False') == 'True'
+
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.ClaimsJWTAuthentication' if JWT_CLAIMS_AUTH
+        else 'users.authentication.JWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # Proxies in front of the app. 0 throttles by REMOTE_ADDR and ignores
+    # X-Forwarded-For, which clients can forge; raise it behind a proxy.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', '0')),
 }
 
+# GET lists of pets, services and appointments are built from values() rows
+# (kunapet_backend/fastpath.py); False falls back to the serializers.
+FAST_LIST_PATH = os.environ.get('FAST_LIST_PATH', 'True') == 'True'
+
 # JWT Configuration
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -155,6 +224,46 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Appointment scheduling
+BUSINESS_HOURS = {
+    'start': os.environ.get('BUSINESS_HOURS_START', '09:00'),
+    'end': os.environ.get('BUSINESS_HOURS_END', '18:00'),
+}
+AVAILABILITY_SLOT_MINUTES = 30
+AVAILABILITY_MAX_DAYS = 62
+# Longest range of GET /api/appointments/stats/
+APPOINTMENT_STATS_MAX_DAYS = 731
+# Rows fetched per round trip while streaming an .ics feed
+CALENDAR_FEED_CHUNK_SIZE = 2000
+# Rows fetched per round trip while streaming a CSV/JSONL export
+EXPORT_CHUNK_SIZE = 2000
+
+# Real-time appointment events (GET /api/appointments/events/, ASGI only).
+# appointments.events.PostgresBroker fans events out across processes/nodes.
+APPOINTMENT_EVENTS_BROKER = os.environ.get('APPOINTMENT_EVENTS_BROKER', 'appointments.events.InMemoryBroker')
+APPOINTMENT_EVENTS_QUEUE_SIZE = 100
+APPOINTMENT_EVENTS_HEARTBEAT_SECONDS = 15
+APPOINTMENT_EVENTS_RETRY_MS = 3000
+
+# Provider discovery (GET /api/providers/nearby/)
+NEARBY_MAX_RADIUS_KM = 50
+
+# Per-request timings (kunapet_backend/timing.py): a Server-Timing header on
+# every response, and a log entry with the slowest SQL statements for a
+# sample of the requests that took SLOW_REQUEST_MS or longer.
+SERVER_TIMING = os.environ.get('SERVER_TIMING', 'True') == 'True'
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))
+SLOW_REQUEST_SAMPLE_RATE = float(os.environ.get('SLOW_REQUEST_SAMPLE_RATE', 1.0))
+SLOW_REQUEST_TOP_QUERIES = 5
+
+# Prometheus metrics (GET /metrics, kunapet_backend/metrics.py). With several
+# worker processes, METRICS_DIR must be a directory shared by all of them
+# (emptied on deploy); each process writes its counts there at most every
+# METRICS_FLUSH_SECONDS. With METRICS_TOKEN set, scrapers must send it.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 5))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
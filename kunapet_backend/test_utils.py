@@ -0,0 +1,29 @@
+"""
+Helpers shared by the app test suites. Not named tests*.py, so the test
+runner does not collect it.
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from users.models import ProviderProfile, User
+
+
+def create_provider(email='vet@kunapet.com', ruc='20123456789'):
+    user = User.objects.create_user(email=email, password='TestPassword123!', username=email, role=User.Role.PROVIDER)
+    return ProviderProfile.objects.create(
+        user=user, business_name='KunaPet Vet', ruc=ruc, address='Av. Principal 123', phone='999888777',
+    )
+
+
+def explain_list_query(testcase, url, table, **params):
+    """
+    Fetch `url` and return SQLite's EXPLAIN QUERY PLAN for the SQL that
+    selected rows from `table`.
+    """
+    with CaptureQueriesContext(connection) as queries:
+        testcase.assertEqual(testcase.client.get(url, params).status_code, 200)
+    # Skips the ETag aggregate (kunapet_backend/conditional.py)
+    sql = next(q['sql'] for q in queries.captured_queries if f'FROM "{table}"' in q['sql'] and 'COUNT(' not in q['sql'])
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
@@ -0,0 +1,177 @@
+"""
+Per-request timings: a Server-Timing header and a sampled slow-request log.
+
+RequestTimingMiddleware (kunapet_backend/middleware.py) opens a
+RequestTimings for each request in a context variable, which
+sync_to_async() carries into the threads that run ORM code for async
+views. It collects:
+
+- db: every SQL statement, through an execute wrapper installed on each
+  connection (count, total time, and the slowest SLOW_REQUEST_TOP_QUERIES
+  statements, without their parameters);
+- auth: DRF authentication (TimedAuthenticationMixin);
+- serialize: Serializer.data, and the values() rows of the fast list path;
+- total: the whole view, including the above.
+
+Phases overlap (auth and serialize queries are also in db). Work done
+while a streaming response is being iterated comes after the headers and
+is not counted. Outside a request the hooks only do a ContextVar.get(),
+and the query wrapper feeds the counters of kunapet_backend/metrics.py.
+"""
+import heapq
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.serializers import BaseSerializer
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('request_timings', default=None)
+
+# Statements are logged up to this many characters (bulk INSERTs get long)
+MAX_SQL_LENGTH = 2000
+
+
+class RequestTimings:
+    def __init__(self, top_queries):
+        self.started = time.perf_counter()
+        self.total = None
+        self.phases = {}
+        self.open = set()
+        self.query_count = 0
+        self.query_time = 0.0
+        self.top_queries = top_queries
+        self.slowest = []  # min-heap of (seconds, n, sql)
+
+    def add_query(self, sql, seconds):
+        self.query_count += 1
+        self.query_time += seconds
+        if not self.top_queries:
+            return
+        entry = (seconds, self.query_count, sql)
+        if len(self.slowest) < self.top_queries:
+            heapq.heappush(self.slowest, entry)
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def server_timing(self):
+        entries = [f'db;dur={self.query_time * 1000:.1f};desc="{self.query_count} queries"']
+        entries += [f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.phases.items()]
+        entries.append(f'total;dur={self.total * 1000:.1f}')
+        return ', '.join(entries)
+
+    def as_dict(self, request, response):
+        match = request.resolver_match
+        return {
+            'method': request.method,
+            'path': request.path,
+            'route': match.route if match else None,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(self.total * 1000, 1),
+            'phases_ms': {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+            'db': {
+                'queries': self.query_count,
+                'ms': round(self.query_time * 1000, 1),
+                'slowest': [
+                    {'ms': round(seconds * 1000, 1), 'sql': sql[:MAX_SQL_LENGTH]}
+                    for seconds, _, sql in sorted(self.slowest, reverse=True)
+                ],
+            },
+        }
+
+
+def begin():
+    """Start timing the current request; returns a token for end()."""
+    ensure_query_timing()
+    return _current.set(RequestTimings(settings.SLOW_REQUEST_TOP_QUERIES))
+
+
+def end(token):
+    """Stop timing the current request; returns its RequestTimings."""
+    timings = _current.get()
+    _current.reset(token)
+    timings.total = time.perf_counter() - timings.started
+    return timings
+
+
+def report(timings, request, response):
+    """Add the Server-Timing header and log the request if it was slow."""
+    response['Server-Timing'] = timings.server_timing()
+    if timings.total * 1000 >= settings.SLOW_REQUEST_MS and random.random() < settings.SLOW_REQUEST_SAMPLE_RATE:
+        entry = timings.as_dict(request, response)
+        logger.warning('slow_request %s', json.dumps(entry), extra={'slow_request': entry})
+    return response
+
+
+@contextmanager
+def timed(phase):
+    """Add the block's wall time to `phase` of the current request, if any."""
+    timings = _current.get()
+    if timings is None or phase in timings.open:
+        # No request, or an outer block already times this phase
+        yield
+        return
+    timings.open.add(phase)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.phases[phase] = timings.phases.get(phase, 0.0) + time.perf_counter() - start
+        timings.open.discard(phase)
+
+
+def record_query(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        seconds = time.perf_counter() - start
+        metrics.observe_query(context['connection'].alias, seconds)
+        timings = _current.get()
+        if timings is not None:
+            timings.add_query(sql, seconds)
+
+
+def wrap_connection(connection, **kwargs):
+    # First, so that `with connection.execute_wrapper()` blocks still pop their own
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def ensure_query_timing():
+    """Connections opened from now on get the wrapper on connect; open ones here."""
+    for connection in connections.all(initialized_only=True):
+        wrap_connection(connection)
+
+
+connection_created.connect(wrap_connection, dispatch_uid='kunapet_backend.timing')
+
+
+class TimedAuthenticationMixin:
+    def authenticate(self, request):
+        with timed('auth'):
+            return super().authenticate(request)
+
+
+def _timed_data(fget):
+    def data(self):
+        with timed('serialize'):
+            return fget(self)
+    data.timed = True
+    return data
+
+
+# Serializer.data and ListSerializer.data both go through BaseSerializer.data;
+# timing it there covers every serializer without a base class of our own.
+if not getattr(BaseSerializer.data.fget, 'timed', False):
+    BaseSerializer.data = property(_timed_data(BaseSerializer.data.fget))
@@ -0,0 +1,138 @@
+"""
+Pet photo renditions.
+
+An upload is decoded once with Pillow and resized into the fixed
+RENDITIONS, largest first, each derived from the previous one. Encoding
+runs in a small thread pool scheduled after the request's transaction
+commits (Pillow releases the GIL while decoding, resizing and encoding),
+so the upload request only stores the original.
+
+Renditions are content-addressed:
+
+    pets_photos/renditions/<sha256 of original + spec>/<name>.<ext>
+
+A URL never changes meaning, so the files can be served with
+`Cache-Control: public, max-age=31536000, immutable`. A new photo gets new
+URLs; identical uploads share files.
+
+PET_PHOTO_WORKERS = 0 processes in the calling thread (tests, scripts).
+"""
+import hashlib
+import io
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# name: (max width, max height, format, save options). Largest first.
+RENDITIONS = {
+    'large': (1280, 1280, 'WEBP', {'quality': 82, 'method': 4}),
+    'large_jpeg': (1280, 1280, 'JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'medium': (640, 640, 'WEBP', {'quality': 80, 'method': 4}),
+    'thumb': (200, 200, 'WEBP', {'quality': 75, 'method': 4}),
+}
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+# Bump when RENDITIONS change so new files get new URLs
+SPEC_VERSION = '1'
+RENDITIONS_DIR = 'pets_photos/renditions'
+
+
+def rendition_dir(source_bytes):
+    digest = hashlib.sha256(source_bytes)
+    digest.update(SPEC_VERSION.encode())
+    return posixpath.join(RENDITIONS_DIR, digest.hexdigest()[:32])
+
+
+def render(source_bytes):
+    """Return {name: (extension, bytes)} for every rendition."""
+    image = Image.open(io.BytesIO(source_bytes))
+    largest = max((w, h) for w, h, _, _ in RENDITIONS.values())
+    # JPEGs can be decoded directly at a reduced scale
+    image.draft('RGB', largest)
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    output = {}
+    current = image
+    for name, (width, height, fmt, options) in RENDITIONS.items():
+        if current.width > width or current.height > height:
+            current = current.copy()
+            current.thumbnail((width, height), Image.Resampling.LANCZOS)
+        frame = current
+        if fmt == 'JPEG' and frame.mode != 'RGB':
+            frame = frame.convert('RGB')
+        buffer = io.BytesIO()
+        frame.save(buffer, fmt, **options)
+        output[name] = (EXTENSIONS[fmt], buffer.getvalue())
+    return output
+
+
+def process_pet_photo(pet_id):
+    """
+    Build the renditions of a pet's current photo and store their paths in
+    Pet.photo_renditions. Skipped if the photo changed in the meantime.
+    """
+    from .models import Pet
+
+    pet = Pet.objects.filter(pk=pet_id).only('id', 'photo').first()
+    if pet is None or not pet.photo:
+        return None
+    photo_name = pet.photo.name
+    with pet.photo.open('rb') as source:
+        source_bytes = source.read()
+
+    directory = rendition_dir(source_bytes)
+    paths = {
+        name: posixpath.join(directory, f'{name}.{EXTENSIONS[fmt]}')
+        for name, (_, _, fmt, _) in RENDITIONS.items()
+    }
+    storage = pet.photo.storage
+    if not all(storage.exists(path) for path in paths.values()):
+        for name, (_, data) in render(source_bytes).items():
+            if not storage.exists(paths[name]):
+                storage.save(paths[name], ContentFile(data))
+
+    # Only attach if the pet still has the photo we processed
+    Pet.objects.filter(pk=pet_id, photo=photo_name).update(photo_renditions=paths, updated_at=timezone.now())
+    return paths
+
+
+def _run(pet_id):
+    try:
+        process_pet_photo(pet_id)
+    except Exception:
+        logger.exception('Could not build photo renditions for pet %s', pet_id)
+    finally:
+        connection.close()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.PET_PHOTO_WORKERS, thread_name_prefix='pet-photo')
+    return _executor
+
+
+def schedule_renditions(pet_id):
+    """Process the photo once the current transaction commits."""
+    def submit():
+        if settings.PET_PHOTO_WORKERS == 0:
+            process_pet_photo(pet_id)
+        else:
+            get_executor().submit(_run, pet_id)
+    transaction.on_commit(submit)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from pets.images import process_pet_photo
+from pets.models import Pet
+
+
+class Command(BaseCommand):
+    help = 'Build photo renditions for pets that have a photo but no renditions (or all with --all).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild every pet with a photo')
+
+    def handle(self, *args, **options):
+        queryset = Pet.objects.exclude(photo='').exclude(photo__isnull=True)
+        if not options['all']:
+            queryset = queryset.filter(photo_renditions={})
+        done = failed = 0
+        for pet_id in queryset.values_list('id', flat=True).iterator():
+            try:
+                process_pet_photo(pet_id)
+                done += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'pet {pet_id}: {e}')
+        self.stdout.write(self.style.SUCCESS(f'{done} pets processed, {failed} failed'))
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Create the composite indexes before dropping the FK ones they cover
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(fields=['owner', 'created_at', 'id'], name='pet_owner_created_idx'),
+        ),
+        migrations.AlterField(
+            model_name='pet',
+            name='owner',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='pets', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0002_owner_listing_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pet',
+            name='photo_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0003_photo_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pet',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -14,7 +14,8 @@ class Pet(models.Model):
         ('F', 'Female'),
     ]
 
-    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='pets')
+    # FK index is covered by pet_owner_created_idx
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='pets', db_index=False)
     name = models.CharField(max_length=100)
     species = models.CharField(max_length=20, choices=SPECIES_CHOICES)
     breed = models.CharField(max_length=100, blank=True)
@@ -22,8 +23,18 @@ class Pet(models.Model):
     gender = models.CharField(max_length=1, choices=GENDER_CHOICES)
     weight = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, help_text="Weight in kg")
     photo = models.ImageField(upload_to='pets_photos/', null=True, blank=True)
+    # {rendition name: storage path}, filled in by pets.images off the request path
+    photo_renditions = models.JSONField(default=dict, blank=True, editable=False)
     medical_history = models.TextField(blank=True, help_text="Notes about vaccinations, allergies, etc.")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Validator of conditional GETs; set by bulk/update() writes too
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Owner listing: owner_id = ? ORDER BY created_at, id
+            models.Index(fields=['owner', 'created_at', 'id'], name='pet_owner_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.species})"
@@ -1,13 +1,47 @@
 from rest_framework import serializers
+from kunapet_backend.fields import SparseFieldsMixin
+from users.authentication import user_instance
+from .images import schedule_renditions
 from .models import Pet
 
-class PetSerializer(serializers.ModelSerializer):
+class PetSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # {name: absolute URL}; empty until the renditions are built
+    photo_renditions = serializers.SerializerMethodField()
+
     class Meta:
         model = Pet
-        fields = ['id', 'name', 'species', 'breed', 'birth_date', 'gender', 'weight', 'photo', 'medical_history', 'created_at']
+        fields = ['id', 'name', 'species', 'breed', 'birth_date', 'gender', 'weight', 'photo', 'photo_renditions', 'medical_history', 'created_at']
         read_only_fields = ['id', 'created_at']
+        sparse_sources = {'photo_renditions': ['photo', 'photo_renditions']}
+
+    def get_photo_renditions(self, obj):
+        return self.fast_photo_renditions(obj.photo.name, obj.photo_renditions)
+
+    def fast_photo_renditions(self, photo, renditions):
+        # Also fed values() columns by the list fast path (kunapet_backend/fastpath.py)
+        if not photo:
+            return {}
+        storage = Pet._meta.get_field('photo').storage
+        request = self.context.get('request')
+        urls = {name: storage.url(path) for name, path in renditions.items()}
+        if request is not None:
+            urls = {name: request.build_absolute_uri(url) for name, url in urls.items()}
+        return urls
 
     def create(self, validated_data):
         # Automatically assign the owner from the context (request user)
-        validated_data['owner'] = self.context['request'].user
-        return super().create(validated_data)
+        validated_data['owner'] = user_instance(self.context['request'].user)
+        pet = super().create(validated_data)
+        if pet.photo:
+            schedule_renditions(pet.id)
+        return pet
+
+    def update(self, instance, validated_data):
+        photo_changed = 'photo' in validated_data and validated_data['photo'] != instance.photo
+        if photo_changed:
+            # Old renditions belong to the old photo
+            validated_data['photo_renditions'] = {}
+        pet = super().update(instance, validated_data)
+        if photo_changed and pet.photo:
+            schedule_renditions(pet.id)
+        return pet
@@ -1,3 +1,401 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from kunapet_backend.test_utils import explain_list_query
+from users.models import User
+from .images import RENDITIONS
+from .models import Pet
+from .serializers import PetSerializer
+
+
+def create_owner(email='owner@kunapet.com'):
+    return User.objects.create_user(email=email, password='TestPassword123!', username=email, role=User.Role.CLIENT)
+
+
+def create_pets(owner, count):
+    Pet.objects.bulk_create(
+        Pet(owner=owner, name=f'Firulais {i}', species='dog', gender='M', weight='12.50') for i in range(count)
+    )
+
+
+class PetQueryCountTests(APITestCase):
+    """
+    Pins the number of SQL queries per endpoint. One query is the JWT user
+    lookup; the rest must not depend on the number of rows.
+    """
+    def setUp(self):
+        self.owner = create_owner()
+        token = RefreshToken.for_user(self.owner).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_list(self):
+        # user lookup, ETag aggregate, page
+        create_pets(self.owner, 3)
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get('/api/pets/').status_code, 200)
+        create_pets(self.owner, 20)
+        with self.assertNumQueries(3):
+            self.client.get('/api/pets/')
+
+    def test_detail(self):
+        create_pets(self.owner, 1)
+        pet = Pet.objects.get()
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(f'/api/pets/{pet.id}/').status_code, 200)
+
+    def test_detail_of_other_owner_is_forbidden(self):
+        create_pets(create_owner('other@kunapet.com'), 1)
+        pet = Pet.objects.get()
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(f'/api/pets/{pet.id}/').status_code, 403)
+
+    def test_sparse_fields(self):
+        create_pets(self.owner, 3)
+        other = create_owner('other@kunapet.com')
+        create_pets(other, 1)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/pets/', {'fields': 'id,name'})
+        self.assertEqual([list(row) for row in response.data['results']], [['id', 'name']] * 3)
+        # IsOwner still sees the owner column
+        pet = Pet.objects.get(owner=other)
+        self.assertEqual(self.client.get(f'/api/pets/{pet.id}/', {'fields': 'name'}).status_code, 403)
+
+
+class PetPaginationTests(APITestCase):
+    def setUp(self):
+        self.owner = create_owner()
+        self.client.force_authenticate(self.owner)
+        create_pets(self.owner, 7)
+
+    def test_pages_are_ordered_by_creation(self):
+        ids, url = [], '/api/pets/?page_size=3'
+        while url:
+            data = self.client.get(url).data
+            ids += [row['id'] for row in data['results']]
+            url = data['next']
+        self.assertEqual(ids, list(Pet.objects.order_by('created_at', 'id').values_list('id', flat=True)))
+
+    def test_page_size_is_capped(self):
+        data = self.client.get('/api/pets/?page_size=100000').data
+        self.assertEqual(len(data['results']), 7)
+        self.assertIsNone(data['next'])
+
+
+class PetListParityTests(APITestCase):
+    """The values() fast path answers byte for byte like PetSerializer."""
+    def test_pages(self):
+        owner = create_owner()
+        create_pets(owner, 5)
+        Pet.objects.create(
+            owner=owner, name='Michi \u2028', species='cat', breed='Siamés', gender='F', weight='4.25',
+            medical_history='Vacunas: "triple felina"',
+        )
+        self.client.force_authenticate(owner)
+        for params in ({'page_size': 4}, {'fields': 'id,name,photo,photo_renditions', 'page_size': 4}):
+            self.assert_parity(params)
+        # created_at is rendered in the active timezone
+        with timezone.override('America/Lima'):
+            self.assert_parity({'fields': 'created_at'})
+
+    def assert_parity(self, params):
+        url = '/api/pets/'
+        while url:
+            with override_settings(FAST_LIST_PATH=False):
+                expected = self.client.get(url, params)
+            response = self.client.get(url, params)
+            self.assertEqual(response.content, expected.content)
+            url, params = response.data['next'], None
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class PetQueryPlanTests(APITestCase):
+    """
+    The list query must be served by pet_owner_created_idx, including the
+    ORDER BY, so that a filter change cannot silently become a full scan.
+    """
+    def test_list_uses_owner_index(self):
+        owner = create_owner()
+        self.client.force_authenticate(owner)
+        plan = explain_list_query(self, '/api/pets/', 'pets_pet')
+        self.assertIn('SEARCH pets_pet USING INDEX pet_owner_created_idx (owner_id=?)', plan)
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+
+class PetConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.owner = create_owner()
+        create_pets(self.owner, 3)
+        self.pet = Pet.objects.order_by('id').first()
+        self.client.force_authenticate(self.owner)
+
+    def test_detail_revalidation(self):
+        url = f'/api/pets/{self.pet.id}/'
+        response = self.client.get(url)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        # One query for the object (IsOwner needs it), no serialization
+        with mock.patch.object(PetSerializer, 'to_representation') as serialize, self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.content, response['ETag']), (304, b'', etag))
+        serialize.assert_not_called()
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        self.client.patch(url, {'weight': '13.00'}, format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        # Each fieldset is its own representation
+        self.assertNotEqual(self.client.get(url, {'fields': 'id'})['ETag'], response['ETag'])
+
+    def test_list_revalidation(self):
+        etag = self.client.get('/api/pets/')['ETag']
+        # Only the aggregate
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/pets/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Bulk writes move updated_at too
+        self.client.post('/api/pets/batch/', [{'id': self.pet.id, 'name': 'Rex'}], format='json')
+        response = self.client.get('/api/pets/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        Pet.objects.filter(pk=self.pet.pk).delete()
+        self.assertEqual(self.client.get('/api/pets/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_etag_covers_only_the_page(self):
+        create_pets(self.owner, 3)
+        first, second, third, *_, last = Pet.objects.order_by('created_at', 'id')
+        params = {'page_size': 2}
+        with CaptureQueriesContext(connection) as queries:
+            etag = self.client.get('/api/pets/', params)['ETag']
+        self.assertIn('LIMIT 3', queries.captured_queries[0]['sql'])
+
+        # Past the page and the row after it: same ETag
+        Pet.objects.filter(pk=last.pk).update(name='Otro', updated_at=timezone.now())
+        self.assertEqual(self.client.get('/api/pets/', params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # The row after the page decides the next link
+        Pet.objects.filter(pk=third.pk).delete()
+        response = self.client.get('/api/pets/', params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        # ...and so do the rows of the page
+        etag = response['ETag']
+        Pet.objects.filter(pk=second.pk).delete()
+        self.assertEqual(self.client.get('/api/pets/', params, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class RequestTimingTests(APITestCase):
+    def setUp(self):
+        self.owner = create_owner()
+        create_pets(self.owner, 3)
+        self.token = RefreshToken.for_user(self.owner).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def server_timing(self, response):
+        entries = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            entries[name] = dict(param.split('=', 1) for param in params)
+        return entries
+
+    def test_server_timing(self):
+        pet = Pet.objects.first()
+        for url in ('/api/pets/', f'/api/pets/{pet.id}/'):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            timing = self.server_timing(response)
+            self.assertEqual(list(timing), ['db', 'auth', 'serialize', 'total'])
+            self.assertEqual(timing['db']['desc'], f'"{len(queries)} queries"')
+            self.assertLessEqual(float(timing['serialize']['dur']), float(timing['total']['dur']))
+
+    async def test_async_handler(self):
+        response = await self.async_client.get('/api/pets/', headers={'authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 200)
+        # user lookup, ETag aggregate, page: run in sync_to_async() threads
+        self.assertEqual(self.server_timing(response)['db']['desc'], '"3 queries"')
+
+    @override_settings(SLOW_REQUEST_MS=0, SLOW_REQUEST_TOP_QUERIES=2)
+    def test_slow_request_log(self):
+        with self.assertLogs('kunapet_backend.timing', 'WARNING') as logs:
+            self.client.get('/api/pets/')
+        entry = logs.records[0].slow_request
+        self.assertEqual((entry['route'], entry['status'], entry['db']['queries']), ('api/pets/', 200, 3))
+        self.assertEqual(list(entry['phases_ms']), ['auth', 'serialize'])
+        slowest = entry['db']['slowest']
+        self.assertEqual(len(slowest), 2)
+        self.assertGreaterEqual(slowest[0]['ms'], slowest[1]['ms'])
+        self.assertTrue(all(query['sql'].startswith('SELECT') for query in slowest))
+
+    @override_settings(SLOW_REQUEST_MS=0, SLOW_REQUEST_SAMPLE_RATE=0)
+    def test_slow_request_sampling(self):
+        with self.assertNoLogs('kunapet_backend.timing'):
+            self.assertIn('Server-Timing', self.client.get('/api/pets/'))
+
+    @override_settings(SERVER_TIMING=False, SLOW_REQUEST_MS=0)
+    def test_disabled(self):
+        with self.assertNoLogs('kunapet_backend.timing'):
+            self.assertNotIn('Server-Timing', self.client.get('/api/pets/'))
+
+
+class PetBatchTests(APITestCase):
+    def setUp(self):
+        self.owner = create_owner()
+        token = RefreshToken.for_user(self.owner).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def post(self, items):
+        return self.client.post('/api/pets/batch/', items, format='json')
+
+    def test_creates_and_updates_in_one_go(self):
+        create_pets(self.owner, 2)
+        first, second = Pet.objects.order_by('id')
+        items = [{'name': f'Michi {i}', 'species': 'cat', 'gender': 'F'} for i in range(3)]
+        items += [{'id': first.id, 'weight': '4.20'}, {'id': second.id, 'name': 'Rex', 'breed': 'Mestizo'}]
+
+        response = self.post(items)
+
+        self.assertEqual(response.status_code, 200, response.data)
+        statuses = [(r['index'], r['status']) for r in response.data['results']]
+        self.assertEqual(statuses, [(0, 'created'), (1, 'created'), (2, 'created'), (3, 'updated'), (4, 'updated')])
+        self.assertEqual(response.data['results'][0]['data']['name'], 'Michi 0')
+        self.assertIsNotNone(response.data['results'][0]['data']['id'])
+        self.assertEqual(Pet.objects.filter(owner=self.owner, species='cat').count(), 3)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(str(first.weight), '4.20')
+        self.assertEqual((second.name, second.breed), ('Rex', 'Mestizo'))
+
+    def test_nothing_is_written_if_any_item_is_invalid(self):
+        create_pets(create_owner('other@kunapet.com'), 1)
+        foreign = Pet.objects.get()
+        response = self.post([
+            {'name': 'Ok', 'species': 'dog', 'gender': 'M'},
+            {'name': 'Bad', 'species': 'dragon', 'gender': 'M'},
+            {'id': foreign.id, 'name': 'Mine now'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        results = response.data['results']
+        self.assertEqual([r['index'] for r in results if r['status'] == 'invalid'], [1, 2])
+        self.assertIn('species', results[1]['errors'])
+        self.assertEqual(results[2]['errors'], {'id': ['Not found.']})
+        self.assertEqual(Pet.objects.count(), 1)
+        foreign.refresh_from_db()
+        self.assertNotEqual(foreign.name, 'Mine now')
+
+    def test_rejects_bad_payloads(self):
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.post({'name': 'x'}).status_code, 400)
+        too_many = [{'name': 'x', 'species': 'dog', 'gender': 'M'}] * 501
+        self.assertEqual(self.post(too_many).status_code, 400)
+
+    def test_ids_must_be_integers(self):
+        create_pets(self.owner, 1)
+        pet = Pet.objects.get()
+        response = self.post([{'id': [pet.id], 'name': 'x'}, {'id': {'pk': pet.id}}, {'id': True}, {'id': str(pet.id)}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [r['errors'] for r in response.data['results']],
+            [{'id': ['A valid integer is required.']}] * 4,
+        )
+
+    def test_queries_do_not_scale_with_items(self):
+        create_pets(self.owner, 20)
+        ids = list(Pet.objects.values_list('id', flat=True))
+        items = [{'name': f'New {i}', 'species': 'dog', 'gender': 'M'} for i in range(20)]
+        items += [{'id': pk, 'name': f'Renamed {pk}'} for pk in ids]
+        # auth + load updates + savepoint/insert/update/release
+        with self.assertNumQueries(6):
+            self.assertEqual(self.post(items).status_code, 200)
+        self.assertEqual(Pet.objects.filter(name__startswith='Renamed').count(), 20)
+
+
+def jpeg_upload(size=(3000, 2000), color='orange', name='firulais.jpg'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class PetPhotoRenditionTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        overrides = override_settings(MEDIA_ROOT=self.media_root, PET_PHOTO_WORKERS=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.owner = create_owner()
+        self.client.force_authenticate(self.owner)
+
+    def upload(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/pets/', {
+                'name': 'Firulais', 'species': 'dog', 'gender': 'M', 'photo': jpeg_upload(**kwargs),
+            }, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Pet.objects.get(pk=response.data['id'])
+
+    def test_upload_builds_renditions_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client.post('/api/pets/', {
+                'name': 'Firulais', 'species': 'dog', 'gender': 'M', 'photo': jpeg_upload(),
+            }, format='multipart')
+        # Nothing is processed inside the request
+        self.assertEqual(response.data['photo_renditions'], {})
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+
+        pet = Pet.objects.get()
+        self.assertEqual(set(pet.photo_renditions), set(RENDITIONS))
+        for name, path in pet.photo_renditions.items():
+            width, height, fmt, _ = RENDITIONS[name]
+            with pet.photo.storage.open(path) as f, Image.open(f) as image:
+                self.assertEqual(image.format, fmt)
+                self.assertLessEqual(image.width, width)
+                self.assertLessEqual(image.height, height)
+        self.assertEqual(Image.open(pet.photo.storage.open(pet.photo_renditions['thumb'])).size, (200, 133))
+
+        data = self.client.get(f'/api/pets/{pet.id}/').data
+        self.assertTrue(data['photo_renditions']['thumb'].startswith('http://testserver/media/pets_photos/renditions/'))
+        self.assertTrue(data['photo_renditions']['thumb'].endswith('/thumb.webp'))
+
+        # The list fast path builds the same URLs from values() rows
+        with override_settings(FAST_LIST_PATH=False):
+            expected = self.client.get('/api/pets/').content
+        self.assertEqual(self.client.get('/api/pets/').content, expected)
+
+        with self.assertNumQueries(1):
+            data = self.client.get(f'/api/pets/{pet.id}/', {'fields': 'id,photo_renditions'}).data
+        self.assertEqual(list(data), ['id', 'photo_renditions'])
+        self.assertTrue(data['photo_renditions']['thumb'].endswith('/thumb.webp'))
+
+    def test_paths_are_content_addressed(self):
+        first, same = self.upload(), self.upload()
+        other = self.upload(color='blue')
+        self.assertEqual(first.photo_renditions, same.photo_renditions)
+        self.assertNotEqual(first.photo_renditions['thumb'], other.photo_renditions['thumb'])
+
+    def test_replacing_the_photo_clears_and_rebuilds(self):
+        pet = self.upload()
+        old = pet.photo_renditions
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client.patch(f'/api/pets/{pet.id}/', {'photo': jpeg_upload(color='green')}, format='multipart')
+        self.assertEqual(response.data['photo_renditions'], {})
+        callbacks[0]()
+        pet.refresh_from_db()
+        self.assertNotEqual(pet.photo_renditions, old)
+
+        # Other edits keep them
+        self.client.patch(f'/api/pets/{pet.id}/', {'name': 'Rex'}, format='json')
+        pet.refresh_from_db()
+        self.assertEqual(set(pet.photo_renditions), set(RENDITIONS))
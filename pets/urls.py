@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import PetListCreateView, PetDetailView
+from .views import PetListCreateView, PetDetailView, PetBatchView
 
 urlpatterns = [
     path('', PetListCreateView.as_view(), name='pet-list-create'), # /api/pets/
+    path('batch/', PetBatchView.as_view(), name='pet-batch'), # /api/pets/batch/
     path('<int:pk>/', PetDetailView.as_view(), name='pet-detail'), # /api/pets/1/
 ]
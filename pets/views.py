@@ -1,4 +1,11 @@
-from rest_framework import generics, permissions
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import generics, permissions, status, views
+from rest_framework.response import Response
+from kunapet_backend.conditional import ConditionalGetMixin
+from kunapet_backend.fastpath import FastListMixin
+from kunapet_backend.fields import SparseQuerysetMixin
+from kunapet_backend.pagination import CreatedAtPagination
 from .models import Pet
 from .serializers import PetSerializer
 
@@ -7,25 +14,114 @@ class IsOwner(permissions.BasePermission):
     Custom permission to only allow owners of an object to access/edit it.
     """
     def has_object_permission(self, request, view, obj):
-        return obj.owner == request.user
+        return obj.owner_id == request.user.id
 
-class PetListCreateView(generics.ListCreateAPIView):
+class PetListCreateView(ConditionalGetMixin, FastListMixin, SparseQuerysetMixin, generics.ListCreateAPIView):
     """
     GET: List all pets belonging to the authenticated user.
     POST: Create a new pet for the authenticated user.
     """
     serializer_class = PetSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtPagination
 
     def get_queryset(self):
         # Return only the pets owned by the current user
-        return Pet.objects.filter(owner=self.request.user)
+        return Pet.objects.filter(owner_id=self.request.user.id)
 
-class PetDetailView(generics.RetrieveUpdateDestroyAPIView):
+class PetDetailView(ConditionalGetMixin, SparseQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     GET, PUT, PATCH, DELETE a specific pet.
     Only the owner can perform these actions.
     """
     serializer_class = PetSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    sparse_keep = ('owner',)
     queryset = Pet.objects.all()
+
+
+def is_pet_id(value):
+    # bool is an int subclass, but True is not pet 1
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class PetBatchView(views.APIView):
+    """
+    POST /api/pets/batch/  [{...}, {"id": 3, ...}, ...]
+    Creates items without an id and partially updates the caller's pets
+    that have one. Every item is validated with PetSerializer first; the
+    batch is written with bulk_create/bulk_update in ONE transaction, or
+    not at all if any item is invalid. Photos are uploaded per pet.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    max_items = 500
+
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'Expected a non-empty list of pets.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.max_items:
+            return Response({'error': f'At most {self.max_items} pets per batch.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not all(isinstance(item, dict) for item in items):
+            return Response({'error': 'Every item must be an object.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # 1. Load every pet to update in one query (only the caller's own)
+        ids = {item['id'] for item in items if is_pet_id(item.get('id'))}
+        existing = {pet.id: pet for pet in Pet.objects.filter(owner_id=request.user.id, id__in=ids)} if ids else {}
+
+        # 2. Validate every item
+        results, creates, updates, update_fields, seen = [], [], [], set(), set()
+        for index, item in enumerate(items):
+            data = {key: value for key, value in item.items() if key not in ('id', 'photo')}
+            if 'id' in item:
+                # Checked first: a list or dict id cannot even be looked up
+                if not is_pet_id(item['id']):
+                    error = 'A valid integer is required.'
+                elif item['id'] not in existing:
+                    error = 'Not found.'
+                elif item['id'] in seen:
+                    error = 'Duplicate id in batch.'
+                else:
+                    error = None
+                if error:
+                    results.append({'index': index, 'status': 'invalid', 'errors': {'id': [error]}})
+                    continue
+                instance = existing[item['id']]
+                seen.add(item['id'])
+                serializer = PetSerializer(instance, data=data, partial=True, context={'request': request})
+            else:
+                serializer = PetSerializer(data=data, context={'request': request})
+            if not serializer.is_valid():
+                results.append({'index': index, 'status': 'invalid', 'errors': serializer.errors})
+                continue
+            if 'id' in item:
+                for field, value in serializer.validated_data.items():
+                    setattr(instance, field, value)
+                update_fields.update(serializer.validated_data)
+                updates.append(instance)
+                results.append({'index': index, 'status': 'updated', 'pet': instance})
+            else:
+                pet = Pet(owner_id=request.user.id, **serializer.validated_data)
+                creates.append(pet)
+                results.append({'index': index, 'status': 'created', 'pet': pet})
+
+        if any(result['status'] == 'invalid' for result in results):
+            for result in results:
+                result.pop('pet', None)
+            return Response({'results': results}, status=status.HTTP_400_BAD_REQUEST)
+
+        # 3. Write everything at once
+        with transaction.atomic():
+            if creates:
+                Pet.objects.bulk_create(creates)
+            if updates and update_fields:
+                # bulk_update() skips auto_now
+                now = timezone.now()
+                for pet in updates:
+                    pet.updated_at = now
+                Pet.objects.bulk_update(updates, sorted(update_fields | {'updated_at'}))
+
+        for result in results:
+            result['data'] = PetSerializer(result.pop('pet'), context={'request': request}).data
+        code = status.HTTP_201_CREATED if creates and not updates else status.HTTP_200_OK
+        return Response({'results': results}, status=code)
@@ -0,0 +1,108 @@
+"""
+Versioned read-through cache for the public service catalog.
+
+Cached pages are keyed by a version token: one for the whole catalog and
+one per provider (for ?provider_id= slices). Writes never delete entries;
+they replace the version token, so every key built afterwards is new and
+stale pages simply expire. This works on any Django cache backend.
+
+Signal handlers in services.signals bump the versions on Service
+save/delete. QuerySet.update()/bulk_create() do not send signals; call
+invalidate_catalog() after using them.
+"""
+import hashlib
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+CATALOG_VERSION_KEY = 'services:catalog:version'
+PROVIDER_VERSION_KEY = 'services:catalog:provider:{}:version'
+
+
+class CacheStats:
+    """Thread-safe, per-process hit/miss counters."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+            }
+
+    def reset(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    return caches[settings.SERVICE_CATALOG_CACHE_ALIAS]
+
+
+def _new_version():
+    # Random rather than a counter: if the version key is evicted, a
+    # restarted counter could resurrect entries written under an old version
+    return uuid.uuid4().hex[:12]
+
+
+def get_version(key):
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def version_key_for(provider_id):
+    return PROVIDER_VERSION_KEY.format(provider_id) if provider_id is not None else CATALOG_VERSION_KEY
+
+
+def invalidate_catalog(provider_id=None):
+    """Invalidate the whole catalog and, if given, one provider's slice."""
+    cache = get_cache()
+    cache.set(CATALOG_VERSION_KEY, _new_version(), None)
+    if provider_id is not None:
+        cache.set(PROVIDER_VERSION_KEY.format(provider_id), _new_version(), None)
+
+
+def key_for_request(request):
+    """
+    Cache key of a catalog page. The full URL is part of it because the
+    response embeds absolute pagination links.
+    """
+    provider_id = request.query_params.get('provider_id')
+    try:
+        provider_id = int(provider_id) if provider_id else None
+    except ValueError:
+        provider_id = None
+    version = get_version(version_key_for(provider_id))
+    digest = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f'services:catalog:{provider_id or "all"}:{version}:{digest}'
+
+
+def get_page(key):
+    data = get_cache().get(key)
+    stats.record(data is not None)
+    return data
+
+
+def set_page(key, data):
+    get_cache().set(key, data, settings.SERVICE_CATALOG_CACHE_TIMEOUT)
@@ -0,0 +1,29 @@
+"""
+What the service export contains (streamed by kunapet_backend/exports.py).
+"""
+from .models import Service
+
+COLUMNS = [
+    ('id', 'id'),
+    ('name', 'name'),
+    ('description', 'description'),
+    ('price', 'price'),
+    ('duration', 'duration'),
+    ('is_active', 'is_active'),
+    ('created_at', 'created_at'),
+]
+STATUSES = ['active', 'inactive']
+
+
+def export_queryset(provider_id=None, start=None, end=None, statuses=None):
+    """A provider's services (every one if None), active and inactive, oldest first."""
+    queryset = Service.objects.all()
+    if provider_id is not None:
+        queryset = queryset.filter(provider_id=provider_id)
+    if start:
+        queryset = queryset.filter(created_at__date__gte=start)
+    if end:
+        queryset = queryset.filter(created_at__date__lte=end)
+    if statuses and len(set(statuses)) == 1:
+        queryset = queryset.filter(is_active=statuses[0] == 'active')
+    return queryset.order_by('created_at', 'id')
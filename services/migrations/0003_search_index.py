@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from services.search import install_search_index, uninstall_search_index
+
+
+def forwards(apps, schema_editor):
+    install_search_index(schema_editor.connection)
+
+
+def backwards(apps, schema_editor):
+    uninstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0002_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceSearchDocument',
+            fields=[
+                ('service', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_document', serialize=False, to='services.service')),
+                ('name', models.TextField()),
+                ('description', models.TextField()),
+                ('document', models.TextField(db_column='services_service_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'services_service_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -10,6 +10,61 @@ class Service(models.Model):
     duration = models.PositiveIntegerField(help_text="Duration in minutes")
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Validator of conditional GETs; set by bulk/update() writes too
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Partial indexes over the active catalog only. The condition must
+            # match the queryset filter for the planner to pick them up.
+            # Public catalog: WHERE is_active ORDER BY created_at, id
+            models.Index(fields=['created_at', 'id'], condition=models.Q(is_active=True), name='service_active_created_idx'),
+            # Catalog filtered by ?provider_id=
+            models.Index(fields=['provider', 'created_at', 'id'], condition=models.Q(is_active=True), name='service_provider_active_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Price the appointment revenue rollups were computed with
+        if 'price' in field_names:
+            instance._loaded_price = instance.price
+        return instance
 
     def __str__(self):
         return f"{self.name} - {self.provider.business_name}"
+
+
+class Match(models.Lookup):
+    """SQLite FTS5 `<table> MATCH <query>`."""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class ServiceSearchDocument(models.Model):
+    """
+    A row of the SQLite FTS5 index over Service name/description, joined
+    on rowid. Maintained by triggers (see services/search.py); never
+    written through the ORM and absent on other databases.
+    """
+    service = models.OneToOneField(
+        Service, primary_key=True, db_column='rowid', db_constraint=False,
+        on_delete=models.DO_NOTHING, related_name='search_document',
+    )
+    name = models.TextField()
+    description = models.TextField()
+    # FTS5 hidden columns: the one named after the table takes MATCH
+    # queries, `rank` is bm25() with the weights set on install
+    document = models.TextField(db_column='services_service_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'services_service_fts'
+
+
+ServiceSearchDocument._meta.get_field('document').register_lookup(Match)
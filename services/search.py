@@ -0,0 +1,145 @@
+"""
+Ranked full-text search over the service catalog (?q=).
+
+The text index lives in the database and is maintained there, so every
+write path (save(), update(), bulk_create(), raw SQL) keeps it in sync:
+
+  * SQLite: an external-content FTS5 table, SEARCH_TABLE, filled by
+    triggers on services_service and joined through the unmanaged
+    ServiceSearchDocument model. Ranked with bm25(), name weighted above
+    description, in the same index scan that finds the matches.
+  * PostgreSQL: a generated tsvector column, search_vector, with a GIN
+    index. Ranked with ts_rank(), name weighted 'A', description 'B'.
+  * Anything else: icontains over name/description, name matches first.
+
+Both are created by migration 0003_search_index. SQLite drops triggers
+when Django rebuilds a table during a later migration, so they are also
+re-created (and the index rebuilt) on post_migrate. Every query word
+matches as a prefix and all words must match. Results are annotated with
+`search_rank` (higher is better).
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, Case, F, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+SERVICE_TABLE = 'services_service'
+SEARCH_TABLE = 'services_service_fts'
+# 'simple': no stemming, so both backends match the same way (by prefix)
+SEARCH_CONFIG = 'simple'
+NAME_WEIGHT, DESCRIPTION_WEIGHT = 10.0, 1.0
+MAX_TERMS = 8
+MAX_TERM_LENGTH = 64
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+SQLITE_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    f"name, description, content='{SERVICE_TABLE}', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2')"
+)
+SQLITE_TRIGGERS = {
+    f'{SEARCH_TABLE}_ai': (
+        f'AFTER INSERT ON {SERVICE_TABLE} BEGIN '
+        f'INSERT INTO {SEARCH_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description); END'
+    ),
+    f'{SEARCH_TABLE}_ad': (
+        f'AFTER DELETE ON {SERVICE_TABLE} BEGIN '
+        f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, name, description) "
+        f"VALUES ('delete', old.id, old.name, old.description); END"
+    ),
+    f'{SEARCH_TABLE}_au': (
+        f'AFTER UPDATE OF name, description ON {SERVICE_TABLE} BEGIN '
+        f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, name, description) "
+        f"VALUES ('delete', old.id, old.name, old.description); "
+        f'INSERT INTO {SEARCH_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description); END'
+    ),
+}
+POSTGRES_INSTALL = [
+    f"ALTER TABLE {SERVICE_TABLE} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')) STORED",
+    f'CREATE INDEX service_search_idx ON {SERVICE_TABLE} USING GIN (search_vector)',
+]
+POSTGRES_UNINSTALL = [
+    'DROP INDEX IF EXISTS service_search_idx',
+    f'ALTER TABLE {SERVICE_TABLE} DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def install_search_index(conn):
+    """Create the text index for `conn`'s backend (idempotent on SQLite)."""
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN (%s)"
+                % ', '.join('%s' for _ in SQLITE_TRIGGERS), list(SQLITE_TRIGGERS),
+            )
+            if len(cursor.fetchall()) == len(SQLITE_TRIGGERS):
+                return
+            cursor.execute(SQLITE_TABLE)
+            for name, body in SQLITE_TRIGGERS.items():
+                cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rank) "
+                f"VALUES ('rank', 'bm25({NAME_WEIGHT}, {DESCRIPTION_WEIGHT})')"
+            )
+            # Rows written while triggers were missing
+            cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+        elif conn.vendor == 'postgresql':
+            for sql in POSTGRES_INSTALL:
+                cursor.execute(sql)
+
+
+def uninstall_search_index(conn):
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+        elif conn.vendor == 'postgresql':
+            for sql in POSTGRES_UNINSTALL:
+                cursor.execute(sql)
+
+
+def parse_terms(query):
+    """Split user input into at most MAX_TERMS lowercase words."""
+    return [term[:MAX_TERM_LENGTH] for term in WORD_RE.findall(query.lower())][:MAX_TERMS]
+
+
+def fts5_query(terms):
+    # Quoted so FTS5 operators (AND, NEAR, column:) in user input are plain words
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def tsquery(terms):
+    return ' & '.join(f"'{term}':*" for term in terms)
+
+
+def search(queryset, query):
+    """
+    Filter `queryset` (of Service) to rows matching `query` and annotate
+    `search_rank`. Returns queryset.none() for input without words.
+    """
+    terms = parse_terms(query)
+    if not terms:
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField())).none()
+
+    if connection.vendor == 'sqlite':
+        queryset = queryset.filter(search_document__document__match=fts5_query(terms))
+        # bm25() is lower-is-better; negate it so every backend sorts DESC
+        rank = F('search_document__rank') * -1
+    elif connection.vendor == 'postgresql':
+        table = connection.ops.quote_name(queryset.model._meta.db_table)
+        query_sql = f"to_tsquery('{SEARCH_CONFIG}', %s)"
+        queryset = queryset.filter(RawSQL(
+            f'{table}."search_vector" @@ {query_sql}', [tsquery(terms)], output_field=BooleanField(),
+        ))
+        rank = RawSQL(f'ts_rank({table}."search_vector", {query_sql})', [tsquery(terms)], output_field=FloatField())
+    else:
+        for term in terms:
+            queryset = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+        rank = Case(When(name__icontains=terms[0], then=Value(1.0)), default=Value(0.0), output_field=FloatField())
+
+    return queryset.annotate(search_rank=rank)
@@ -1,12 +1,21 @@
 from rest_framework import serializers
+from kunapet_backend.fields import SparseFieldsMixin
 from .models import Service
 from users.models import ProviderProfile
+from users.serializers import PublicProviderSerializer
+
+class ServiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # Stored running average, no aggregation (see appointments/reviews.py)
+    provider_rating = serializers.DecimalField(source='provider.rating', max_digits=3, decimal_places=2, read_only=True)
 
-class ServiceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Service
-        fields = ['id', 'name', 'description', 'price', 'duration', 'is_active', 'created_at']
+        fields = ['id', 'name', 'description', 'price', 'duration', 'is_active', 'created_at', 'provider_rating']
         read_only_fields = ['id', 'created_at']
+        # Only with ?expand=provider
+        expandable_fields = {
+            'provider': lambda: PublicProviderSerializer(read_only=True),
+        }
 
     def create(self, validated_data):
         # Get the provider profile associated with the current user
@@ -0,0 +1,34 @@
+from django.db import connections
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from . import cache as catalog_cache
+from .models import Service
+from .search import SEARCH_TABLE, install_search_index
+from users.models import ProviderProfile
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_service_catalog(sender, instance, **kwargs):
+    """Any Service write changes the public catalog and its provider slice."""
+    catalog_cache.invalidate_catalog(instance.provider_id)
+
+
+@receiver(post_save, sender=ProviderProfile)
+def invalidate_provider_catalog(sender, instance, **kwargs):
+    """Pages embed the provider (rating, ?expand=provider)."""
+    catalog_cache.invalidate_catalog(instance.pk)
+
+
+@receiver(post_migrate)
+def ensure_search_index(sender, app_config, using, **kwargs):
+    """
+    SQLite rebuilds a table (dropping its triggers) on many schema changes;
+    put the search triggers back after every migrate.
+    """
+    connection = connections[using]
+    if app_config.label != 'services' or connection.vendor != 'sqlite':
+        return
+    if SEARCH_TABLE in connection.introspection.table_names():
+        install_search_index(connection)
@@ -1,3 +1,361 @@
-from django.test import TestCase
+import json
+from unittest import skipUnless
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from kunapet_backend.test_utils import create_provider, explain_list_query
+from users.models import ProviderProfile, User
+from . import cache as catalog_cache
+from .models import Service
+from .search import SQLITE_TRIGGERS
+from .signals import ensure_search_index
+
+
+def create_services(provider, count, **fields):
+    Service.objects.bulk_create(
+        Service(provider=provider, name=f'Consulta {i}', description='Consulta general', price='50.00', duration=30, **fields)
+        for i in range(count)
+    )
+
+
+class ServiceQueryCountTests(APITestCase):
+    """
+    Pins the number of SQL queries per endpoint so that N+1 regressions
+    fail the suite.
+    """
+    def setUp(self):
+        cache.clear()
+        self.provider = create_provider()
+
+    def authenticate(self, user):
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_list_anonymous(self):
+        create_services(self.provider, 3)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/services/').status_code, 200)
+        create_services(self.provider, 20)
+        with self.assertNumQueries(1):
+            self.client.get('/api/services/', {'provider_id': self.provider.id})
+
+    def test_list_authenticated(self):
+        create_services(self.provider, 5)
+        self.authenticate(self.provider.user)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/api/services/').status_code, 200)
+
+    def test_detail(self):
+        create_services(self.provider, 1)
+        service = Service.objects.get()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(f'/api/services/{service.id}/').status_code, 200)
+
+    def test_owner_update(self):
+        create_services(self.provider, 1)
+        service = Service.objects.get()
+        self.authenticate(self.provider.user)
+        # user lookup, service + provider, update, appointment revenue rollups
+        with self.assertNumQueries(4):
+            response = self.client.patch(f'/api/services/{service.id}/', {'price': '60.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class ServiceQueryPlanTests(APITestCase):
+    """
+    The catalog queries must be served by the partial active-catalog
+    indexes, including the ORDER BY.
+    """
+    def setUp(self):
+        cache.clear()
+        self.provider = create_provider()
+
+    def test_catalog_uses_active_index(self):
+        plan = explain_list_query(self, '/api/services/', 'services_service')
+        self.assertIn('SCAN services_service USING INDEX service_active_created_idx', plan)
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_provider_catalog_uses_provider_index(self):
+        plan = explain_list_query(self, '/api/services/', 'services_service', provider_id=self.provider.id)
+        self.assertIn('SEARCH services_service USING INDEX service_provider_active_idx (provider_id=?)', plan)
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+
+class ServiceCatalogCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        catalog_cache.stats.reset()
+        self.provider = create_provider()
+        self.other = create_provider('other@kunapet.com', '20999999999')
+        self.service = Service.objects.create(
+            provider=self.provider, name='Consulta', description='General', price='50.00', duration=30,
+        )
+        Service.objects.create(provider=self.other, name='Baño', description='Grooming', price='30.00', duration=30)
+
+    def names(self, **params):
+        response = self.client.get('/api/services/', params)
+        return response['X-Cache'], [row['name'] for row in response.data['results']]
+
+    def test_second_read_is_served_from_cache_without_queries(self):
+        self.assertEqual(self.names(), ('MISS', ['Consulta', 'Baño']))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names(), ('HIT', ['Consulta', 'Baño']))
+        self.assertEqual(catalog_cache.stats.snapshot(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_save_invalidates_catalog_and_provider_slice(self):
+        self.names()
+        self.names(provider_id=self.provider.id)
+        self.names(provider_id=self.other.id)
+
+        self.service.name = 'Consulta general'
+        self.service.save()
+
+        self.assertEqual(self.names(), ('MISS', ['Consulta general', 'Baño']))
+        self.assertEqual(self.names(provider_id=self.provider.id), ('MISS', ['Consulta general']))
+        # Other providers' slices stay warm
+        self.assertEqual(self.names(provider_id=self.other.id), ('HIT', ['Baño']))
+
+    def test_delete_invalidates(self):
+        self.names()
+        self.service.delete()
+        self.assertEqual(self.names(), ('MISS', ['Baño']))
+
+    def test_pages_are_cached_separately(self):
+        first = self.client.get('/api/services/', {'page_size': 1}).data
+        second = self.client.get(first['next'])
+        self.assertEqual(second['X-Cache'], 'MISS')
+        self.assertEqual([row['name'] for row in second.data['results']], ['Baño'])
+
+
+class ServiceSparseFieldsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.provider = create_provider()
+        create_services(self.provider, 3)
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, [q['sql'] for q in queries.captured_queries]
+
+    def test_fields_trim_the_catalog_query(self):
+        response, queries = self.get('/api/services/', fields='id,name')
+        self.assertEqual(list(response.data['results'][0]), ['id', 'name'])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('description', queries[0])
+        self.assertNotIn('users_providerprofile', queries[0])
+
+    def test_fieldsets_are_cached_separately(self):
+        self.get('/api/services/', fields='name')
+        response, _ = self.get('/api/services/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn('description', response.data['results'][0])
+
+    def test_expand_provider(self):
+        response, queries = self.get('/api/services/', fields='name', expand='provider')
+        self.assertEqual(len(queries), 1)
+        row = response.data['results'][0]
+        self.assertEqual(list(row), ['name', 'provider'])
+        self.assertEqual(row['provider']['business_name'], 'KunaPet Vet')
+        self.assertNotIn('"users_providerprofile"."ruc"', queries[0])
+        self.assertNotIn('provider', self.get('/api/services/')[0].data['results'][0])
+
+    def test_search_and_rating_orderings_keep_working(self):
+        response, _ = self.get('/api/services/', q='consulta', fields='id')
+        self.assertEqual(len(response.data['results']), 3)
+        response, queries = self.get('/api/services/', ordering='rating', fields='id,provider_rating', page_size=2)
+        self.assertEqual(list(response.data['results'][0]), ['id', 'provider_rating'])
+        self.assertEqual(len(self.get(response.data['next'])[0].data['results']), 1)
+
+
+class ServiceListParityTests(APITestCase):
+    """The values() fast path answers byte for byte like ServiceSerializer."""
+    def setUp(self):
+        self.provider = create_provider()
+        self.other = create_provider('other@kunapet.com', '20999999999')
+        ProviderProfile.objects.filter(pk=self.other.pk).update(rating='4.75', review_count=4, latitude=-12.046374, longitude=-77.042793)
+        create_services(self.provider, 4)
+        create_services(self.other, 3, is_active=True)
+        Service.objects.create(provider=self.other, name='Peluquería \u2029 ✂', description='', price='0.10', duration=15)
+
+    def assert_parity(self, **params):
+        url, pages = '/api/services/', 0
+        while url:
+            cache.clear()
+            with override_settings(FAST_LIST_PATH=False):
+                expected = self.client.get(url, params)
+            cache.clear()
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, expected.content)
+            url, params, pages = response.data['next'], None, pages + 1
+        return pages
+
+    def test_orderings(self):
+        self.assertEqual(self.assert_parity(page_size=3), 3)
+        self.assertEqual(self.assert_parity(ordering='rating', page_size=3), 3)
+        self.assert_parity(q='consulta', page_size=2)
+        self.assert_parity(provider_id=self.other.id)
+
+    def test_sparse_and_expanded(self):
+        self.assert_parity(fields='id,provider_rating')
+        self.assert_parity(fields='name', expand='provider', page_size=5)
+
+
+class ServiceConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.provider = create_provider()
+        create_services(self.provider, 2)
+        self.service = Service.objects.order_by('id').first()
+
+    def test_detail_follows_the_provider(self):
+        url = f'/api/services/{self.service.id}/'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # provider_rating is part of the representation
+        self.provider.bio = 'Atención 24 horas'
+        self.provider.save(update_fields=['bio'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_revalidates_without_queries(self):
+        etag = self.client.get('/api/services/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/services/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.service.price = '55.00'
+        self.service.save()
+        self.assertEqual(self.client.get('/api/services/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_provider_edits_invalidate_expanded_pages(self):
+        self.client.get('/api/services/', {'expand': 'provider'})
+        self.provider.business_name = 'KunaPet Vet 24h'
+        self.provider.save()
+        response = self.client.get('/api/services/', {'expand': 'provider'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['provider']['business_name'], 'KunaPet Vet 24h')
+
+
+class ServiceSearchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.provider = create_provider()
+        self.add('Vacunación antirrábica', 'Vacuna anual para perros y gatos')
+        self.add('Consulta general', 'Incluye control de vacunas')
+        self.add('Baño y corte', 'Grooming completo')
+        self.add('Vacuna triple felina', 'Solo gatos', is_active=False)
+
+    def add(self, name, description, **fields):
+        return Service.objects.create(
+            provider=self.provider, name=name, description=description, price='40.00', duration=30, **fields,
+        )
+
+    def search(self, q, **params):
+        response = self.client.get('/api/services/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.data['results']]
+
+    def test_prefix_match_ranked_by_name_first(self):
+        # 'vacun' matches both as a prefix; the name match ranks first
+        self.assertEqual(self.search('vacun'), ['Vacunación antirrábica', 'Consulta general'])
+
+    def test_all_words_must_match_and_accents_are_ignored(self):
+        self.assertEqual(self.search('vacuna perros'), ['Vacunación antirrábica'])
+        self.assertEqual(self.search('BANO'), ['Baño y corte'])
+        self.assertEqual(self.search('vacuna caballos'), [])
+
+    def test_operators_in_input_are_plain_words(self):
+        for q in ['"vacuna', 'vacuna OR baño', 'NEAR(vacuna)', 'name:baño', "baño'; --", '***']:
+            self.search(q)
+        self.assertEqual(self.search('baño AND corte'), [])  # 'and' is a word here
+        self.assertEqual(self.search('---'), [])
+
+    def test_index_follows_writes(self):
+        service = Service.objects.get(name='Baño y corte')
+        service.name = 'Peluquería canina'
+        service.save()
+        self.assertEqual(self.search('bano'), [])
+        self.assertEqual(self.search('peluqueria'), ['Peluquería canina'])
+
+        # Paths that bypass signals are covered by the database triggers
+        Service.objects.filter(pk=service.pk).update(description='Incluye vacunas')
+        create_services(self.provider, 1)
+        catalog_cache.invalidate_catalog()
+        self.assertCountEqual(self.search('vacunas'), ['Consulta general', 'Peluquería canina'])
+        self.assertCountEqual(self.search('consulta'), ['Consulta general', 'Consulta 0'])
+
+        service.delete()
+        catalog_cache.invalidate_catalog()
+        self.assertEqual(self.search('peluqueria'), [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'FTS5 triggers are SQLite specific')
+    def test_triggers_are_restored_after_a_table_rebuild(self):
+        # What a table-rebuilding migration leaves behind
+        with connection.cursor() as cursor:
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER {name}')
+        self.add('Hospedaje felino', 'Por noche')
+        ensure_search_index(sender=None, app_config=apps.get_app_config('services'), using='default')
+        self.assertEqual(self.search('hospedaje'), ['Hospedaje felino'])
+        self.add('Hospedaje canino', 'Por noche')
+        catalog_cache.invalidate_catalog()
+        self.assertEqual(len(self.search('hospedaje')), 2)
+
+    def test_combines_with_provider_filter_and_pages_by_rank(self):
+        other = create_provider('other@kunapet.com', '20999999999')
+        create_services(other, 5)
+        self.assertEqual(self.search('consulta', provider_id=self.provider.id), ['Consulta general'])
+
+        names, url = [], None
+        first = self.client.get('/api/services/', {'q': 'consulta', 'page_size': 2}).data
+        names += [row['name'] for row in first['results']]
+        url = first['next']
+        while url:
+            page = self.client.get(url).data
+            names += [row['name'] for row in page['results']]
+            url = page['next']
+        self.assertEqual(names, self.search('consulta', page_size=50))
+        self.assertEqual(len(names), 6)
+
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            self.search('vacuna')
+
+
+class ServiceExportTests(APITestCase):
+    def setUp(self):
+        self.provider = create_provider()
+        create_services(self.provider, 3)
+        create_services(self.provider, 2, is_active=False)
+        create_services(create_provider('other@kunapet.com', '20999999999'), 4)
+
+    def export(self, fmt, **params):
+        response = self.client.get(f'/api/services/export.{fmt}', params)
+        return response, b''.join(response.streaming_content).decode() if response.streaming else None
+
+    def test_exports_own_services_including_inactive(self):
+        self.client.force_authenticate(self.provider.user)
+        response, body = self.export('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = body.splitlines()
+        self.assertEqual(lines[0], 'id,name,description,price,duration,is_active,created_at')
+        self.assertEqual(len(lines), 6)
+
+        response, body = self.export('jsonl', status='inactive')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['is_active'] for row in rows], [False, False])
+        self.assertEqual(rows[0]['price'], '50.00')
+
+    def test_only_providers(self):
+        client = User.objects.create_user(email='c@kunapet.com', password='x', username='c@kunapet.com', role=User.Role.CLIENT)
+        self.client.force_authenticate(client)
+        self.assertEqual(self.client.get('/api/services/export.csv').status_code, 403)
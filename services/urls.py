@@ -1,7 +1,10 @@
 from django.urls import path
-from .views import ServiceListCreateView, ServiceDetailView
+from .views import ServiceListCreateView, ServiceDetailView, ServiceAvailabilityView, ProviderAvailabilityView, ServiceExportView
 
 urlpatterns = [
     path('', ServiceListCreateView.as_view(), name='service-list-create'), # /api/services/
+    path('export.<str:fmt>', ServiceExportView.as_view(), name='service-export'), # /api/services/export.csv
     path('<int:pk>/', ServiceDetailView.as_view(), name='service-detail'), # /api/services/1/
+    path('<int:pk>/availability/', ServiceAvailabilityView.as_view(), name='service-availability'), # /api/services/1/availability/
+    path('providers/<int:provider_id>/availability/', ProviderAvailabilityView.as_view(), name='provider-availability'), # /api/services/providers/1/availability/
 ]
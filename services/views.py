@@ -1,8 +1,23 @@
-from rest_framework import generics, permissions, status
+from datetime import date
+from django.conf import settings
+from django.db.models import F
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from rest_framework import generics, permissions, status, views
 from rest_framework.response import Response
+from kunapet_backend.conditional import ConditionalGetMixin, make_etag
+from kunapet_backend.exports import FORMATS, IgnoreClientContentNegotiation, export_response, parse_filters
+from kunapet_backend.fastpath import FastListMixin
+from kunapet_backend.fields import SparseQuerysetMixin
+from kunapet_backend.pagination import CreatedAtPagination, ProviderRatingPagination, SearchRankPagination
+from . import cache as catalog_cache
+from . import exports
 from .models import Service
+from .search import search
 from .serializers import ServiceSerializer
 from users.models import ProviderProfile
+from appointments.availability import free_windows, service_slots, to_time
 
 class IsProvider(permissions.BasePermission):
     """
@@ -20,30 +35,174 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return obj.provider.user == request.user
+        return obj.provider.user_id == request.user.id
 
-class ServiceListCreateView(generics.ListCreateAPIView):
+class CatalogCacheMixin:
+    """Read-through cache of the serialized catalog page (see services/cache.py)."""
+
+    def list(self, request, *args, **kwargs):
+        key = catalog_cache.key_for_request(request)
+        data = catalog_cache.get_page(key)
+        if data is not None:
+            return Response(data, headers={'X-Cache': 'HIT'})
+
+        response = super().list(request, *args, **kwargs)
+        catalog_cache.set_page(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+class ServiceListCreateView(ConditionalGetMixin, CatalogCacheMixin, FastListMixin, SparseQuerysetMixin, generics.ListCreateAPIView):
     """
     GET: List all services (Publicly accessible or filtered).
+         ?q= searches name/description, best match first.
+         ?ordering=rating lists services of the best rated providers first.
     POST: Create a new service (Only Providers).
     """
     queryset = Service.objects.filter(is_active=True)
     serializer_class = ServiceSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsProvider]
+    pagination_class = CreatedAtPagination
+    # provider_rating comes from the provider
+    last_modified_fields = ('updated_at', 'provider__updated_at')
 
     def get_queryset(self):
         # Optional: Filter by provider_id if passed in URL params
-        queryset = Service.objects.filter(is_active=True)
+        queryset = Service.objects.filter(is_active=True).select_related('provider')
         provider_id = self.request.query_params.get('provider_id')
         if provider_id:
             queryset = queryset.filter(provider_id=provider_id)
+        query = self.request.query_params.get('q', '').strip()
+        if query:
+            queryset = search(queryset, query)
+        elif self.request.query_params.get('ordering') == 'rating':
+            queryset = queryset.annotate(provider_rating=F('provider__rating'))
         return queryset
 
-class ServiceDetailView(generics.RetrieveUpdateDestroyAPIView):
+    @property
+    def paginator(self):
+        # Search results are ordered by rank, ?ordering=rating by provider rating
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if params.get('q', '').strip():
+                self._paginator = SearchRankPagination()
+            elif params.get('ordering') == 'rating':
+                self._paginator = ProviderRatingPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def list_etag(self, request):
+        # The catalog cache key changes with every write that may change a
+        # page, so revalidating needs no query (cache hits stay query-free).
+        # Like the cached pages, this needs a cache shared by all workers.
+        return make_etag(catalog_cache.key_for_request(request), request.accepted_media_type)
+
+class ServiceDetailView(ConditionalGetMixin, SparseQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     GET: Retrieve service details.
     PUT/PATCH/DELETE: Only the owner (Provider) can modify.
     """
-    queryset = Service.objects.all()
+    last_modified_fields = ServiceListCreateView.last_modified_fields
+    queryset = Service.objects.select_related('provider')
     serializer_class = ServiceSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+
+
+def parse_date_range(query_params):
+    """
+    Read ?start=YYYY-MM-DD&end=YYYY-MM-DD (both optional, default today).
+    Returns (start, end, error_message).
+    """
+    try:
+        start = date.fromisoformat(query_params['start']) if query_params.get('start') else timezone.localdate()
+        end = date.fromisoformat(query_params['end']) if query_params.get('end') else start
+    except ValueError:
+        return None, None, 'Dates must use the YYYY-MM-DD format.'
+
+    if end < start:
+        return None, None, "'end' must not be before 'start'."
+    if (end - start).days + 1 > settings.AVAILABILITY_MAX_DAYS:
+        return None, None, f'Date range cannot exceed {settings.AVAILABILITY_MAX_DAYS} days.'
+    return start, end, None
+
+class ServiceAvailabilityView(views.APIView):
+    """
+    GET /api/services/<id>/availability/?start=&end=
+    Bookable start times for a service, per day.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, pk):
+        service = get_object_or_404(Service, pk=pk, is_active=True)
+        start, end, error = parse_date_range(request.query_params)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        days = [
+            {'date': day, 'slots': [to_time(slot).strftime('%H:%M') for slot in slots]}
+            for day, slots in service_slots(service, start, end)
+        ]
+        return Response({
+            'service': service.id,
+            'duration': service.duration,
+            'slot_minutes': settings.AVAILABILITY_SLOT_MINUTES,
+            'start': start,
+            'end': end,
+            'days': days,
+        })
+
+class ProviderAvailabilityView(views.APIView):
+    """
+    GET /api/services/providers/<provider_id>/availability/?start=&end=
+    Open windows of a provider (across all their services), per day.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, provider_id):
+        provider = get_object_or_404(ProviderProfile, pk=provider_id)
+        start, end, error = parse_date_range(request.query_params)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        days = [
+            {
+                'date': day,
+                'free': [
+                    {'start': to_time(lo).strftime('%H:%M'), 'end': to_time(hi).strftime('%H:%M')}
+                    for lo, hi in windows
+                ],
+            }
+            for day, windows in free_windows(provider.id, start, end)
+        ]
+        return Response({
+            'provider': provider.id,
+            'start': start,
+            'end': end,
+            'days': days,
+        })
+
+
+class ServiceExportView(views.APIView):
+    """
+    GET /api/services/export.csv  |  /api/services/export.jsonl
+        ?start=&end=YYYY-MM-DD (creation date)&status=active,inactive
+    The provider's own services, active or not, streamed row by row.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    def get(self, request, fmt):
+        if fmt not in FORMATS:
+            raise Http404
+        if request.user.role != 'provider':
+            return Response({'error': 'Only providers can export services.'}, status=status.HTTP_403_FORBIDDEN)
+        start, end, statuses, error = parse_filters(request.query_params, exports.STATUSES)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        provider_id = ProviderProfile.objects.filter(user_id=request.user.id).values_list('id', flat=True).first()
+        if provider_id is None:
+            return Response({'error': 'Provider profile not found.'}, status=status.HTTP_404_NOT_FOUND)
+        queryset = exports.export_queryset(provider_id=provider_id, start=start, end=end, statuses=statuses)
+        return export_response(queryset, exports.COLUMNS, fmt, 'services')
@@ -0,0 +1,61 @@
+"""
+Account creation shared by the sync and async registration endpoints.
+
+Passwords are hashed BEFORE the transaction is opened so the (slow,
+CPU-bound) PBKDF2 run never holds database locks. Callers that hash
+elsewhere (e.g. in a worker pool) pass the encoded hash in.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from .models import ProviderProfile, ClientProfile
+
+User = get_user_model()
+
+
+def build_user(email, password_hash, role):
+    return User(
+        email=User.objects.normalize_email(email),
+        username=email,  # utilizing email as username
+        password=password_hash,
+        role=role,
+    )
+
+
+def register_provider(data, password_hash=None):
+    """Create User (Provider) + ProviderProfile from validated registration data."""
+    if password_hash is None:
+        password_hash = make_password(data['password'])
+
+    with transaction.atomic():
+        user = build_user(data['email'], password_hash, User.Role.PROVIDER)
+        user.save()
+        ProviderProfile.objects.create(
+            user=user,
+            business_name=data['business_name'],
+            ruc=data['ruc'],
+            address=data['address'],
+            phone=data['phone'],
+            bio=data.get('bio', ''),
+            latitude=data.get('latitude'),
+            longitude=data.get('longitude'),
+        )
+    return user
+
+
+def register_client(data, password_hash=None):
+    """Create User (Client) + ClientProfile from validated registration data."""
+    if password_hash is None:
+        password_hash = make_password(data['password'])
+
+    with transaction.atomic():
+        user = build_user(data['email'], password_hash, User.Role.CLIENT)
+        user.save()
+        ClientProfile.objects.create(
+            user=user,
+            phone=data.get('phone', ''),
+            address=data.get('address', ''),
+            preferences=data.get('preferences', '')
+        )
+    return user
@@ -0,0 +1,167 @@
+"""
+Async variants of the login and registration endpoints.
+
+Served through kunapet_backend/asgi.py, e.g.
+    gunicorn kunapet_backend.asgi:application -k uvicorn.workers.UvicornWorker
+
+Validation and writes run through sync_to_async (the ORM is sync), while
+PBKDF2 runs in the bounded pool of users/hashing.py, so a burst of sign-ups
+does not stall the other requests served by the same worker. Request and
+response bodies match the sync endpoints.
+"""
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, identify_hasher, make_password
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import status
+from rest_framework_simplejwt.serializers import TokenObtainSerializer
+
+from .accounts import register_client, register_provider
+from .hashing import HashingBusy, get_executor
+from .throttling import auth_throttle_wait, throttled_message
+from .serializers import (
+    ClientRegistrationSerializer,
+    ProviderRegistrationSerializer,
+    UserSerializer,
+)
+from .views import get_tokens_for_user
+
+User = get_user_model()
+
+BUSY_RESPONSE = {'error': 'Server busy, please retry.'}
+
+
+def parse_json(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def busy():
+    response = JsonResponse(BUSY_RESPONSE, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    response['Retry-After'] = '1'
+    return response
+
+
+async def throttle(request, data):
+    """A 429 like the sync views send, or None (users/throttling.py)."""
+    wait = await sync_to_async(auth_throttle_wait)(request, data.get('email'))
+    if wait is None:
+        return None
+    response = JsonResponse({'detail': throttled_message(wait)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+
+def validate(serializer_class, data):
+    serializer = serializer_class(data=data)
+    if serializer.is_valid():
+        return serializer.validated_data, None
+    return None, serializer.errors
+
+
+async def register(request, serializer_class, create, message):
+    data = parse_json(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body.'}, status=status.HTTP_400_BAD_REQUEST)
+    if rejected := await throttle(request, data):
+        return rejected
+
+    validated, errors = await sync_to_async(validate)(serializer_class, data)
+    if errors:
+        return JsonResponse(errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        password_hash = await get_executor().run(make_password, validated['password'])
+    except HashingBusy:
+        return busy()
+
+    try:
+        user = await sync_to_async(create)(validated, password_hash)
+    except Exception as e:
+        return JsonResponse({'error': f'Registration failed: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return JsonResponse({
+        'user': UserSerializer(user).data,
+        'tokens': get_tokens_for_user(user),
+        'message': message,
+    }, status=status.HTTP_201_CREATED)
+
+
+@csrf_exempt
+@require_POST
+async def provider_register(request):
+    """POST /api/auth/async/register/provider/"""
+    return await register(request, ProviderRegistrationSerializer, register_provider, 'Provider registered successfully.')
+
+
+@csrf_exempt
+@require_POST
+async def client_register(request):
+    """POST /api/auth/async/register/client/"""
+    return await register(request, ClientRegistrationSerializer, register_client, 'Client registered successfully.')
+
+
+def get_login_user(email):
+    try:
+        return User.objects.get(**{User.USERNAME_FIELD: email})
+    except User.DoesNotExist:
+        return None
+
+
+def save_password_hash(user, password_hash):
+    user.password = password_hash
+    user.save(update_fields=['password'])
+
+
+@csrf_exempt
+@require_POST
+async def login(request):
+    """
+    POST /api/auth/async/login/
+    Same credentials check as ModelBackend.authenticate, with hashing off
+    the event loop.
+    """
+    data = parse_json(request) or {}
+    if rejected := await throttle(request, data):
+        return rejected
+    email, password = data.get('email'), data.get('password')
+    if not email or not password:
+        return JsonResponse(
+            {field: ['This field is required.'] for field in ('email', 'password') if not data.get(field)},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    executor = get_executor()
+    try:
+        user = await sync_to_async(get_login_user)(email)
+        if user is None:
+            # Hash anyway so that unknown emails take as long as known ones
+            await executor.run(make_password, password)
+            valid = False
+        else:
+            valid = await executor.run(check_password, password, user.password)
+            if valid and identify_hasher(user.password).must_update(user.password):
+                # Same hash upgrade that User.check_password performs
+                await sync_to_async(save_password_hash)(user, await executor.run(make_password, password))
+    except HashingBusy:
+        return busy()
+
+    if not valid or not user.is_active:
+        return JsonResponse(
+            {'detail': TokenObtainSerializer.default_error_messages['no_active_account']},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+
+    tokens = get_tokens_for_user(user)
+    return JsonResponse({
+        **tokens,
+        'user': {'id': user.id, 'email': user.email, 'role': user.role},
+    })
@@ -0,0 +1,83 @@
+"""
+Opt-in stateless JWT authentication (settings.JWT_CLAIMS_AUTH).
+
+JWTAuthentication loads the User row on every request. Most views only
+need the user's id and role, and both are claims in our tokens, so
+ClaimsJWTAuthentication builds a ClaimsUser from the validated token
+without touching the database. Any other attribute (email, profiles,
+is_staff, ...) loads the real User once, on first access.
+
+Trade-off: a deactivated or deleted user keeps access until their access
+token expires (ACCESS_TOKEN_LIFETIME).
+"""
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from rest_framework_simplejwt import authentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from kunapet_backend.timing import TimedAuthenticationMixin
+
+User = get_user_model()
+
+
+class ClaimsUser:
+    """
+    Request user backed by token claims. Falls back to a single lazy DB
+    load for anything that is not a claim.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, token):
+        self.token = token
+        # simplejwt writes the claim as a str; FKs compare against the real pk type
+        self.id = self.pk = User._meta.pk.to_python(token[api_settings.USER_ID_CLAIM])
+
+    @property
+    def role(self):
+        role = self.token.get('role')
+        # Tokens minted before the claim existed
+        return role if role is not None else self.user.role
+
+    @cached_property
+    def user(self):
+        try:
+            return User.objects.get(pk=self.id)
+        except User.DoesNotExist:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+
+    def __getattr__(self, name):
+        # Only called for attributes not defined above
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+    def __eq__(self, other):
+        if isinstance(other, (ClaimsUser, User)):
+            return self.pk == other.pk
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __str__(self):
+        return f'ClaimsUser {self.pk}'
+
+
+def user_instance(user):
+    """A real User instance (e.g. for FK assignment) for any request user."""
+    return user.user if isinstance(user, ClaimsUser) else user
+
+
+class JWTAuthentication(TimedAuthenticationMixin, authentication.JWTAuthentication):
+    """simplejwt's JWTAuthentication, reported as `auth` in Server-Timing."""
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that trusts the token claims instead of the DB."""
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+        return ClaimsUser(validated_token)
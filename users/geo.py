@@ -0,0 +1,160 @@
+"""
+Geohash spatial index for provider locations (no PostGIS needed).
+
+Every located ProviderProfile stores the geohash of its coordinates. A
+geohash is a base32 string whose prefixes are nested grid cells, so all
+points inside a cell share that prefix and sit next to each other in a
+plain B-tree index on the column.
+
+A "within r km" query:
+  1. takes the circle's latitude/longitude bounding box,
+  2. covers it with the smallest grid cells that need at most MAX_CELLS
+     of them, one index range scan each (prefix <= geohash < the next
+     prefix of the same length, see cell_range()),
+  3. filters those rows with the bounding box,
+  4. computes the exact great-circle distance for what is left and loads
+     only the nearest rows as objects.
+
+Only rows in cells next to the point are read, however many providers
+exist.
+"""
+import math
+
+from django.db.models import Q
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# ~4.8 m cells; queries use shorter prefixes of it
+PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Index range scans per query
+MAX_CELLS = 16
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if longitude >= mid:
+                value, lng_lo = (value << 1) | 1, mid
+            else:
+                value, lng_hi = value << 1, mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if latitude >= mid:
+                value, lat_lo = (value << 1) | 1, mid
+            else:
+                value, lat_hi = value << 1, mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_range(cell):
+    """
+    (lo, hi) such that lo <= geohash < hi holds for exactly the geohashes
+    in `cell`; hi is None for the last cell. hi is the next cell, built by
+    incrementing the last base32 character (with carry), so the range
+    only compares base32 characters, which sort the same under byte and
+    locale collations alike (punctuation such as '~' does not).
+    """
+    stripped = cell.rstrip(BASE32[-1])
+    if not stripped:
+        return cell, None
+    return cell, stripped[:-1] + BASE32[BASE32.index(stripped[-1]) + 1]
+
+
+def cell_size(precision):
+    """(height, width) in degrees of a cell at `precision`."""
+    total = 5 * precision
+    lng_bits = (total + 1) // 2
+    return 180.0 / 2 ** (total - lng_bits), 360.0 / 2 ** lng_bits
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """
+    Geohash prefixes of the grid cells that intersect the circle's bounding
+    box, at the finest precision that needs at most MAX_CELLS of them.
+    [] means the box is too big for any precision.
+    """
+    min_lat, max_lat, lng_ranges = bounding_box(latitude, longitude, radius_km)
+    for precision in range(PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = range(int((min_lat + 90) // height), int(min((max_lat + 90) // height, 180 / height - 1)) + 1)
+        columns = []
+        for lo, hi in lng_ranges:
+            columns += range(int((lo + 180) // width), int(min((hi + 180) // width, 360 / width - 1)) + 1)
+        if len(rows) * len(columns) > MAX_CELLS:
+            continue
+        return sorted({
+            encode(-90 + (row + 0.5) * height, -180 + (column + 0.5) * width, precision)
+            for row in rows for column in columns
+        })
+    return []
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    (min_lat, max_lat, [(min_lng, max_lng), ...]) around the circle. The
+    longitude span is split in two where it crosses the antimeridian.
+    """
+    d_lat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(-90.0, latitude - d_lat), min(90.0, latitude + d_lat)
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if cos_lat < 1e-9 or radius_km / (KM_PER_DEGREE * cos_lat) >= 180:
+        return min_lat, max_lat, [(-180.0, 180.0)]
+    d_lng = radius_km / (KM_PER_DEGREE * cos_lat)
+    lo, hi = longitude - d_lng, longitude + d_lng
+    if lo < -180:
+        return min_lat, max_lat, [(lo + 360, 180.0), (-180.0, hi)]
+    if hi > 180:
+        return min_lat, max_lat, [(lo, 180.0), (-180.0, hi - 360)]
+    return min_lat, max_lat, [(lo, hi)]
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    """Great-circle (haversine) distance."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi, d_lambda = phi2 - phi1, math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def nearby(queryset, latitude, longitude, radius_km, limit=None):
+    """
+    The `limit` nearest rows of `queryset` (with latitude/longitude/geohash
+    columns) within `radius_km` of the point, as [(distance_km, obj), ...].
+    Candidates are read as bare (id, lat, lng) tuples; only the winners are
+    loaded as objects, in a second query. Falls back to the bounding box
+    alone when no cell size covers the radius.
+    """
+    cells = covering_cells(latitude, longitude, radius_km)
+    if cells:
+        in_cells = Q()
+        for cell in cells:
+            lo, hi = cell_range(cell)
+            in_cells |= Q(geohash__gte=lo, geohash__lt=hi) if hi else Q(geohash__gte=lo)
+        queryset = queryset.filter(in_cells)
+    min_lat, max_lat, lng_ranges = bounding_box(latitude, longitude, radius_km)
+    in_lng = Q()
+    for lo, hi in lng_ranges:
+        in_lng |= Q(longitude__range=(lo, hi))
+    queryset = queryset.filter(in_lng, latitude__range=(min_lat, max_lat))
+
+    hits = []
+    for pk, lat, lng in queryset.values_list('pk', 'latitude', 'longitude'):
+        distance = distance_km(latitude, longitude, lat, lng)
+        if distance <= radius_km:
+            hits.append((distance, pk))
+    hits.sort()
+    hits = hits[:limit]
+    if not hits:
+        return []
+    objects = queryset.model._default_manager.in_bulk([pk for _, pk in hits])
+    return [(distance, objects[pk]) for distance, pk in hits]
@@ -0,0 +1,20 @@
+"""
+PBKDF2 with each hash timed for kunapet_password_hash_duration_seconds
+(kunapet_backend/metrics.py). Same algorithm name and encoding, so
+existing hashes keep verifying. verify() goes through encode(), so logins
+are timed too.
+"""
+import time
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+from kunapet_backend import metrics
+
+
+class TimedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    def encode(self, password, salt, iterations=None):
+        start = time.perf_counter()
+        try:
+            return super().encode(password, salt, iterations)
+        finally:
+            metrics.observe_password_hash(time.perf_counter() - start)
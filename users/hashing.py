@@ -0,0 +1,54 @@
+"""
+Bounded executor for password hashing.
+
+PBKDF2 is pure CPU work. hashlib releases the GIL while it runs, so a
+small thread pool keeps the event loop (and every other request on the
+worker) responsive. The pool has PASSWORD_HASH_WORKERS threads and at most
+PASSWORD_HASH_QUEUE_SIZE waiting jobs. Past that, run() fails fast with
+HashingBusy instead of letting the backlog grow without bound.
+"""
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing pool and its queue are full."""
+
+
+class BoundedExecutor:
+    def __init__(self, workers, queue_size):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            # In the caller's context, so metrics know which view the hash is for
+            future = self._executor.submit(contextvars.copy_context().run, fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Released when the job really finishes, even if the caller went away
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def run(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = BoundedExecutor(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE_SIZE)
+    return _executor
@@ -0,0 +1,297 @@
+"""
+Bulk onboarding of providers and clients from CSV or JSONL.
+
+Rows are streamed and processed in chunks:
+  1. field validation with the registration serializers (no queries),
+  2. uniqueness of emails/RUCs checked with ONE query per chunk and field,
+     plus duplicates inside the file,
+  3. passwords hashed in a process pool: the command starts its own, the
+     HTTP endpoint reuses one kept for the life of the web worker (rows
+     without a password get an unusable one and must reset it),
+  4. User + profile rows written with bulk_create in one transaction per
+     chunk.
+
+Used by `manage.py import_accounts` and POST /api/auth/import/.
+"""
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, connection, transaction
+from rest_framework import serializers
+
+from .accounts import build_user
+from .models import ProviderProfile, ClientProfile
+from .serializers import ProviderRegistrationSerializer, ClientRegistrationSerializer
+
+User = get_user_model()
+
+FORMATS = ('csv', 'jsonl')
+
+
+class ProviderRowSerializer(ProviderRegistrationSerializer):
+    """Field validation only; uniqueness is checked per chunk."""
+    password = serializers.CharField(write_only=True, required=False, allow_blank=True)
+
+    def validate_email(self, value):
+        return value
+
+    def validate_ruc(self, value):
+        return value
+
+
+class ClientRowSerializer(ClientRegistrationSerializer):
+    """Field validation only; uniqueness is checked per chunk."""
+    password = serializers.CharField(write_only=True, required=False, allow_blank=True)
+
+    def validate_email(self, value):
+        return value
+
+
+def build_provider_profile(user, data):
+    profile = ProviderProfile(
+        user=user, business_name=data['business_name'], ruc=data['ruc'], address=data['address'],
+        phone=data['phone'], bio=data.get('bio', ''),
+        latitude=data.get('latitude'), longitude=data.get('longitude'),
+    )
+    profile.update_geohash()  # bulk_create skips save()
+    return profile
+
+
+def build_client_profile(user, data):
+    return ClientProfile(
+        user=user, phone=data.get('phone', ''), address=data.get('address', ''),
+        preferences=data.get('preferences', ''),
+    )
+
+
+ROLES = {
+    User.Role.PROVIDER: (ProviderRowSerializer, ProviderProfile, build_provider_profile),
+    User.Role.CLIENT: (ClientRowSerializer, ClientProfile, build_client_profile),
+}
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add_error(self, line, errors):
+        self.errors.append({'line': line, 'errors': errors})
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def as_dict(self, max_errors=None):
+        errors = self.errors if max_errors is None else self.errors[:max_errors]
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'failed': len(self.errors),
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_sec': round(self.rows_per_sec, 1),
+            'errors': errors,
+            'errors_truncated': len(errors) < len(self.errors),
+        }
+
+
+def detect_format(filename, default='csv'):
+    extension = os.path.splitext(filename or '')[1].lower()
+    return {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}.get(extension, default)
+
+
+def read_rows(stream, fmt):
+    """Yield (line_number, row_dict or error_message) lazily."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            # Empty cells mean "not provided"
+            yield reader.line_num, {key: value for key, value in row.items() if key and value not in (None, '')}
+    elif fmt == 'jsonl':
+        for line, text in enumerate(stream, start=1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError as e:
+                yield line, f'Invalid JSON: {e}'
+                continue
+            yield line, row if isinstance(row, dict) else 'Each line must be a JSON object.'
+    else:
+        raise ValueError(f'Unknown format {fmt!r}; expected one of {FORMATS}.')
+
+
+def _init_worker():
+    # Forked workers inherit configured settings; spawned ones need setup
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'kunapet_backend.settings')
+        django.setup()
+
+
+def _hash(password):
+    return make_password(password or None)
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def shared_pool():
+    """
+    The process pool of this (web) process, started on first use and kept
+    running, so requests do not pay for starting workers.
+    """
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            workers = settings.ACCOUNT_IMPORT_WORKERS or os.cpu_count() or 1
+            _shared_pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        return _shared_pool
+
+
+def _discard_shared_pool(pool):
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is pool:
+            _shared_pool = None
+
+
+def _hash_all(get_pool, workers, passwords):
+    # Handing a few rows to the pool costs more than hashing them here
+    pool = get_pool() if len(passwords) > settings.ACCOUNT_IMPORT_INLINE_ROWS else None
+    if pool is None:
+        return [_hash(password) for password in passwords]
+    try:
+        return list(pool.map(_hash, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+    except BrokenProcessPool:
+        # A worker died (OOM killer, ...); the next request starts a new pool
+        _discard_shared_pool(pool)
+        return [_hash(password) for password in passwords]
+
+
+def import_accounts(stream, role, fmt='csv', chunk_size=500, workers=None, shared=False):
+    """
+    Import accounts of `role` from a text stream. With `shared`, hashes in
+    shared_pool() (`workers` is then its size); otherwise in a pool of
+    `workers` processes started for this import: None means one per CPU,
+    0 hashes in this process.
+    """
+    serializer_class, profile_model, build_profile = ROLES[role]
+    report = ImportReport()
+    seen_emails, seen_rucs = set(), set()
+    own_pool = None
+    if not shared and workers != 0:
+        own_pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, initializer=_init_worker)
+    get_pool = shared_pool if shared else lambda: own_pool
+    # Pool size, for the map() chunk size
+    workers = workers or os.cpu_count() or 1
+
+    try:
+        rows = read_rows(stream, fmt)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            report.rows += len(chunk)
+
+            # 1. Field validation
+            valid = []
+            for line, row in chunk:
+                if isinstance(row, str):
+                    report.add_error(line, {'non_field_errors': [row]})
+                    continue
+                serializer = serializer_class(data=row)
+                if not serializer.is_valid():
+                    report.add_error(line, serializer.errors)
+                    continue
+                data = dict(serializer.validated_data)
+                data['email'] = User.objects.normalize_email(data['email'])
+                valid.append((line, data))
+
+            # 2. Set-based uniqueness (DB + earlier rows of the file)
+            valid = _check_unique(valid, role, seen_emails, seen_rucs, report)
+            if not valid:
+                continue
+
+            # 3. Hash in the pool
+            hashes = _hash_all(get_pool, workers, [data.get('password') for _, data in valid])
+
+            # 4. Write
+            report.created += _write_chunk(valid, hashes, role, profile_model, build_profile, report)
+    finally:
+        if own_pool:
+            own_pool.shutdown()
+    return report.finish()
+
+
+def _check_unique(valid, role, seen_emails, seen_rucs, report):
+    emails = {data['email'] for _, data in valid}
+    taken_emails = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+    taken_rucs = set()
+    if role == User.Role.PROVIDER:
+        rucs = {data['ruc'] for _, data in valid}
+        taken_rucs = set(ProviderProfile.objects.filter(ruc__in=rucs).values_list('ruc', flat=True))
+
+    unique = []
+    for line, data in valid:
+        errors = {}
+        if data['email'] in taken_emails or data['email'] in seen_emails:
+            errors['email'] = ['Email already exists.']
+        if role == User.Role.PROVIDER and (data['ruc'] in taken_rucs or data['ruc'] in seen_rucs):
+            errors['ruc'] = ['RUC already registered.']
+        if errors:
+            report.add_error(line, errors)
+            continue
+        seen_emails.add(data['email'])
+        if role == User.Role.PROVIDER:
+            seen_rucs.add(data['ruc'])
+        unique.append((line, data))
+    return unique
+
+
+def _write_chunk(valid, hashes, role, profile_model, build_profile, report):
+    users = [build_user(data['email'], password_hash, role) for (_, data), password_hash in zip(valid, hashes)]
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+            if not connection.features.can_return_rows_from_bulk_insert:
+                ids = dict(User.objects.filter(email__in=[u.email for u in users]).values_list('email', 'id'))
+                for user in users:
+                    user.id = ids[user.email]
+            profile_model.objects.bulk_create(
+                [build_profile(user, data) for user, (_, data) in zip(users, valid)]
+            )
+        return len(users)
+    except IntegrityError:
+        # Someone registered one of these concurrently: retry row by row
+        pass
+
+    created = 0
+    for (line, data), password_hash in zip(valid, hashes):
+        user = build_user(data['email'], password_hash, role)
+        try:
+            with transaction.atomic():
+                user.save()
+                build_profile(user, data).save()
+            created += 1
+        except IntegrityError as e:
+            report.add_error(line, {'non_field_errors': [f'Could not be created: {e}']})
+    return created
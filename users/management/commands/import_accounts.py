@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.importer import FORMATS, detect_format, import_accounts
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Bulk-import provider or client accounts from a CSV or JSONL file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (with a header row) or JSONL file')
+        parser.add_argument('--role', choices=[User.Role.PROVIDER, User.Role.CLIENT], required=True)
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=None, help='Hashing processes (0 = in-process; default: one per CPU)')
+        parser.add_argument('--errors', help='Write every per-row error to this JSONL file')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as stream:
+                report = import_accounts(
+                    stream, options['role'], fmt=fmt,
+                    chunk_size=options['chunk_size'], workers=options['workers'],
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+
+        if options['errors']:
+            with open(options['errors'], 'w') as out:
+                for error in report.errors:
+                    out.write(json.dumps(error) + '\n')
+        else:
+            for error in report.errors[:20]:
+                self.stderr.write(f"line {error['line']}: {json.dumps(error['errors'])}")
+            if len(report.errors) > 20:
+                self.stderr.write(f'... {len(report.errors) - 20} more (use --errors to save them all)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{report.created}/{report.rows} accounts created, {len(report.errors)} failed '
+            f'in {report.elapsed:.2f}s ({report.rows_per_sec:.1f} rows/s)'
+        ))
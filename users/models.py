@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils.translation import gettext_lazy as _
 
+from . import geo
+
 class UserManager(BaseUserManager):
     """
     Custom user manager where email is the unique identifiers
@@ -64,11 +66,41 @@ class ProviderProfile(models.Model):
     phone = models.CharField(max_length=20)
     bio = models.TextField(blank=True)
     is_verified = models.BooleanField(default=False)
+    # Average of rating_sum / review_count, kept up to date with them (appointments/reviews.py)
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # Derived from latitude/longitude on save(); indexed for nearby search (users/geo.py)
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True, editable=False)
+    # Services and appointments embed the profile, so their validators include it
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Provider listing: ORDER BY rating DESC, review_count DESC, id
+            models.Index(fields=['-rating', '-review_count', 'id'], name='provider_rating_idx'),
+        ]
 
     def __str__(self):
         return f"{self.business_name} ({self.user.email})"
 
+    def update_geohash(self):
+        """Call before bulk_create()/bulk_update(), which skip save()."""
+        located = self.latitude is not None and self.longitude is not None
+        self.geohash = geo.encode(self.latitude, self.longitude) if located else ''
+
+    def save(self, *args, **kwargs):
+        self.update_geohash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields) | {'updated_at'}
+            if {'latitude', 'longitude'} & update_fields:
+                update_fields.add('geohash')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
 
 class ClientProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='client_profile')
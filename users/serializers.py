@@ -1,21 +1,35 @@
 from rest_framework import serializers
+from kunapet_backend.fields import SparseFieldsMixin
 from django.contrib.auth import get_user_model
 from .models import ProviderProfile, ClientProfile
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 User = get_user_model()
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'email', 'role']
 
-class ProviderProfileSerializer(serializers.ModelSerializer):
+class ProviderProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ProviderProfile
-        fields = ['business_name', 'ruc', 'address', 'phone', 'bio', 'is_verified', 'rating']
+        fields = ['business_name', 'ruc', 'address', 'phone', 'bio', 'is_verified', 'rating', 'review_count', 'latitude', 'longitude']
 
-class ClientProfileSerializer(serializers.ModelSerializer):
+class PublicProviderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = ProviderProfile
+        fields = ['id', 'business_name', 'address', 'phone', 'bio', 'is_verified', 'rating', 'review_count', 'latitude', 'longitude']
+
+class NearbyProviderSerializer(PublicProviderSerializer):
+    # Set on each instance by NearbyProvidersView
+    distance_km = serializers.FloatField(read_only=True)
+
+    class Meta(PublicProviderSerializer.Meta):
+        fields = PublicProviderSerializer.Meta.fields + ['distance_km']
+        sparse_sources = {'distance_km': []}
+
+class ClientProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ClientProfile
         fields = ['phone', 'address', 'preferences']
@@ -24,6 +38,13 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """
     Customizes the JWT response to include user details and role.
     """
+    @classmethod
+    def get_token(cls, user):
+        # The role claim lets permission checks skip the user lookup
+        token = super().get_token(user)
+        token['role'] = user.role
+        return token
+
     def validate(self, attrs):
         data = super().validate(attrs)
         
@@ -51,6 +72,8 @@ class ProviderRegistrationSerializer(serializers.Serializer):
     address = serializers.CharField(max_length=255)
     phone = serializers.CharField(max_length=20)
     bio = serializers.CharField(required=False, allow_blank=True)
+    latitude = serializers.FloatField(required=False, min_value=-90, max_value=90)
+    longitude = serializers.FloatField(required=False, min_value=-180, max_value=180)
 
     def validate_email(self, value):
         if User.objects.filter(email=value).exists():
@@ -62,6 +85,11 @@ class ProviderRegistrationSerializer(serializers.Serializer):
             raise serializers.ValidationError("RUC already registered.")
         return value
 
+    def validate(self, attrs):
+        if ('latitude' in attrs) != ('longitude' in attrs):
+            raise serializers.ValidationError("Latitude and longitude must be given together.")
+        return attrs
+
 class ClientRegistrationSerializer(serializers.Serializer):
     """
     Validates input for Client Registration.
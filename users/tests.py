@@ -1,3 +1,548 @@
-from django.test import TestCase
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import AsyncClient, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from appointments.models import Appointment
+from pets.models import Pet
+from services.models import Service
+from . import geo, importer, throttling
+from .authentication import ClaimsJWTAuthentication
+from .hashing import BoundedExecutor, HashingBusy
+from .importer import import_accounts
+from .models import ClientProfile, ProviderProfile, User
+from .serializers import CustomTokenObtainPairSerializer
+
+
+class MeQueryCountTests(APITestCase):
+    """
+    GET /api/auth/me/ costs the JWT user lookup plus one profile query.
+    """
+    def authenticate(self, user):
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_provider(self):
+        user = User.objects.create_user(email='vet@kunapet.com', password='TestPassword123!', role=User.Role.PROVIDER)
+        ProviderProfile.objects.create(user=user, business_name='Vet', ruc='20123456789', address='Av. 1', phone='999')
+        self.authenticate(user)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/auth/me/')
+        self.assertEqual(response.data['profile']['business_name'], 'Vet')
+
+    def test_client(self):
+        user = User.objects.create_user(email='client@kunapet.com', password='TestPassword123!', role=User.Role.CLIENT)
+        ClientProfile.objects.create(user=user, phone='999')
+        self.authenticate(user)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/auth/me/')
+        self.assertEqual(response.data['profile']['phone'], '999')
+
+
+class TokenClaimsTests(APITestCase):
+    def test_login_and_registration_tokens_carry_the_role(self):
+        response = self.client.post('/api/auth/register/provider/', {
+            'email': 'vet@kunapet.com', 'password': 'TestPassword123!', 'business_name': 'Vet',
+            'ruc': '20123456789', 'address': 'Av. 1', 'phone': '999',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(AccessToken(response.data['tokens']['access'])['role'], 'provider')
+
+        response = self.client.post('/api/auth/login/', {'email': 'vet@kunapet.com', 'password': 'TestPassword123!'}, format='json')
+        self.assertEqual(AccessToken(response.data['access'])['role'], 'provider')
+        self.assertEqual(RefreshToken(response.data['refresh'])['role'], 'provider')
+
+
+@mock.patch.object(APIView, 'authentication_classes', [ClaimsJWTAuthentication])
+class ClaimsAuthenticationTests(APITestCase):
+    """
+    With JWT_CLAIMS_AUTH the id/role checks are served from the token and
+    only views that need other user fields load the user row.
+    """
+    def setUp(self):
+        self.provider = User.objects.create_user(email='vet@kunapet.com', password='TestPassword123!', role=User.Role.PROVIDER)
+        ProviderProfile.objects.create(user=self.provider, business_name='Vet', ruc='20123456789', address='Av. 1', phone='999')
+        self.customer = User.objects.create_user(email='client@kunapet.com', password='TestPassword123!', role=User.Role.CLIENT)
+
+    def authenticate(self, user):
+        token = CustomTokenObtainPairSerializer.get_token(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_list_views_make_no_auth_queries(self):
+        for user in (self.provider, self.customer):
+            self.authenticate(user)
+            # ETag aggregate + page
+            with self.assertNumQueries(2):
+                self.assertEqual(self.client.get('/api/appointments/').status_code, 200)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/api/pets/').status_code, 200)
+
+    def test_role_permission_without_user_lookup(self):
+        self.authenticate(self.customer)
+        with self.assertNumQueries(0):
+            response = self.client.post('/api/services/', {'name': 'X'}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_full_user_fields_fall_back_to_one_lookup(self):
+        self.authenticate(self.provider)
+        # user row + provider profile
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/auth/me/')
+        self.assertEqual(response.data['user']['email'], 'vet@kunapet.com')
+        self.assertEqual(response.data['profile']['business_name'], 'Vet')
+
+    def test_tokens_without_role_claim_still_work(self):
+        token = RefreshToken.for_user(self.customer).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get('/api/appointments/').status_code, 200)
+
+    def test_object_permissions_match_the_owner(self):
+        service = Service.objects.create(
+            provider=self.provider.provider_profile, name='Consulta', description='General', price='50.00', duration=30,
+        )
+        pet = Pet.objects.create(owner=self.customer, name='Michi', species='cat', gender='F')
+        appointment = Appointment.objects.create(
+            client=self.customer, service=service, date=date(2030, 1, 7), time=time(10, 0),
+        )
+
+        self.authenticate(self.customer)
+        self.assertEqual(self.client.get(f'/api/pets/{pet.id}/').status_code, 200)
+        self.assertEqual(self.client.patch(f'/api/pets/{pet.id}/', {'name': 'Misha'}, format='json').status_code, 200)
+        self.assertEqual(self.client.get(f'/api/appointments/{appointment.id}/').status_code, 200)
+        self.assertEqual(self.client.patch(f'/api/services/{service.id}/', {'price': '1.00'}, format='json').status_code, 403)
+
+        self.authenticate(self.provider)
+        self.assertEqual(self.client.get(f'/api/appointments/{appointment.id}/').status_code, 200)
+        self.assertEqual(self.client.patch(f'/api/services/{service.id}/', {'price': '60.00'}, format='json').status_code, 200)
+        self.assertEqual(self.client.get(f'/api/pets/{pet.id}/').status_code, 403)
+        self.assertEqual(self.client.delete(f'/api/services/{service.id}/').status_code, 204)
+
+    def test_writes_assign_the_real_user(self):
+        self.authenticate(self.customer)
+        response = self.client.post('/api/pets/', {'name': 'Michi', 'species': 'cat', 'gender': 'F'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.customer.pets.get().name, 'Michi')
+
+
+class AsyncAuthEndpointTests(TransactionTestCase):
+    """
+    The async endpoints accept and return the same bodies as the sync ones.
+    """
+    def setUp(self):
+        self.client = AsyncClient()
+
+    async def post(self, url, data):
+        return await self.client.post(url, data, content_type='application/json')
+
+    async def test_register_and_login(self):
+        response = await self.post('/api/auth/async/register/client/', {
+            'email': 'client@kunapet.com', 'password': 'TestPassword123!', 'phone': '999',
+        })
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(body['user']['role'], 'client')
+        self.assertEqual(AccessToken(body['tokens']['access'])['role'], 'client')
+
+        user = await User.objects.aget(email='client@kunapet.com')
+        self.assertTrue(user.check_password('TestPassword123!'))
+        self.assertEqual((await ClientProfile.objects.aget(user=user)).phone, '999')
+
+        response = await self.post('/api/auth/async/login/', {'email': 'client@kunapet.com', 'password': 'TestPassword123!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {'access', 'refresh', 'user'})
+
+        response = await self.post('/api/auth/async/login/', {'email': 'client@kunapet.com', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 401)
+        response = await self.post('/api/auth/async/login/', {'email': 'nobody@kunapet.com', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_provider_validation_errors(self):
+        response = await self.post('/api/auth/async/register/provider/', {'email': 'not-an-email', 'password': 'x'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ruc', response.json())
+
+    async def test_busy_pool_is_rejected(self):
+        with mock.patch('users.async_views.get_executor') as get_executor:
+            get_executor.return_value.run.side_effect = HashingBusy
+            response = await self.post('/api/auth/async/login/', {'email': 'a@kunapet.com', 'password': 'x'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+
+class BoundedExecutorTests(SimpleTestCase):
+    def test_rejects_beyond_workers_plus_queue(self):
+        executor = BoundedExecutor(workers=1, queue_size=1)
+        release = threading.Event()
+        futures = [executor.submit(release.wait), executor.submit(release.wait)]
+        with self.assertRaises(HashingBusy):
+            executor.submit(release.wait)
+        release.set()
+        for future in futures:
+            future.result(timeout=5)
+        # Slots are given back once jobs finish
+        self.assertTrue(executor.submit(lambda: True).result(timeout=5))
+
+
+def sample(text, name, **labels):
+    """Value of one series in a /metrics page (0 if absent)."""
+    wanted = {f'{key}="{value}"' for key, value in labels.items()}
+    for line in text.splitlines():
+        series, _, value = line.rpartition(' ')
+        metric, _, label_text = series.partition('{')
+        if metric == name and set(label_text.rstrip('}').split(',')) == wanted:
+            return float(value)
+    return 0.0
+
+
+class MetricsTests(APITestCase):
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        return response.content.decode()
+
+    def test_requests_queries_and_password_hashes(self):
+        before = self.scrape()
+        response = self.client.post('/api/auth/register/client/', {'email': 'client@kunapet.com', 'password': 'TestPassword123!'})
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post('/api/auth/login/', {'email': 'client@kunapet.com', 'password': 'TestPassword123!'})
+        self.assertEqual(response.status_code, 200)
+        after = self.scrape()
+
+        def delta(name, **labels):
+            return sample(after, name, **labels) - sample(before, name, **labels)
+
+        register = {'view': 'ClientRegisterView', 'method': 'POST', 'status': '201'}
+        self.assertEqual(delta('kunapet_http_requests_total', **register), 1)
+        self.assertEqual(delta('kunapet_http_request_duration_seconds_count', **register), 1)
+        self.assertEqual(delta('kunapet_http_request_duration_seconds_bucket', **register, le='+Inf'), 1)
+        self.assertEqual(delta('kunapet_http_requests_total', view='CustomTokenObtainPairView', method='POST', status='200'), 1)
+        self.assertEqual(delta('kunapet_password_hash_duration_seconds_count', view='ClientRegisterView'), 1)
+        self.assertEqual(delta('kunapet_password_hash_duration_seconds_count', view='CustomTokenObtainPairView'), 1)
+        self.assertGreater(delta('kunapet_password_hash_duration_seconds_sum', view='ClientRegisterView'), 0)
+        self.assertGreater(delta('kunapet_db_queries_total', database='default'), 3)
+
+    async def test_async_views_hash_in_the_pool(self):
+        before = (await self.async_client.get('/metrics')).content.decode()
+        response = await self.async_client.post(
+            '/api/auth/async/register/client/', {'email': 'client@kunapet.com', 'password': 'TestPassword123!'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        after = (await self.async_client.get('/metrics')).content.decode()
+        name = 'kunapet_password_hash_duration_seconds_count'
+        self.assertEqual(sample(after, name, view='client_register') - sample(before, name, view='client_register'), 1)
+
+    def test_sums_the_snapshots_of_every_process(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(METRICS_DIR=directory):
+            self.client.get('/api/providers/')
+            labels = {'view': 'ProviderListView', 'method': 'GET', 'status': '200'}
+            alone = sample(self.scrape(), 'kunapet_http_requests_total', **labels)
+            self.assertGreaterEqual(alone, 1)
+            # Another worker with the same counts
+            own = os.path.join(directory, f'{os.getpid()}.json')
+            shutil.copy(own, os.path.join(directory, '1.json'))
+            self.assertEqual(sample(self.scrape(), 'kunapet_http_requests_total', **labels), 2 * alone)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_take(self):
+        state, waits = None, []
+        for now in (0, 0, 0, 1, 5):
+            state, wait = throttling.take(state, now, capacity=2, refill=0.5)
+            waits.append(wait)
+        # Burst of 2, then one token every 2 seconds, never more than 2
+        self.assertEqual(waits, [None, None, 2.0, 1.0, None])
+        self.assertEqual(state, (1, 5))
+
+
+@override_settings(AUTH_THROTTLE_RATES={'ip': None, 'email': '2/min'})
+class AuthThrottleTests(APITestCase):
+    def setUp(self):
+        caches['default'].clear()
+
+    def login(self, email, **extra):
+        return self.client.post('/api/auth/login/', {'email': email, 'password': 'wrong'}, format='json', **extra)
+
+    def test_login_per_email(self):
+        self.assertEqual([self.login('a@kunapet.com').status_code for _ in range(2)], [401, 401])
+        # Rejected before any query or hash
+        with mock.patch('users.hashers.TimedPBKDF2PasswordHasher.encode') as encode, self.assertNumQueries(0):
+            response = self.login(' A@kunapet.com')
+        encode.assert_not_called()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(self.login('b@kunapet.com').status_code, 401)
+
+    @override_settings(AUTH_THROTTLE_RATES={'ip': '2/min', 'email': None})
+    def test_registration_per_ip(self):
+        def register(n, ip):
+            data = {'email': f'client{n}@kunapet.com', 'password': 'TestPassword123!'}
+            return self.client.post('/api/auth/register/client/', data, format='json', REMOTE_ADDR=ip).status_code
+
+        self.assertEqual([register(n, '10.0.0.1') for n in range(3)], [201, 201, 429])
+        self.assertEqual(register(3, '10.0.0.2'), 201)
+        # One bucket per IP for login and registration alike
+        self.assertEqual(self.login('a@kunapet.com', REMOTE_ADDR='10.0.0.1').status_code, 429)
+
+    @override_settings(AUTH_THROTTLE_RATES={'ip': '2/min', 'email': None})
+    def test_forwarded_for_does_not_pick_the_bucket(self):
+        def login(n, **extra):
+            return self.login(f'client{n}@kunapet.com', REMOTE_ADDR='10.0.0.1', **extra).status_code
+
+        # No proxies by default: a forged header gets no fresh bucket
+        self.assertEqual(
+            [login(n, HTTP_X_FORWARDED_FOR=f'203.0.113.{n}') for n in range(3)], [401, 401, 429],
+        )
+        # Behind one proxy, the address it appended is the client's
+        caches['default'].clear()
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            self.assertEqual(
+                [login(n, HTTP_X_FORWARDED_FOR=f'198.51.100.7, 203.0.113.{n % 2}') for n in range(5)],
+                [401, 401, 401, 401, 429],
+            )
+
+    async def test_async_views(self):
+        async def login():
+            return await self.async_client.post(
+                '/api/auth/async/login/', {'email': 'a@kunapet.com', 'password': 'wrong'}, content_type='application/json',
+            )
+
+        self.assertEqual([(await login()).status_code for _ in range(2)], [401, 401])
+        response = await login()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json(), self.login('a@kunapet.com').json())
+
+    def test_falls_back_to_in_process_buckets(self):
+        with mock.patch.object(throttling, 'local_buckets', throttling.LocalBuckets()), \
+                mock.patch.object(type(caches['default']), 'get', side_effect=ConnectionError), \
+                self.assertLogs('users.throttling', 'WARNING'):
+            self.assertEqual([self.login('a@kunapet.com').status_code for _ in range(3)], [401, 401, 429])
+
+
+PROVIDER_CSV_HEADER = 'email,password,business_name,ruc,address,phone\n'
+
+
+def provider_csv(rows):
+    lines = [f'vet{i}@kunapet.com,TestPassword123!,Vet {i},20{i:09d},Av. {i},999' for i in rows]
+    return PROVIDER_CSV_HEADER + '\n'.join(lines) + '\n'
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AccountImportTests(APITestCase):
+    def test_csv_providers_with_per_row_errors(self):
+        User.objects.create_user(email='vet1@kunapet.com', password='x', role=User.Role.PROVIDER)
+        taken = User.objects.create_user(email='taken@kunapet.com', password='x', role=User.Role.PROVIDER)
+        ProviderProfile.objects.create(user=taken, business_name='Taken', ruc='20000000002', address='Av.', phone='1')
+        data = provider_csv(range(5)) + (
+            'vet0@kunapet.com,TestPassword123!,Dup,20999999999,Av.,1\n'   # duplicate email in the file
+            'not-an-email,TestPassword123!,Bad,20888888888,Av.,1\n'
+            'nopass@kunapet.com,,No Password,20777777777,Av.,1\n'
+        )
+
+        report = import_accounts(io.StringIO(data), User.Role.PROVIDER, chunk_size=3, workers=0)
+
+        self.assertEqual(report.rows, 8)
+        self.assertEqual(report.created, 4)  # vet0, vet3, vet4, nopass
+        errors = {error['line']: error['errors'] for error in report.errors}
+        self.assertEqual(set(errors), {3, 4, 7, 8})
+        self.assertIn('email', errors[3])   # vet1 exists
+        self.assertIn('ruc', errors[4])     # vet2's RUC is taken
+        self.assertIn('email', errors[7])   # repeated inside the file
+        self.assertIn('email', errors[8])   # invalid
+        self.assertEqual(ProviderProfile.objects.get(user__email='vet4@kunapet.com').business_name, 'Vet 4')
+        self.assertTrue(User.objects.get(email='vet0@kunapet.com').check_password('TestPassword123!'))
+        self.assertFalse(User.objects.get(email='nopass@kunapet.com').has_usable_password())
+
+    def test_jsonl_clients(self):
+        data = '\n'.join([
+            json.dumps({'email': 'a@kunapet.com', 'password': 'TestPassword123!', 'phone': '999'}),
+            '{broken',
+            json.dumps({'email': 'b@kunapet.com', 'password': 'TestPassword123!'}),
+        ])
+        report = import_accounts(io.StringIO(data), User.Role.CLIENT, fmt='jsonl', workers=0)
+        self.assertEqual((report.rows, report.created), (3, 2))
+        self.assertEqual(report.errors[0]['line'], 2)
+        self.assertEqual(ClientProfile.objects.get(user__email='a@kunapet.com').phone, '999')
+        self.assertEqual(User.objects.get(email='b@kunapet.com').role, User.Role.CLIENT)
+
+    def test_queries_do_not_scale_with_rows(self):
+        # uniqueness (email, RUC) + savepoint + users + profiles per chunk
+        with self.assertNumQueries(6):
+            import_accounts(io.StringIO(provider_csv(range(50))), User.Role.PROVIDER, workers=0)
+        self.assertEqual(ProviderProfile.objects.count(), 50)
+
+    def test_endpoint_is_admin_only(self):
+        upload = lambda: SimpleUploadedFile('providers.csv', provider_csv(range(3)).encode())
+        client_user = User.objects.create_user(email='client@kunapet.com', password='x', role=User.Role.CLIENT)
+        self.client.force_authenticate(client_user)
+        response = self.client.post('/api/auth/import/', {'file': upload(), 'role': 'provider'})
+        self.assertEqual(response.status_code, 403)
+
+        admin = User.objects.create_user(email='admin@kunapet.com', password='x', role=User.Role.ADMIN)
+        self.client.force_authenticate(admin)
+        with mock.patch('users.importer.ProcessPoolExecutor') as pool:
+            response = self.client.post('/api/auth/import/', {'file': upload(), 'role': 'provider'})
+        # A few rows are hashed inline, without starting the pool
+        pool.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['rows'], response.data['created'], response.data['failed']), (3, 3, 0))
+
+    def test_endpoint_reuses_one_pool(self):
+        admin = User.objects.create_user(email='admin@kunapet.com', password='x', role=User.Role.ADMIN)
+        self.client.force_authenticate(admin)
+        executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(executor.shutdown)
+        with mock.patch.object(importer, '_shared_pool', None), \
+                mock.patch.object(importer, 'ProcessPoolExecutor', return_value=executor) as pool, \
+                self.settings(ACCOUNT_IMPORT_INLINE_ROWS=2):
+            for start in (0, 10):
+                upload = SimpleUploadedFile('providers.csv', provider_csv(range(start, start + 5)).encode())
+                response = self.client.post('/api/auth/import/', {'file': upload, 'role': 'provider'})
+                self.assertEqual(response.data['created'], 5)
+        # Started once, and still running after both requests
+        pool.assert_called_once()
+        self.assertEqual(executor.submit(len, 'ok').result(), 2)
+        self.assertTrue(User.objects.get(email='vet12@kunapet.com').check_password('TestPassword123!'))
+
+
+LIMA = (-12.0464, -77.0428)
+
+
+def north_of(point, km):
+    return point[0] + km / geo.KM_PER_DEGREE, point[1]
+
+
+class GeohashTests(SimpleTestCase):
+    def test_encode(self):
+        self.assertEqual(geo.encode(57.64911, 10.40744), 'u4pruydqq')
+        self.assertEqual(geo.encode(42.6, -5.6, precision=5), 'ezs42')
+
+    def test_cell_range(self):
+        self.assertEqual(geo.cell_range('6mc5'), ('6mc5', '6mc6'))
+        self.assertEqual(geo.cell_range('6m9'), ('6m9', '6mb'))
+        self.assertEqual(geo.cell_range('6mzz'), ('6mzz', '6n'))
+        self.assertEqual(geo.cell_range('zz'), ('zz', None))
+        # Every geohash in the cell, and none outside it
+        for geohash in ('6mc50000', '6mc5zzzz', '6mc4zzzz', '6mc60000'):
+            lo, hi = geo.cell_range('6mc5')
+            self.assertEqual(lo <= geohash < hi, geohash.startswith('6mc5'))
+
+    def test_distance(self):
+        self.assertAlmostEqual(geo.distance_km(0, 0, 0, 1), 111.195, places=2)
+        self.assertAlmostEqual(geo.distance_km(0, 179.9, 0, -179.9), 22.239, places=2)
+
+    def test_cells_cover_the_whole_circle(self):
+        rng = random.Random(7)
+        for center, radius in [(LIMA, 5), (LIMA, 0.3), (LIMA, 50), ((0.0, 179.99), 10), ((-89.0, 0.0), 20), ((64.1, -21.9), 8)]:
+            cells = geo.covering_cells(*center, radius)
+            min_lat, max_lat, lng_ranges = geo.bounding_box(*center, radius)
+            for _ in range(2000):
+                lat = center[0] + rng.uniform(-1, 1) * radius / geo.KM_PER_DEGREE
+                lng = (center[1] + rng.uniform(-1, 1) * 10 * radius / geo.KM_PER_DEGREE + 180) % 360 - 180
+                if not -90 <= lat <= 90 or geo.distance_km(*center, lat, lng) > radius:
+                    continue
+                if cells:
+                    self.assertTrue(any(geo.encode(lat, lng).startswith(c) for c in cells), (center, radius, lat, lng))
+                self.assertTrue(min_lat <= lat <= max_lat and any(lo <= lng <= hi for lo, hi in lng_ranges))
+
+
+class NearbyProvidersTests(APITestCase):
+    def setUp(self):
+        self.providers = {}
+        for index, (name, km) in enumerate([('near', 1), ('mid', 3), ('far', 8), ('unlocated', None)]):
+            user = User.objects.create_user(email=f'{name}@kunapet.com', password='x', role=User.Role.PROVIDER)
+            lat, lng = north_of(LIMA, km) if km is not None else (None, None)
+            self.providers[name] = ProviderProfile.objects.create(
+                user=user, business_name=name, ruc=f'2000000000{index}', address='Av.', phone='1',
+                latitude=lat, longitude=lng,
+            )
+
+    def nearby(self, **params):
+        return self.client.get('/api/providers/nearby/', {'lat': LIMA[0], 'lng': LIMA[1], **params})
+
+    def test_nearest_first_within_radius(self):
+        # candidates, then the winning rows
+        with self.assertNumQueries(2):
+            response = self.nearby(radius_km=5)
+        self.assertEqual([row['business_name'] for row in response.data['results']], ['near', 'mid'])
+        self.assertAlmostEqual(response.data['results'][0]['distance_km'], 1.0, places=2)
+        self.assertEqual(
+            [row['business_name'] for row in self.nearby(radius_km=10, limit=2).data['results']], ['near', 'mid'],
+        )
+        self.assertEqual(len(self.nearby(radius_km=10).data['results']), 3)
+
+    def test_geohash_follows_location_changes(self):
+        near = self.providers['near']
+        self.assertEqual(near.geohash, geo.encode(near.latitude, near.longitude))
+        near.latitude, near.longitude = north_of(LIMA, 20)
+        near.save(update_fields=['latitude', 'longitude'])
+        near.refresh_from_db()
+        self.assertEqual(near.geohash, geo.encode(near.latitude, near.longitude))
+        self.assertEqual([row['business_name'] for row in self.nearby(radius_km=5).data['results']], ['mid'])
+
+    def test_with_services_embeds_active_ones_only(self):
+        for name, active in [('near', True), ('near', False), ('mid', False)]:
+            Service.objects.create(
+                provider=self.providers[name], name=f'{name} {active}', description='x', price='10.00',
+                duration=30, is_active=active,
+            )
+        with self.assertNumQueries(3):
+            response = self.nearby(radius_km=5, with_services=1)
+        results = response.data['results']
+        self.assertEqual([row['business_name'] for row in results], ['near'])
+        self.assertEqual([s['name'] for s in results[0]['services']], ['near True'])
+
+    def test_rejects_bad_parameters(self):
+        self.assertEqual(self.client.get('/api/providers/nearby/').status_code, 400)
+        self.assertEqual(self.nearby(radius_km=500).status_code, 400)
+        self.assertEqual(self.nearby(radius_km='x').status_code, 400)
+        self.assertEqual(self.client.get('/api/providers/nearby/', {'lat': 95, 'lng': 0}).status_code, 400)
+
+    def test_registration_stores_location(self):
+        response = self.client.post('/api/auth/register/provider/', {
+            'email': 'new@kunapet.com', 'password': 'TestPassword123!', 'business_name': 'New',
+            'ruc': '20123456789', 'address': 'Av. 1', 'phone': '999', 'latitude': LIMA[0], 'longitude': LIMA[1],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(ProviderProfile.objects.get(business_name='New').geohash, geo.encode(*LIMA))
+        response = self.client.post('/api/auth/register/provider/', {
+            'email': 'half@kunapet.com', 'password': 'TestPassword123!', 'business_name': 'Half',
+            'ruc': '20123456780', 'address': 'Av. 1', 'phone': '999', 'latitude': LIMA[0],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+    def test_query_uses_geohash_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.nearby(radius_km=5)
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {queries.captured_queries[0]['sql']}")
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('users_providerprofile_geohash', plan)
+        self.assertNotIn('SCAN users_providerprofile', plan)
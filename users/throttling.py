@@ -0,0 +1,120 @@
+"""
+Token-bucket throttling for login and registration.
+
+Every login and registration hashes a password (PBKDF2, ~all of the
+request's CPU time), so these endpoints get two buckets each:
+one per client IP and one per email, both shared by all of them
+(AUTH_THROTTLE_RATES, e.g. '30/min': bursts of up to 30, refilled at 30
+per minute). The check runs before the body is validated, before any
+query and before any hashing, so a rejected request costs a cache round
+trip.
+
+Buckets live in the AUTH_THROTTLE_CACHE_ALIAS cache so that all workers
+share them. If that cache fails, the process falls back to its own
+buckets until it answers again. Reads and writes are not atomic: a burst
+racing across workers can get a few more requests through than the
+bucket holds, which is fine for protecting CPU.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_rate(rate):
+    """'30/min' -> (capacity 30, refill 0.5 tokens per second); None -> None."""
+    if rate is None:
+        return None
+    count, period = rate.split('/')
+    return int(count), int(count) / PERIODS[period]
+
+
+def take(state, now, capacity, refill):
+    """
+    Take one token from a bucket `state` = (tokens, at).
+    Returns (new state, seconds to wait or None if a token was taken).
+    """
+    tokens, at = state if state is not None else (capacity, now)
+    tokens = min(capacity, tokens + (now - at) * refill)
+    if tokens >= 1:
+        return (tokens - 1, now), None
+    return (tokens, now), (1 - tokens) / refill
+
+
+class LocalBuckets:
+    """In-process buckets, for when the shared cache is down."""
+    max_keys = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def take(self, key, now, capacity, refill):
+        with self._lock:
+            state, wait = take(self._buckets.pop(key, None), now, capacity, refill)
+            self._buckets[key] = state
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)  # least recently used
+        return wait
+
+
+local_buckets = LocalBuckets()
+
+
+def take_token(key, capacity, refill):
+    now = time.time()
+    try:
+        cache = caches[settings.AUTH_THROTTLE_CACHE_ALIAS]
+        state, wait = take(cache.get(key), now, capacity, refill)
+        # Kept until it would be full again
+        cache.set(key, state, timeout=math.ceil(capacity / refill) + 1)
+        return wait
+    except Exception:
+        logger.warning('Throttle cache unavailable; using in-process buckets', exc_info=True)
+        return local_buckets.take(key, now, capacity, refill)
+
+
+def auth_throttle_wait(request, email):
+    """
+    Seconds the client must wait, or None if the request may go ahead.
+    Tokens come from the IP bucket first; a request stopped there does not
+    drain the email's bucket.
+    """
+    rates = settings.AUTH_THROTTLE_RATES
+    buckets = [('ip', BaseThrottle().get_ident(request))]
+    if isinstance(email, str) and email.strip():
+        buckets.append(('email', email.strip().lower()))
+    for scope, ident in buckets:
+        rate = parse_rate(rates.get(scope))
+        if rate is None:
+            continue
+        wait = take_token(f'auth-throttle:{scope}:{ident}', *rate)
+        if wait is not None:
+            return wait
+    return None
+
+
+def throttled_message(wait):
+    """The body DRF sends with a 429, for the views outside DRF."""
+    return Throttled(wait).detail
+
+
+class AuthThrottle(BaseThrottle):
+    """For DRF views; they must not authenticate (no DB work before this)."""
+
+    def allow_request(self, request, view):
+        self.wait_seconds = auth_throttle_wait(request, request.data.get('email') if hasattr(request.data, 'get') else None)
+        return self.wait_seconds is None
+
+    def wait(self):
+        return self.wait_seconds
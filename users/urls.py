@@ -1,10 +1,14 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
+from . import async_views
 from .views import (
     CustomTokenObtainPairView, 
     ProviderRegisterView, 
     ClientRegisterView,
-    MeView
+    MeView,
+    AccountImportView,
+    NearbyProvidersView,
+    ProviderListView
 )
 
 urlpatterns = [
@@ -13,7 +17,19 @@ urlpatterns = [
     path('auth/register/client/', ClientRegisterView.as_view(), name='register_client'),
     path('auth/login/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+
+    # Async variants (hashing off the event loop, for the ASGI deployment)
+    path('auth/async/register/provider/', async_views.provider_register, name='async_register_provider'),
+    path('auth/async/register/client/', async_views.client_register, name='async_register_client'),
+    path('auth/async/login/', async_views.login, name='async_token_obtain_pair'),
     
+    # Bulk onboarding (admin only)
+    path('auth/import/', AccountImportView.as_view(), name='account_import'),
+
     # User info
     path('auth/me/', MeView.as_view(), name='user_me'),
+
+    # Discovery
+    path('providers/', ProviderListView.as_view(), name='provider_list'),
+    path('providers/nearby/', NearbyProvidersView.as_view(), name='providers_nearby'),
 ]
@@ -1,24 +1,38 @@
-from django.db import transaction
+import io
+
 from rest_framework import status, views, generics, permissions
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef, Prefetch, prefetch_related_objects
 
+from . import geo
+from .accounts import register_client, register_provider
+from .importer import FORMATS, detect_format, import_accounts
 from .models import ProviderProfile, ClientProfile
+from .throttling import AuthThrottle
 from .serializers import (
     CustomTokenObtainPairSerializer,
     ProviderRegistrationSerializer,
     ClientRegistrationSerializer,
     UserSerializer,
     ProviderProfileSerializer,
-    ClientProfileSerializer
+    ClientProfileSerializer,
+    NearbyProviderSerializer,
+    PublicProviderSerializer
 )
+from kunapet_backend.fields import SparseQuerysetMixin
+from kunapet_backend.pagination import RatingPagination
+from services.models import Service
+from services.serializers import ServiceSerializer
 
 User = get_user_model()
 
 def get_tokens_for_user(user):
-    refresh = RefreshToken.for_user(user)
+    # Same claims (incl. role) as the login endpoint
+    refresh = CustomTokenObtainPairSerializer.get_token(user)
     return {
         'refresh': str(refresh),
         'access': str(refresh.access_token),
@@ -29,6 +43,7 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     Login endpoint that returns Token + User Info + Role.
     """
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = [AuthThrottle]
 
 
 class ProviderRegisterView(views.APIView):
@@ -37,6 +52,9 @@ class ProviderRegisterView(views.APIView):
     Atomic transaction: Create User (Provider) + ProviderProfile.
     """
     permission_classes = [permissions.AllowAny]
+    # No JWT lookup: throttled before any query
+    authentication_classes = []
+    throttle_classes = [AuthThrottle]
 
     def post(self, request):
         serializer = ProviderRegistrationSerializer(data=request.data)
@@ -44,34 +62,18 @@ class ProviderRegisterView(views.APIView):
             data = serializer.validated_data
             
             try:
-                with transaction.atomic():
-                    # 1. Create User
-                    user = User.objects.create_user(
-                        email=data['email'],
-                        password=data['password'],
-                        username=data['email'], # utilizing email as username
-                        role=User.Role.PROVIDER
-                    )
-
-                    # 2. Create ProviderProfile
-                    ProviderProfile.objects.create(
-                        user=user,
-                        business_name=data['business_name'],
-                        ruc=data['ruc'],
-                        address=data['address'],
-                        phone=data['phone'],
-                        bio=data.get('bio', '')
-                    )
-                    
-                    # Generate Tokens
-                    tokens = get_tokens_for_user(user)
-                    
-                    response_data = {
-                        'user': UserSerializer(user).data,
-                        'tokens': tokens,
-                        'message': 'Provider registered successfully.'
-                    }
-                    return Response(response_data, status=status.HTTP_201_CREATED)
+                # Atomic: Create User + ProviderProfile (see accounts.py)
+                user = register_provider(data)
+
+                # Generate Tokens
+                tokens = get_tokens_for_user(user)
+
+                response_data = {
+                    'user': UserSerializer(user).data,
+                    'tokens': tokens,
+                    'message': 'Provider registered successfully.'
+                }
+                return Response(response_data, status=status.HTTP_201_CREATED)
 
             except Exception as e:
                 # Transaction rolls back automatically on exception
@@ -89,6 +91,9 @@ class ClientRegisterView(views.APIView):
     Atomic transaction: Create User (Client) + ClientProfile.
     """
     permission_classes = [permissions.AllowAny]
+    # No JWT lookup: throttled before any query
+    authentication_classes = []
+    throttle_classes = [AuthThrottle]
 
     def post(self, request):
         serializer = ClientRegistrationSerializer(data=request.data)
@@ -96,32 +101,18 @@ class ClientRegisterView(views.APIView):
             data = serializer.validated_data
             
             try:
-                with transaction.atomic():
-                    # 1. Create User
-                    user = User.objects.create_user(
-                        email=data['email'],
-                        password=data['password'],
-                        username=data['email'],
-                        role=User.Role.CLIENT
-                    )
-
-                    # 2. Create ClientProfile
-                    ClientProfile.objects.create(
-                        user=user,
-                        phone=data.get('phone', ''),
-                        address=data.get('address', ''),
-                        preferences=data.get('preferences', '')
-                    )
-                    
-                    # Generate Tokens
-                    tokens = get_tokens_for_user(user)
-                    
-                    response_data = {
-                        'user': UserSerializer(user).data,
-                        'tokens': tokens,
-                        'message': 'Client registered successfully.'
-                    }
-                    return Response(response_data, status=status.HTTP_201_CREATED)
+                # Atomic: Create User + ClientProfile (see accounts.py)
+                user = register_client(data)
+
+                # Generate Tokens
+                tokens = get_tokens_for_user(user)
+
+                response_data = {
+                    'user': UserSerializer(user).data,
+                    'tokens': tokens,
+                    'message': 'Client registered successfully.'
+                }
+                return Response(response_data, status=status.HTTP_201_CREATED)
 
             except Exception as e:
                 return Response(
@@ -161,3 +152,108 @@ class MeView(views.APIView):
                 data['profile'] = None
 
         return Response(data, status=status.HTTP_200_OK)
+
+
+class IsAdmin(permissions.BasePermission):
+    """
+    Staff users or users with the admin role.
+    """
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and (user.role == User.Role.ADMIN or user.is_staff))
+
+
+class AccountImportView(views.APIView):
+    """
+    POST /api/auth/import/  (multipart: file, role, [file_format])
+    Admin only. Bulk-creates provider or client accounts from a CSV/JSONL
+    upload and reports per-row errors. Passwords are hashed in the web
+    worker's long-lived process pool. Use the import_accounts management
+    command for very large files.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+    parser_classes = [MultiPartParser]
+    max_errors = 1000
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        role = request.data.get('role')
+        if upload is None:
+            return Response({'file': ['This field is required.']}, status=status.HTTP_400_BAD_REQUEST)
+        if role not in (User.Role.PROVIDER, User.Role.CLIENT):
+            return Response({'role': ["Must be 'provider' or 'client'."]}, status=status.HTTP_400_BAD_REQUEST)
+        fmt = request.data.get('file_format') or detect_format(upload.name)
+        if fmt not in FORMATS:
+            return Response({'file_format': [f'Must be one of {FORMATS}.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Stream the upload; it is never read into memory as a whole
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        report = import_accounts(stream, role, fmt=fmt, workers=settings.ACCOUNT_IMPORT_WORKERS, shared=True)
+        return Response(report.as_dict(max_errors=self.max_errors), status=status.HTTP_200_OK)
+
+
+class ProviderListView(SparseQuerysetMixin, generics.ListAPIView):
+    """
+    GET /api/providers/
+    Public provider directory, best rated first. The rating is a stored
+    running average (appointments/reviews.py) served by provider_rating_idx.
+    """
+    queryset = ProviderProfile.objects.all()
+    serializer_class = PublicProviderSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = RatingPagination
+
+
+class NearbyProvidersView(views.APIView):
+    """
+    GET /api/providers/nearby/?lat=&lng=[&radius_km=5][&limit=20][&with_services=1]
+    Located providers within radius_km, nearest first, using the geohash
+    index (users/geo.py). with_services=1 keeps only providers with active
+    services and embeds them.
+    """
+    permission_classes = [permissions.AllowAny]
+    default_radius_km = 5
+    default_limit = 20
+    max_limit = 100
+
+    def parse(self, params):
+        try:
+            lat, lng = float(params['lat']), float(params['lng'])
+            radius = float(params.get('radius_km', self.default_radius_km))
+            limit = int(params.get('limit', self.default_limit))
+        except KeyError:
+            raise ValueError("'lat' and 'lng' are required.")
+        except ValueError:
+            raise ValueError('lat, lng and radius_km must be numbers and limit an integer.')
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValueError('Coordinates out of range.')
+        if not 0 < radius <= settings.NEARBY_MAX_RADIUS_KM:
+            raise ValueError(f'radius_km must be between 0 and {settings.NEARBY_MAX_RADIUS_KM}.')
+        return lat, lng, radius, max(1, min(limit, self.max_limit))
+
+    def get(self, request):
+        try:
+            lat, lng, radius, limit = self.parse(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        with_services = request.query_params.get('with_services') in ('1', 'true')
+
+        queryset = ProviderProfile.objects.all()
+        active_services = Service.objects.filter(is_active=True)
+        if with_services:
+            queryset = queryset.filter(Exists(active_services.filter(provider=OuterRef('pk'))))
+
+        providers = []
+        for distance, provider in geo.nearby(queryset, lat, lng, radius, limit):
+            provider.distance_km = round(distance, 3)
+            providers.append(provider)
+
+        data = NearbyProviderSerializer(providers, many=True).data
+        if with_services:
+            # Only for the page being returned: one query
+            prefetch_related_objects(providers, Prefetch(
+                'services', queryset=active_services.order_by('created_at', 'id'), to_attr='active_services',
+            ))
+            for row, provider in zip(data, providers):
+                row['services'] = ServiceSerializer(provider.active_services, many=True).data
+        return Response({'results': data}, status=status.HTTP_200_OK)